@@ -1,12 +1,21 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import FileResponse
+from django.http import FileResponse, HttpResponse
 import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cabeçalhos do cliente repassados ao serviço
+FORWARDED_REQUEST_HEADERS = ('Idempotency-Key', 'If-None-Match')
+
+# Cabeçalhos da resposta do serviço devolvidos ao cliente (paginação, idempotência e cache)
+RELAYED_RESPONSE_HEADERS = ('X-Next-Cursor', 'X-Total-Count', 'Idempotent-Replayed', 'ETag', 'Cache-Control', 'Vary')
+
+# Respostas de texto repassadas como arquivo (streaming), sem passar pelo parse de JSON
+STREAMED_TEXT_TYPES = ('text/csv',)
+
 
 class MicroserviceRouter(APIView):
     """
@@ -88,6 +97,11 @@ class MicroserviceRouter(APIView):
         
         return not requires_auth
 
+    def _relay_headers(self, response, proxy_response):
+        for header in RELAYED_RESPONSE_HEADERS:
+            if header in response.headers:
+                proxy_response[header] = response.headers[header]
+
     def _proxy_request(self, request, path=''):
         """
         Faz o proxy da requisição para o microsserviço correspondente
@@ -154,6 +168,11 @@ class MicroserviceRouter(APIView):
                     'X-User-Role': user_info.get('role', '')
                 })
             
+            # Repassar a chave de idempotência e o validador de cache do cliente
+            for header in FORWARDED_REQUEST_HEADERS:
+                if request.headers.get(header):
+                    headers[header] = request.headers[header]
+            
             logger.debug(f"Request headers: {headers}")
             
             # Copiar query params
@@ -175,9 +194,19 @@ class MicroserviceRouter(APIView):
                 f"content-type={response.headers.get('Content-Type')}"
             )
             
-            # Verificar se é resposta de arquivo (download)
+            # Não modificado: sem corpo, só os validadores
+            if response.status_code == status.HTTP_304_NOT_MODIFIED:
+                proxy_response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                self._relay_headers(response, proxy_response)
+                return proxy_response
+            
+            # Verificar se é resposta de arquivo (download): tudo que não é JSON
+            # nem texto, e os textos exportados como arquivo (ex.: CSV)
             content_type = response.headers.get('Content-Type', '')
-            if 'application/json' not in content_type and 'text/' not in content_type:
+            mime_type = content_type.split(';')[0].strip().lower()
+            if 'application/json' not in content_type and (
+                not mime_type.startswith('text/') or mime_type in STREAMED_TEXT_TYPES
+            ):
                 # Retornar arquivo
                 proxy_response = FileResponse(
                     response.raw,
@@ -206,6 +235,7 @@ class MicroserviceRouter(APIView):
                 logger.warning(f"Error parsing JSON response: {e}")
                 proxy_response.data = {'detail': response.text if response.text else 'No content'}
             
+            self._relay_headers(response, proxy_response)
             return proxy_response
             
         except requests.exceptions.Timeout:
@@ -96,6 +96,18 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'gestao-pedidos'),
+        'TIMEOUT': 300,
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -160,4 +172,32 @@ SIMPLE_JWT = {
 
 # URLs dos outros microsserviços
 USERS_SERVICE_URL = os.getenv('USERS_SERVICE_URL', 'http://gestao-usuarios-service:8001')
+
+# Validade (segundos) da cópia dos endereços de cada usuário; o serviço de usuários a invalida quando um endereço muda
+ADDRESS_CACHE_TTL = int(os.getenv('ADDRESS_CACHE_TTL', 3600))
 PRODUCTS_SERVICE_URL = os.getenv('PRODUCTS_SERVICE_URL', 'http://gestao-produtos-service:8002')
+
+# Prazo (segundos) para o serviço de produtos responder à consulta dos itens do pedido
+PRODUCTS_SERVICE_TIMEOUT = float(os.getenv('PRODUCTS_SERVICE_TIMEOUT', 5))
+
+# Cache local de produtos: validade (segundos) de cada produto, limite de produtos e intervalo de leitura do feed de alterações
+PRODUCT_CACHE_TTL = float(os.getenv('PRODUCT_CACHE_TTL', 30))
+PRODUCT_CACHE_MAX_SIZE = int(os.getenv('PRODUCT_CACHE_MAX_SIZE', 2000))
+PRODUCT_CACHE_SYNC_INTERVAL = float(os.getenv('PRODUCT_CACHE_SYNC_INTERVAL', 2))
+
+# Outbox: intervalo (segundos) entre rodadas do despachante, tentativas por mensagem e prazo de cada chamada
+OUTBOX_DISPATCH_INTERVAL = float(os.getenv('OUTBOX_DISPATCH_INTERVAL', 1))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 10))
+OUTBOX_REQUEST_TIMEOUT = float(os.getenv('OUTBOX_REQUEST_TIMEOUT', 5))
+
+# Validade (segundos) das chaves Idempotency-Key da criação de pedidos
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+
+# Prazo (segundos) para a requisição que reservou a chave gravar a resposta; depois dele uma repetição assume a chave
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# Pedidos entregues ou cancelados sem alterações há mais dias que isso são arquivados (archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', 365))
+
+# Token compartilhado entre os microsserviços (cabeçalho X-Service-Token); vazio desativa a identidade de serviço
+SERVICE_TOKEN = os.getenv('SERVICE_TOKEN', '')
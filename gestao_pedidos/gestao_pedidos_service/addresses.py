@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+
+import requests
+
+
+def address_cache_key(user_id):
+    return f'addresses:user:{user_id}'
+
+
+def _users_url():
+    return getattr(settings, 'USERS_SERVICE_URL', 'http://gestao-usuarios-service:8001')
+
+
+def _shipping_fields(address):
+    return {
+        'shipping_street': address['street'],
+        'shipping_number': address['number'],
+        'shipping_complement': address.get('complement') or '',
+        'shipping_neighborhood': address['neighborhood'],
+        'shipping_city': address['city'],
+        'shipping_state': address['state'],
+        'shipping_zip_code': address['zip_code'],
+    }
+
+
+def _fetch(path, request):
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+
+    response = requests.get(
+        f'{_users_url()}/api/v1/users/{path}',
+        headers={'Authorization': f'Bearer {token}'},
+        timeout=5
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def get_address(user, address_id, request):
+    """
+    Campos de entrega do endereço ``address_id`` do usuário, ou None.
+
+    Os endereços do usuário são buscados todos de uma vez no serviço de
+    usuários e guardados por ``ADDRESS_CACHE_TTL`` segundos, de forma que
+    os pedidos seguintes com os mesmos endereços não fazem nenhuma chamada.
+    Um id fora da cópia (ex.: endereço recém-criado) força uma nova busca.
+    O ADM master lista os endereços de todos os usuários, então para ele a
+    consulta continua sendo só do endereço pedido, sem cache.
+    """
+    try:
+        if getattr(user, 'is_admin_master', False):
+            return _shipping_fields(_fetch(f'addresses/{address_id}/', request))
+
+        key = address_cache_key(user.id)
+        addresses = cache.get(key)
+
+        if addresses is None or address_id not in addresses:
+            addresses = {
+                address['id']: _shipping_fields(address)
+                for address in _fetch('addresses/', request)
+            }
+            cache.set(key, addresses, getattr(settings, 'ADDRESS_CACHE_TTL', 3600))
+
+        return addresses.get(address_id)
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        return None
+
+
+def invalidate_addresses(user_id):
+    cache.delete(address_cache_key(user_id))
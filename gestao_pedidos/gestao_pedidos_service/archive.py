@@ -0,0 +1,43 @@
+from django.db import transaction
+
+from .models import ArchivedOrder, Order, CANCELLED, DELIVERED
+from .serializers import OrderDetailSerializer
+
+
+# Status finais: pedidos nesses status não mudam mais e podem ser arquivados
+ARCHIVABLE_STATUSES = (DELIVERED, CANCELLED)
+
+
+def archive_orders(before, batch_size=500):
+    """
+    Move para ``archived_orders`` os pedidos entregues ou cancelados cuja
+    última alteração é anterior a ``before``. Cada lote é arquivado e
+    removido das tabelas de pedidos, itens e histórico na mesma transação.
+    Devolve o número de pedidos arquivados.
+    """
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.with_items_count(
+                    Order.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=before)
+                )
+                .select_for_update(skip_locked=True)
+                .prefetch_related('items', 'status_history')
+                .order_by('updated_at')[:batch_size]
+            )
+            if not orders:
+                break
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder.from_representation(order, OrderDetailSerializer(order).data)
+                for order in orders
+            ])
+            Order.objects.filter(id__in=[order.id for order in orders]).delete()
+
+        archived += len(orders)
+        if len(orders) < batch_size:
+            break
+
+    return archived
@@ -1,6 +1,8 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+import hmac
 
 
 
@@ -19,8 +21,37 @@ class AuthenticatedAnonymousUser(AnonymousUser):
         self._is_authenticated = value
 
 
+def service_user(request):
+    """
+    Identidade de serviço: chamadas entre microsserviços com o cabeçalho
+    ``X-Service-Token`` igual ao ``SERVICE_TOKEN`` compartilhado. O gateway
+    não repassa esse cabeçalho, então ele não pode vir de um cliente.
+    """
+    token = request.headers.get('X-Service-Token')
+    expected = getattr(settings, 'SERVICE_TOKEN', '')
+    
+    if not token:
+        return None
+    if not expected or not hmac.compare_digest(token, expected):
+        raise AuthenticationFailed('Invalid service token', code='invalid_service_token')
+    
+    user = AuthenticatedAnonymousUser()
+    user.id = None
+    user.role = 'service'
+    user.is_service = True
+    user.is_admin = False
+    user.is_admin_master = False
+    user.is_customer = False
+    user.is_authenticated = True
+    return user
+
+
 class GatewayJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
+        user = service_user(request)
+        if user is not None:
+            return (user, None)
+        
         if 'X-Forwarded-From-Gateway' in request.headers:
             user_id = request.headers.get('X-User-ID')
             if not user_id:
@@ -0,0 +1,98 @@
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+from uuid import UUID
+
+from django.utils import timezone
+
+from .models import OrderItem
+
+
+ORDER_EXPORT_FIELDS = (
+    'id',
+    'created_at',
+    'status',
+    'user_id',
+    'user_name',
+    'user_email',
+    'subtotal',
+    'shipping_cost',
+    'discount',
+    'total',
+    'shipping_city',
+    'shipping_state',
+    'shipping_zip_code',
+    'tracking_code',
+    'confirmed_at',
+    'shipped_at',
+    'delivered_at',
+    'cancelled_at',
+)
+
+ITEM_EXPORT_FIELDS = (
+    'product_id',
+    'product_sku',
+    'product_name',
+    'quantity',
+    'unit_price',
+    'subtotal',
+)
+
+FORMATS = ('csv', 'jsonl')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def _item_rows(queryset, chunk_size):
+    """Itens dos pedidos do queryset com as colunas do pedido, agrupáveis por pedido."""
+    columns = [f'order__{field}' for field in ORDER_EXPORT_FIELDS] + list(ITEM_EXPORT_FIELDS)
+
+    return (
+        OrderItem.objects.filter(order__in=queryset.order_by().values('id'))
+        .order_by('order__created_at', 'order_id', 'created_at', 'id')
+        .values_list(*columns)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def export_orders(queryset, file_format='csv', chunk_size=2000):
+    """
+    Gera os pedidos do queryset e seus itens linha a linha, em uma única
+    consulta percorrida com cursor, sem carregar os pedidos em memória.
+
+    No CSV cada linha é um item, com as colunas do pedido repetidas; no
+    JSONL cada linha é um pedido com a lista ``items``.
+    """
+    rows = _item_rows(queryset, chunk_size)
+    order_size = len(ORDER_EXPORT_FIELDS)
+
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            [f'order_{field}' for field in ORDER_EXPORT_FIELDS] + [f'item_{field}' for field in ITEM_EXPORT_FIELDS]
+        )
+
+        for row in rows:
+            yield writer.writerow(map(_export_value, row))
+        return
+
+    for order, items in groupby(rows, key=lambda row: row[:order_size]):
+        data = dict(zip(ORDER_EXPORT_FIELDS, map(_export_value, order)))
+        data['items'] = [
+            dict(zip(ITEM_EXPORT_FIELDS, map(_export_value, item[order_size:])))
+            for item in items
+        ]
+        yield json.dumps(data, ensure_ascii=False) + '\n'
@@ -0,0 +1,76 @@
+from functools import wraps
+import hashlib
+import json
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def idempotent(view):
+    """
+    Honra o cabeçalho ``Idempotency-Key`` em uma ação do viewset.
+
+    A primeira requisição com a chave é processada e sua resposta gravada;
+    repetições com o mesmo corpo recebem a resposta gravada (com o cabeçalho
+    ``Idempotent-Replayed``) sem executar a ação de novo. Respostas 5xx e
+    exceções liberam a chave para que o cliente possa tentar novamente.
+    """
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        from .models import IdempotencyKey
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(self, request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, created = IdempotencyKey.reserve(request.user.id, key, fingerprint)
+
+        if not created:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} já utilizada em uma requisição diferente.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+
+            if not record.is_completed:
+                return Response(
+                    {'error': 'Uma requisição com esta chave ainda está em processamento.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            response = Response(record.response, status=record.status_code)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = view(self, request, *args, **kwargs)
+        except Exception:
+            record.release()
+            raise
+
+        if response.status_code >= 500:
+            record.release()
+        else:
+            record.complete(response.status_code, response.data)
+
+        return response
+
+    return wrapper
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Arquiva pedidos entregues ou cancelados há mais tempo que o prazo configurado'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365),
+            help='Idade mínima (dias desde a última alteração) dos pedidos arquivados'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        archived = archive_orders(before, batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'{archived} pedidos arquivados.'))
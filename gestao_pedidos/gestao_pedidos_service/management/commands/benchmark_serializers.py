@@ -0,0 +1,97 @@
+from decimal import Decimal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from ...models import Order, OrderItem
+from ...serializers import CompiledOrderListSerializer, OrderListSerializer
+
+
+BENCHMARK_USER_ID = -1
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compara o OrderListSerializer com o serializer compilado (dados sintéticos, desfeitos ao final)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        try:
+            with transaction.atomic():
+                self._populate(max(sizes))
+                self._run(sizes, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _populate(self, total):
+        orders = Order.objects.bulk_create([
+            Order(
+                user_id=BENCHMARK_USER_ID,
+                user_name=f'Cliente {index}',
+                user_email=f'cliente{index}@example.com',
+                subtotal=Decimal('199.80'),
+                total=Decimal('199.80'),
+                shipping_street='Rua A',
+                shipping_number=str(index),
+                shipping_neighborhood='Centro',
+                shipping_city='Maceió',
+                shipping_state='AL',
+                shipping_zip_code='57000000',
+            )
+            for index in range(total)
+        ], batch_size=1000)
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=item,
+                product_name=f'Produto {item}',
+                product_sku=f'SKU-{item}',
+                quantity=item,
+                unit_price=Decimal('99.90'),
+                subtotal=Decimal('99.90') * item,
+            )
+            for order in orders
+            for item in (1, 2)
+        ], batch_size=1000)
+
+    def _run(self, sizes, repeat):
+        renderer = JSONRenderer()
+        orders = Order.objects.filter(user_id=BENCHMARK_USER_ID).order_by('-created_at', 'id')
+
+        def serializer_path(size):
+            queryset = orders.prefetch_related('items')[:size]
+            return renderer.render(OrderListSerializer(queryset, many=True).data)
+
+        def compiled_path(size):
+            serializer = CompiledOrderListSerializer()
+            return renderer.render(serializer.serialize(serializer.values(orders[:size])))
+
+        self.stdout.write(f'{"linhas":>8} {"serializer":>12} {"compilado":>12} {"ganho":>8}  idêntico')
+        for size in sizes:
+            expected, serializer_time = self._measure(serializer_path, size, repeat)
+            content, compiled_time = self._measure(compiled_path, size, repeat)
+
+            self.stdout.write(
+                f'{size:>8} {serializer_time * 1000:>10.1f}ms {compiled_time * 1000:>10.1f}ms '
+                f'{serializer_time / compiled_time:>7.1f}x  {"sim" if content == expected else "NÃO"}'
+            )
+
+    def _measure(self, function, size, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Remove as chaves Idempotency-Key expiradas'
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.purge_expired()
+        
+        self.stdout.write(self.style.SUCCESS(f'{deleted} chaves expiradas removidas.'))
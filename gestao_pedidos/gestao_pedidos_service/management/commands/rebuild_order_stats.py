@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...models import DailyOrderStats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as estatísticas diárias de pedidos a partir da tabela de pedidos'
+
+    def handle(self, *args, **options):
+        rows = DailyOrderStats.rebuild()
+        
+        self.stdout.write(self.style.SUCCESS(f'{rows} linhas de estatísticas recalculadas.'))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_pedidos_service', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('key', models.CharField(blank=True, max_length=100, verbose_name='Chave de Ordenação')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('payload', models.JSONField(default=dict, verbose_name='Corpo')),
+                ('headers', models.JSONField(blank=True, default=dict, verbose_name='Cabeçalhos')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sent', 'Enviada'), ('failed', 'Falhou')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima Tentativa')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviada em')),
+            ],
+            options={
+                'verbose_name': 'Mensagem da Outbox',
+                'verbose_name_plural': 'Mensagens da Outbox',
+                'db_table': 'outbox_messages',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at'], name='outbox_messages_due'), models.Index(fields=['key', 'id'], name='outbox_mess_key_d34788_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:35
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_stats(apps, schema_editor):
+    DailyOrderStats = apps.get_model('gestao_pedidos_service', 'DailyOrderStats')
+    Order = apps.get_model('gestao_pedidos_service', 'Order')
+    OrderItem = apps.get_model('gestao_pedidos_service', 'OrderItem')
+    
+    stats = {}
+    orders = (
+        Order.objects.order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(orders_count=Count('id'), revenue=Sum('total'))
+    )
+    for row in orders:
+        stats[row['day'], row['status']] = DailyOrderStats(
+            day=row['day'],
+            status=row['status'],
+            orders_count=row['orders_count'],
+            revenue=row['revenue'],
+        )
+    
+    items = (
+        OrderItem.objects.order_by()
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'order__status')
+        .annotate(items_sold=Sum('quantity'))
+    )
+    for row in items:
+        stats[row['day'], row['order__status']].items_sold = row['items_sold']
+    
+    DailyOrderStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_pedidos_service', '0002_outbox_messages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('confirmed', 'Confirmado'), ('processing', 'Em Processamento'), ('shipped', 'Enviado'), ('delivered', 'Entregue'), ('cancelled', 'Cancelado')], max_length=20, verbose_name='Status')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Pedidos')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Valor Total')),
+                ('items_sold', models.IntegerField(default=0, verbose_name='Itens')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estatística Diária de Pedidos',
+                'verbose_name_plural': 'Estatísticas Diárias de Pedidos',
+                'db_table': 'daily_order_stats',
+                'ordering': ['day', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'status'), name='daily_order_stats_day_status')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:37
+
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_pedidos_service', '0003_daily_order_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(verbose_name='ID do Usuário')),
+                ('key', models.CharField(max_length=255, verbose_name='Chave')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Impressão da Requisição')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status da Resposta')),
+                ('response', models.JSONField(blank=True, encoder=rest_framework.utils.encoders.JSONEncoder, null=True, verbose_name='Resposta')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira em')),
+            ],
+            options={
+                'verbose_name': 'Chave de Idempotência',
+                'verbose_name_plural': 'Chaves de Idempotência',
+                'db_table': 'idempotency_keys',
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_expires_6c9d28_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_id', 'key'), name='idempotency_keys_user_key')],
+            },
+        ),
+    ]
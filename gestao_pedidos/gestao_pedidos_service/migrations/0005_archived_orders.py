@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_pedidos_service', '0004_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(verbose_name='ID do Usuário')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('confirmed', 'Confirmado'), ('processing', 'Em Processamento'), ('shipped', 'Enviado'), ('delivered', 'Entregue'), ('cancelled', 'Cancelado')], max_length=20, verbose_name='Status')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Total')),
+                ('items_count', models.IntegerField(default=0, verbose_name='Itens')),
+                ('created_at', models.DateTimeField(verbose_name='Criado em')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')),
+                ('data', models.BinaryField(verbose_name='Pedido Compactado')),
+            ],
+            options={
+                'verbose_name': 'Pedido Arquivado',
+                'verbose_name_plural': 'Pedidos Arquivados',
+                'db_table': 'archived_orders',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user_id'], name='archived_or_user_id_60f775_idx'), models.Index(fields=['created_at'], name='archived_or_created_e8d404_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_pedidos_service', '0005_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Em Processamento até'),
+        ),
+    ]
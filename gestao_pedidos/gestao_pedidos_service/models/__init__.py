@@ -1 +1,5 @@
-from .order import *
\ No newline at end of file
+from .order import *
+from .outbox import *
+from .stats import *
+from .idempotency import *
+from .archive import *
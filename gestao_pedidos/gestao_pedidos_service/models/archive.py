@@ -0,0 +1,57 @@
+import json
+import zlib
+
+from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
+
+from .order import ORDER_STATUS_CHOICES
+
+
+class ArchivedOrder(models.Model):
+    """
+    Pedido finalizado (entregue ou cancelado) retirado das tabelas quentes.
+
+    O pedido, seus itens e o histórico ficam em ``data`` como a representação
+    de detalhe compactada com zlib; as colunas ao lado são as usadas para
+    localizar o pedido e recalcular as estatísticas.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    user_id = models.IntegerField(verbose_name='ID do Usuário')
+    status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, verbose_name='Status')
+    total = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Total')
+    items_count = models.IntegerField(default=0, verbose_name='Itens')
+    created_at = models.DateTimeField(verbose_name='Criado em')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')
+    data = models.BinaryField(verbose_name='Pedido Compactado')
+
+    class Meta:
+        db_table = 'archived_orders'
+        verbose_name = 'Pedido Arquivado'
+        verbose_name_plural = 'Pedidos Arquivados'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user_id']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"Pedido arquivado #{str(self.id)[:8]}"
+
+    @classmethod
+    def from_representation(cls, order, representation):
+        return cls(
+            id=order.id,
+            user_id=order.user_id,
+            status=order.status,
+            total=order.total,
+            items_count=order.items_count,
+            created_at=order.created_at,
+            data=zlib.compress(json.dumps(representation, cls=JSONEncoder).encode()),
+        )
+
+    def representation(self, fields=None):
+        """Representação de detalhe gravada; ``fields`` restringe as chaves devolvidas."""
+        data = json.loads(zlib.decompress(self.data))
+        if fields is None:
+            return data
+        return {name: value for name, value in data.items() if name in fields}
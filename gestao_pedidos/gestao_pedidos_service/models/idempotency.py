@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class IdempotencyKey(models.Model):
+    """
+    Resultado de uma requisição identificada pelo cabeçalho ``Idempotency-Key``.
+
+    A chave é reservada (sem resposta) antes de a requisição ser processada e
+    recebe o status e o corpo da resposta ao final. Repetições com a mesma
+    chave e o mesmo corpo recebem a resposta gravada; enquanto a primeira
+    ainda está em andamento, recebem 409. As chaves valem por
+    ``IDEMPOTENCY_KEY_TTL`` segundos e são escopadas por usuário.
+
+    O processamento tem um prazo (``locked_until``, de
+    ``IDEMPOTENCY_LOCK_TIMEOUT`` segundos): se o processo que reservou a
+    chave morrer sem gravar a resposta, uma repetição depois do prazo
+    assume a chave em vez de receber 409 até ela expirar.
+    """
+    id = models.BigAutoField(primary_key=True)
+    user_id = models.IntegerField(verbose_name='ID do Usuário')
+    key = models.CharField(max_length=255, verbose_name='Chave')
+    fingerprint = models.CharField(max_length=64, verbose_name='Impressão da Requisição')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Status da Resposta')
+    response = models.JSONField(null=True, blank=True, encoder=JSONEncoder, verbose_name='Resposta')
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='Em Processamento até')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    expires_at = models.DateTimeField(verbose_name='Expira em')
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = 'Chave de Idempotência'
+        verbose_name_plural = 'Chaves de Idempotência'
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'key'], name='idempotency_keys_user_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
+
+    @property
+    def is_completed(self):
+        return self.status_code is not None
+
+    @classmethod
+    def ttl(cls):
+        return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 86400))
+
+    @classmethod
+    def lock_timeout(cls):
+        return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+    @classmethod
+    def reserve(cls, user_id, key, fingerprint):
+        """
+        Reserva a chave. Devolve ``(registro, criado)``: se a chave já existia
+        e não expirou, ``criado`` é False e o registro é o da primeira
+        requisição, a não ser que ela tenha ficado sem resposta além do prazo
+        de processamento; nesse caso a chave é assumida (``criado`` True).
+        """
+        now = timezone.now()
+
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(
+                        user_id=user_id,
+                        key=key,
+                        fingerprint=fingerprint,
+                        locked_until=now + cls.lock_timeout(),
+                        expires_at=now + cls.ttl()
+                    ), True
+            except IntegrityError:
+                pass
+
+            existing = cls.objects.filter(user_id=user_id, key=key).first()
+            if existing is None:
+                continue
+            if existing.expires_at > now:
+                if existing.is_completed or existing.fingerprint != fingerprint:
+                    return existing, False
+                if existing.locked_until and existing.locked_until > now:
+                    return existing, False
+
+                # Processamento abandonado: só uma das repetições assume a chave
+                locked_until = now + cls.lock_timeout()
+                taken = cls.objects.filter(
+                    pk=existing.pk,
+                    status_code__isnull=True,
+                    locked_until=existing.locked_until
+                ).update(locked_until=locked_until)
+                if taken:
+                    existing.locked_until = locked_until
+                    return existing, True
+
+                existing.refresh_from_db()
+                return existing, False
+
+            # Chave expirada: libera para a nova requisição
+            cls.objects.filter(pk=existing.pk, expires_at__lte=now).delete()
+
+        raise IntegrityError('Não foi possível reservar a chave de idempotência.')
+
+    def _owned(self):
+        # Se outra requisição assumiu a chave, o prazo gravado é outro
+        return type(self).objects.filter(pk=self.pk, status_code__isnull=True, locked_until=self.locked_until)
+
+    def complete(self, status_code, response):
+        self.status_code = status_code
+        self.response = response
+        self._owned().update(status_code=status_code, response=response, locked_until=None)
+
+    def release(self):
+        self._owned().delete()
+
+    @classmethod
+    def purge_expired(cls):
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import uuid
@@ -93,16 +95,94 @@ class Order(models.Model):
     def __str__(self):
         return f"Pedido #{str(self.id)[:8]} - {self.user_name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = (instance.__dict__.get('status'), instance.__dict__.get('total'))
+        return instance
+    
+    @classmethod
+    def lock(cls, pk):
+        """
+        Relê o pedido com bloqueio de escrita até o fim da transação.
+        
+        Status e total passam a ser os confirmados no banco, então a mudança
+        registrada nas estatísticas diárias parte do valor correto mesmo com
+        atualizações simultâneas. O SQLite ignora ``select_for_update``: lá
+        uma escrita sem efeito toma o bloqueio antes da leitura.
+        """
+        queryset = cls.objects.filter(pk=pk)
+        if not connection.features.has_select_for_update:
+            queryset.update(status=F('status'))
+        return queryset.select_for_update().get()
+    
     def save(self, *args, **kwargs):
         self.total = self.subtotal + self.shipping_cost - self.discount
-        super().save(*args, **kwargs)
+        
+        loaded = getattr(self, '_loaded', (None, None))
+        if self._state.adding or None in loaded or loaded == (self.status, self.total):
+            super().save(*args, **kwargs)
+            return
+        
+        # Mudança de status ou de valor: o pedido é movido nas estatísticas diárias
+        from .stats import DailyOrderStats
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            DailyOrderStats.order_changed(self, *loaded, self.items_count)
+        self._loaded = (self.status, self.total)
+    
+    @classmethod
+    def create_with_items(cls, items, changed_by=None, **fields):
+        """
+        Cria o pedido, os itens e o histórico inicial em uma única transação,
+        com um INSERT por tabela independentemente do número de itens.
+        """
+        from .stats import DailyOrderStats
+        
+        items = [OrderItem(**item) for item in items]
+        for item in items:
+            item.subtotal = item.unit_price * item.quantity
+        
+        with transaction.atomic():
+            order = cls(subtotal=sum(item.subtotal for item in items), **fields)
+            order.save(force_insert=True)
+            
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+            
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(
+                    order=order,
+                    from_status=PENDING,
+                    to_status=PENDING,
+                    comment='Pedido criado',
+                    changed_by=changed_by
+                )
+            ])
+            
+            DailyOrderStats.order_created(order, sum(item.quantity for item in items))
+        
+        return order
     
     @property
     def order_number(self):
         return str(self.id)[:8].upper()
     
+    @classmethod
+    def with_items_count(cls, queryset):
+        """Anota ``items_quantity`` (soma das quantidades) com uma subconsulta avaliada só para as linhas devolvidas."""
+        items_quantity = OrderItem.objects.filter(
+            order=OuterRef('pk')
+        ).order_by().values('order').annotate(total=Sum('quantity')).values('total')
+        
+        return queryset.annotate(items_quantity=Coalesce(Subquery(items_quantity), 0))
+    
     @property
     def items_count(self):
+        if hasattr(self, 'items_quantity'):
+            return self.items_quantity
         return sum(item.quantity for item in self.items.all())
     
     @property
@@ -0,0 +1,73 @@
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    Chamada a outro serviço gravada na mesma transação da alteração que a
+    originou (outbox transacional).
+
+    A chamada só existe se a transação for confirmada, e o despachante a
+    repete até receber uma resposta de sucesso. Mensagens com a mesma
+    ``key`` (ex.: o id do pedido) são entregues na ordem em que foram
+    gravadas: enquanto uma anterior estiver pendente ou tiver falhado, as
+    seguintes esperam.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pendente'),
+        (SENT, 'Enviada'),
+        (FAILED, 'Falhou'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    key = models.CharField(max_length=100, blank=True, verbose_name='Chave de Ordenação')
+    url = models.URLField(max_length=500, verbose_name='URL')
+    payload = models.JSONField(default=dict, verbose_name='Corpo')
+    headers = models.JSONField(default=dict, blank=True, verbose_name='Cabeçalhos')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, verbose_name='Status')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Tentativas')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Próxima Tentativa')
+    last_error = models.TextField(blank=True, verbose_name='Último Erro')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Enviada em')
+
+    class Meta:
+        db_table = 'outbox_messages'
+        verbose_name = 'Mensagem da Outbox'
+        verbose_name_plural = 'Mensagens da Outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=Q(status='pending'), name='outbox_messages_due'),
+            models.Index(fields=['key', 'id']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} POST {self.url} ({self.get_status_display()})"
+
+    @classmethod
+    def enqueue(cls, url, payload, headers=None, key=''):
+        """Grava a chamada; o despachante é acordado quando a transação atual for confirmada."""
+        from ..outbox import outbox_dispatcher
+
+        message = cls.objects.create(url=url, payload=payload, headers=headers or {}, key=key)
+        transaction.on_commit(outbox_dispatcher.wake)
+        return message
+
+    @classmethod
+    def due(cls, now=None):
+        """Mensagens pendentes que já podem ser enviadas, respeitando a ordem por ``key``."""
+        blocked = cls.objects.filter(
+            key=OuterRef('key'),
+            id__lt=OuterRef('id'),
+            status__in=[cls.PENDING, cls.FAILED],
+        ).exclude(key='')
+
+        return cls.objects.filter(
+            status=cls.PENDING,
+            next_attempt_at__lte=now or timezone.now(),
+        ).exclude(Exists(blocked)).order_by('id')
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .archive import ArchivedOrder
+from .order import (
+    ORDER_STATUS_CHOICES,
+    CONFIRMED,
+    PROCESSING,
+    SHIPPED,
+    DELIVERED,
+    Order,
+    OrderItem,
+)
+
+
+# Status cujos pedidos entram no faturamento
+REVENUE_STATUSES = (CONFIRMED, PROCESSING, SHIPPED, DELIVERED)
+
+GRANULARITIES = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+class DailyOrderStats(models.Model):
+    """
+    Agregados diários dos pedidos por status.
+
+    O dia é o da criação do pedido (fuso local). A criação soma o pedido na
+    linha (dia, pendente) e cada mudança de status ou de total o move para a
+    linha do novo status no mesmo dia, então as estatísticas são lidas daqui
+    sem varrer a tabela de pedidos. ``rebuild`` recalcula tudo a partir dos
+    pedidos.
+    """
+    day = models.DateField(verbose_name='Dia')
+    status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, verbose_name='Status')
+    orders_count = models.IntegerField(default=0, verbose_name='Pedidos')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name='Valor Total')
+    items_sold = models.IntegerField(default=0, verbose_name='Itens')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        db_table = 'daily_order_stats'
+        verbose_name = 'Estatística Diária de Pedidos'
+        verbose_name_plural = 'Estatísticas Diárias de Pedidos'
+        ordering = ['day', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='daily_order_stats_day_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders_count}"
+
+    @classmethod
+    def order_created(cls, order, items_sold):
+        cls._add(timezone.localdate(order.created_at), order.status, 1, order.total, items_sold)
+
+    @classmethod
+    def order_changed(cls, order, from_status, from_total, items_sold):
+        day = timezone.localdate(order.created_at)
+        cls._add(day, from_status, -1, -from_total, -items_sold)
+        cls._add(day, order.status, 1, order.total, items_sold)
+
+    @classmethod
+    def _add(cls, day, status, orders, revenue, items_sold):
+        values = {
+            'orders_count': F('orders_count') + orders,
+            'revenue': F('revenue') + revenue,
+            'items_sold': F('items_sold') + items_sold,
+            'updated_at': timezone.now(),
+        }
+
+        if cls.objects.filter(day=day, status=status).update(**values):
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(day=day, status=status, orders_count=orders, revenue=revenue, items_sold=items_sold)
+        except IntegrityError:
+            # Outra transação criou a linha do dia nesse meio-tempo
+            cls.objects.filter(day=day, status=status).update(**values)
+
+    @classmethod
+    def rebuild(cls):
+        """Recalcula todos os agregados a partir dos pedidos (inclusive os arquivados); devolve o número de linhas."""
+        stats = {}
+
+        orders = (
+            Order.objects.order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'status')
+            .annotate(orders_count=Count('id'), revenue=Sum('total'))
+        )
+        for row in orders:
+            stats[row['day'], row['status']] = cls(
+                day=row['day'],
+                status=row['status'],
+                orders_count=row['orders_count'],
+                revenue=row['revenue'],
+            )
+
+        items = (
+            OrderItem.objects.order_by()
+            .annotate(day=TruncDate('order__created_at'))
+            .values('day', 'order__status')
+            .annotate(items_sold=Sum('quantity'))
+        )
+        for row in items:
+            stats[row['day'], row['order__status']].items_sold = row['items_sold']
+
+        archived = (
+            ArchivedOrder.objects.order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'status')
+            .annotate(orders_count=Count('id'), revenue=Sum('total'), items_sold=Sum('items_count'))
+        )
+        for row in archived:
+            row_stats = stats.setdefault((row['day'], row['status']), cls(day=row['day'], status=row['status']))
+            row_stats.orders_count += row['orders_count']
+            row_stats.revenue += row['revenue']
+            row_stats.items_sold += row['items_sold']
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(stats.values(), batch_size=1000)
+
+        return len(stats)
+
+    @classmethod
+    def summarize(cls, date_from=None, date_to=None, granularity=None):
+        """Totais por status no intervalo e, se pedida, a série por dia, semana ou mês."""
+        queryset = cls.objects.order_by()
+        if date_from:
+            queryset = queryset.filter(day__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(day__lte=date_to)
+
+        totals = {'orders': 0, 'revenue': Decimal('0.00'), 'items_sold': 0, 'by_status': {}}
+        for row in cls._aggregate(queryset.values('status')):
+            cls._accumulate(totals, row)
+
+        if granularity is None:
+            return totals, None
+
+        trunc = GRANULARITIES[granularity]
+        period = trunc('day') if trunc else F('day')
+
+        periods = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0.00'), 'items_sold': 0, 'by_status': {}})
+        for row in cls._aggregate(queryset.annotate(period=period).values('period', 'status')):
+            cls._accumulate(periods[row['period']], row)
+
+        return totals, [{'period': day, **values} for day, values in sorted(periods.items())]
+
+    @staticmethod
+    def _aggregate(queryset):
+        return queryset.annotate(
+            total_orders=Sum('orders_count'),
+            total_revenue=Sum('revenue'),
+            total_items=Sum('items_sold'),
+        )
+
+    @staticmethod
+    def _accumulate(summary, row):
+        summary['by_status'][row['status']] = row['total_orders']
+        summary['orders'] += row['total_orders']
+
+        if row['status'] in REVENUE_STATUSES:
+            summary['revenue'] += row['total_revenue']
+            summary['items_sold'] += row['total_items']
@@ -0,0 +1,85 @@
+from datetime import datetime
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+
+
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPaginator:
+    """
+    Paginação por chave (``created_at``, ``id``), do mais recente para o mais antigo.
+
+    Em vez de OFFSET, cada página continua a partir do último pedido da
+    anterior, então o custo de uma página não cresce com a posição e pedidos
+    criados durante a navegação não deslocam os resultados. O cursor da
+    próxima página vai no cabeçalho ``X-Next-Cursor``; o corpo continua sendo
+    a lista de pedidos.
+    """
+
+    ordering = ('-created_at', '-id')
+    default_page_size = 20
+    max_page_size = 100
+
+    def __init__(self, request):
+        params = request.query_params
+        self.cursor = params.get('cursor')
+
+        try:
+            self.page_size = min(max(int(params.get('page_size', self.default_page_size)), 1), self.max_page_size)
+        except ValueError:
+            self.page_size = self.default_page_size
+
+        self.next_cursor = None
+
+    def paginate(self, queryset, evaluate=None):
+        """
+        Devolve as linhas da página. ``evaluate`` transforma o queryset já
+        filtrado em outro (ex.: ``.values()``) cujas linhas tenham ``created_at`` e ``id``.
+        """
+        queryset = queryset.order_by(*self.ordering)
+
+        if self.cursor:
+            created_at, pk = self.decode(self.cursor)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        if evaluate is not None:
+            queryset = evaluate(queryset)
+
+        rows = list(queryset[:self.page_size + 1])
+
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = self.encode(rows[-1])
+
+        return rows
+
+    def add_headers(self, response):
+        if self.next_cursor:
+            response['X-Next-Cursor'] = self.next_cursor
+        return response
+
+    @staticmethod
+    def encode(row):
+        if isinstance(row, dict):
+            created_at, pk = row['created_at'], row['id']
+        else:
+            created_at, pk = row.created_at, row.id
+
+        value = json.dumps([created_at.isoformat(), str(pk)])
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(created_at), uuid.UUID(pk)
+        except (ValueError, TypeError, AttributeError):
+            raise InvalidCursor('Cursor inválido.')
@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+import requests
+
+from .outbox import service_headers
+
+logger = logging.getLogger(__name__)
+
+
+# Campos do produto usados para montar os itens do pedido
+PRODUCT_FIELDS = ('id', 'sku', 'name', 'price', 'stock', 'is_in_stock', 'main_image_url')
+
+# Limite de produtos por consulta aceito pelo bulk/ do serviço de produtos
+BULK_MAX_ITEMS = 500
+
+
+class ProductsServiceError(Exception):
+    """O serviço de produtos não respondeu a tempo ou respondeu com erro."""
+
+
+class StockReservationError(Exception):
+    """O serviço de produtos recusou a reserva (produto inexistente ou sem estoque)."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _products_url():
+    return getattr(settings, 'PRODUCTS_SERVICE_URL', 'http://gestao-produtos-service:8002')
+
+
+def _timeout():
+    return getattr(settings, 'PRODUCTS_SERVICE_TIMEOUT', 5)
+
+
+class ProductCache:
+    """
+    Cópia local dos produtos consultados recentemente (preço, nome, SKU,
+    imagem e estoque como indicação).
+
+    LRU limitado a ``PRODUCT_CACHE_MAX_SIZE`` produtos, cada um válido por
+    ``PRODUCT_CACHE_TTL`` segundos. Uma thread acompanha o feed ``changes/``
+    do serviço de produtos e descarta os produtos alterados; o TTL limita a
+    defasagem se o feed estiver indisponível. O estoque daqui é apenas uma
+    indicação: a reserva no serviço de produtos continua sendo a verificação
+    definitiva.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._generation = 0
+        self.version = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'PRODUCT_CACHE_TTL', 30)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'PRODUCT_CACHE_MAX_SIZE', 2000)
+
+    @property
+    def sync_interval(self):
+        return getattr(settings, 'PRODUCT_CACHE_SYNC_INTERVAL', 2)
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get_many(self, product_ids):
+        """Devolve ``{id: produto}`` dos produtos em cache ainda válidos."""
+        now = time.monotonic()
+        found = {}
+
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._entries.get(product_id)
+                if entry is None:
+                    continue
+
+                expires_at, product = entry
+                if expires_at <= now:
+                    del self._entries[product_id]
+                    continue
+
+                self._entries.move_to_end(product_id)
+                found[product_id] = product
+
+        return found
+
+    def set_many(self, products, generation):
+        """
+        Guarda os produtos buscados. ``generation`` é a de antes da busca: se
+        o feed descartou algo nesse meio-tempo, a resposta pode estar
+        defasada e não é guardada.
+        """
+        expires_at = time.monotonic() + self.ttl
+
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            for product_id, product in products.items():
+                self._entries[product_id] = (expires_at, product)
+                self._entries.move_to_end(product_id)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            self._generation += 1
+            for product_id in product_ids:
+                self._entries.pop(product_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def sync(self):
+        """Aplica o feed de alterações do serviço de produtos."""
+        params = {'since': self.version} if self.version is not None else {}
+
+        response = requests.get(
+            f'{_products_url()}/api/v1/produtos/changes/',
+            params=params,
+            timeout=_timeout()
+        )
+        response.raise_for_status()
+        changes = response.json()
+
+        if changes['reset']:
+            self.clear()
+        else:
+            self.invalidate(changes['product_ids'])
+
+        self.version = changes['version']
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='product-cache-sync',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sync()
+            except (requests.RequestException, ValueError, KeyError):
+                logger.warning('Falha ao sincronizar o cache de produtos', exc_info=True)
+
+            self._stopped.wait(self.sync_interval)
+
+
+product_cache = ProductCache()
+
+
+def fetch_products(product_ids):
+    """
+    Busca vários produtos, primeiro no cache local e depois, para os que
+    faltarem, em uma única chamada ao ``bulk/`` do serviço de produtos, com
+    um único prazo para a resposta. Devolve ``{id: produto}``; produtos
+    inexistentes ou inativos ficam de fora do dicionário.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return {}
+
+    if len(product_ids) > BULK_MAX_ITEMS:
+        raise ValueError(f'Máximo de {BULK_MAX_ITEMS} produtos por consulta.')
+
+    product_cache.start()
+    products = product_cache.get_many(product_ids)
+    missing = [product_id for product_id in product_ids if product_id not in products]
+
+    if not missing:
+        return products
+
+    generation = product_cache.generation
+
+    try:
+        response = requests.get(
+            f'{_products_url()}/api/v1/produtos/bulk/',
+            params={
+                'ids': ','.join(map(str, missing)),
+                'fields': ','.join(PRODUCT_FIELDS),
+            },
+            timeout=_timeout()
+        )
+        response.raise_for_status()
+        fetched = response.json()['products']
+    except (requests.RequestException, ValueError, KeyError) as e:
+        raise ProductsServiceError(str(e)) from e
+
+    fetched = {int(product_id): product for product_id, product in fetched.items()}
+    product_cache.set_many(fetched, generation)
+
+    products.update(fetched)
+    return products
+
+
+def reserve_stock(reference, quantities):
+    """
+    Reserva no serviço de produtos, tudo ou nada, as quantidades ``{id:
+    quantidade}`` sob a referência (o id do pedido). A reserva é idempotente
+    pela referência no serviço de produtos, então repeti-la é inofensivo.
+    """
+    try:
+        response = requests.post(
+            f'{_products_url()}/api/v1/produtos/reserve-stock/',
+            json={
+                'items': [
+                    {'product_id': product_id, 'quantity': quantity}
+                    for product_id, quantity in quantities.items()
+                ],
+                'reference': str(reference),
+            },
+            headers=service_headers(),
+            timeout=_timeout()
+        )
+    except requests.RequestException as e:
+        raise ProductsServiceError(str(e)) from e
+
+    if response.status_code in (400, 404):
+        try:
+            message = response.json()['error']
+        except (ValueError, KeyError, TypeError):
+            message = 'Não foi possível reservar o estoque.'
+        raise StockReservationError(message, response.status_code)
+
+    if response.status_code >= 400:
+        raise ProductsServiceError(f'HTTP {response.status_code}')
@@ -0,0 +1,130 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+import operator
+import re
+
+
+
+
+DISPLAY_SOURCE = re.compile(r'^get_(?P<field>\w+)_display$')
+
+
+class CompiledSerializer:
+    """
+    Caminho de serialização somente leitura a partir de linhas de ``.values()``.
+
+    A árvore de campos do serializer é montada uma única vez e cada campo vira
+    um acessor pré-calculado (coluna lida + ``to_representation`` do próprio
+    campo), sem instâncias de modelo, ``get_attribute`` ou ``ReturnDict`` por
+    linha. O resultado é idêntico ao do serializer original.
+
+    Campos que não vêm de uma coluna (propriedades do modelo e
+    ``SerializerMethodField``) são declarados em ``computed`` como
+    ``nome: (colunas, função(linha))``. Para campos comuns a função devolve o
+    valor bruto, que ainda passa pelo ``to_representation`` do campo; para
+    ``SerializerMethodField`` devolve o valor final.
+    """
+
+    def __init__(self, serializer_class, computed=None, context=None):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.columns = []
+        self.accessors = []
+
+        computed = computed or {}
+        fields = serializer_class(context=context or {}).fields
+
+        for name, field in fields.items():
+            if field.write_only:
+                continue
+
+            if name in computed:
+                columns, function = computed[name]
+                self.use_columns(*columns)
+                accessor = self._compile_computed(field, function)
+            else:
+                accessor = self._compile_field(field)
+
+            self.accessors.append((name, accessor))
+
+    def use_columns(self, *columns):
+        for column in columns:
+            if column not in self.columns:
+                self.columns.append(column)
+
+    def values(self, queryset):
+        """Linhas com as colunas necessárias para a representação."""
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def serialize(self, rows):
+        accessors = self.accessors
+        return [
+            {name: accessor(row) for name, accessor in accessors}
+            for row in rows
+        ]
+
+    def _compile_computed(self, field, function):
+        if isinstance(field, serializers.SerializerMethodField):
+            return function
+
+        to_representation = field.to_representation
+
+        def accessor(row):
+            value = function(row)
+            return None if value is None else to_representation(value)
+
+        return accessor
+
+    def _compile_field(self, field):
+        source = field.source
+
+        match = DISPLAY_SOURCE.match(source)
+        if match:
+            return self._compile_display(field, match.group('field'))
+
+        parts = source.split('.')
+        try:
+            model_field = self.model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            raise ValueError(
+                f'O campo "{field.field_name}" não vem de uma coluna e precisa ser declarado em computed.'
+            )
+
+        if len(parts) > 1 and model_field.null:
+            raise ValueError(
+                f'O campo "{field.field_name}" atravessa uma relação opcional e não pode ser compilado.'
+            )
+
+        if isinstance(field, serializers.FileField):
+            raise ValueError(f'O campo "{field.field_name}" é um arquivo e precisa ser declarado em computed.')
+
+        column = '__'.join(parts)
+        self.use_columns(column)
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            return operator.itemgetter(column)
+
+        if isinstance(field, serializers.DateTimeField) and not hasattr(field, 'timezone'):
+            # Fixa o fuso atual uma vez, em vez de consultá-lo a cada linha
+            field.timezone = field.default_timezone()
+
+        to_representation = field.to_representation
+
+        def accessor(row):
+            value = row[column]
+            return None if value is None else to_representation(value)
+
+        return accessor
+
+    def _compile_display(self, field, column):
+        choices = dict(self.model._meta.get_field(column).flatchoices)
+        to_representation = field.to_representation
+        self.use_columns(column)
+
+        def accessor(row):
+            value = row[column]
+            display = choices.get(value, value)
+            return None if display is None else to_representation(str(display))
+
+        return accessor
@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from decimal import Decimal
 #import requests
+import operator
 import os
 
 from ..models import Order, OrderItem, OrderStatusHistory
+from .compiled import CompiledSerializer
+from .sparse import SparseFieldsetMixin
 
 
 
@@ -52,7 +55,23 @@ class OrderListSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('id', 'order_number', 'created_at')
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class CompiledOrderListSerializer(CompiledSerializer):
+    """OrderListSerializer compilado; a quantidade de itens vem de uma anotação."""
+    
+    def __init__(self, context=None):
+        super().__init__(
+            OrderListSerializer,
+            computed={
+                'order_number': (('id',), lambda row: str(row['id'])[:8].upper()),
+                'items_count': (('items_quantity',), operator.itemgetter('items_quantity')),
+            },
+            context=context
+        )
+    
+    def values(self, queryset):
+        return super().values(Order.with_items_count(queryset))
+
+class OrderDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     order_number = serializers.CharField(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
@@ -65,6 +84,14 @@ class OrderDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
+        expandable_fields = ('items', 'status_history')
+        field_sources = {
+            'order_number': ('id',),
+            'items_count': (),
+            'can_be_cancelled': ('status',),
+            'is_completed': ('status',),
+            'is_cancelled': ('status',),
+        }
         read_only_fields = (
             'id',
             'order_number',
@@ -108,6 +135,10 @@ class OrderCreateSerializer(serializers.Serializer):
     def validate_items(self, value):
         if not value:
             raise serializers.ValidationError('O pedido deve ter pelo menos um item.')
+        
+        if len(value) > 200:
+            raise serializers.ValidationError('Máximo de 200 itens por pedido.')
+        
         return value
     
     def validate(self, attrs):
@@ -1,3 +1,859 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+import requests
+
+from .archive import archive_orders
+from .models import (
+    ArchivedOrder,
+    DailyOrderStats,
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    OrderStatusHistory,
+    OutboxMessage,
+    PENDING,
+    CONFIRMED,
+    SHIPPED,
+    DELIVERED,
+    CANCELLED,
+)
+from .products import ProductsServiceError, StockReservationError, fetch_products, product_cache
+from .serializers import CompiledOrderListSerializer, OrderDetailSerializer, OrderListSerializer
+from .views.order_view import OrderViewSet
+
+
+CUSTOMER_HEADERS = {
+    'HTTP_X_FORWARDED_FROM_GATEWAY': '1',
+    'HTTP_X_USER_ID': '2',
+    'HTTP_X_USER_ROLE': 'customer',
+    'HTTP_X_USER_NOME': 'Ana',
+    'HTTP_X_USER_EMAIL': 'ana@example.com',
+}
+
+ADMIN_HEADERS = {
+    'HTTP_X_FORWARDED_FROM_GATEWAY': '1',
+    'HTTP_X_USER_ID': '1',
+    'HTTP_X_USER_ROLE': 'admin',
+}
+
+SHIPPING = {
+    'shipping_street': 'Rua A',
+    'shipping_number': '10',
+    'shipping_neighborhood': 'Centro',
+    'shipping_city': 'São Paulo',
+    'shipping_state': 'SP',
+    'shipping_zip_code': '01001000',
+}
+
+PRODUCTS = {
+    1: {'id': 1, 'sku': 'S1', 'name': 'Produto 1', 'price': '10.00', 'stock': 5, 'is_in_stock': True, 'main_image_url': None},
+}
+
+
+class OutboxMessageDueTests(TestCase):
+    def enqueue(self, key='', **fields):
+        message = OutboxMessage.objects.create(url='http://service/api/', key=key)
+        if fields:
+            OutboxMessage.objects.filter(pk=message.pk).update(**fields)
+        return message
+
+    def due_ids(self):
+        return list(OutboxMessage.due().values_list('id', flat=True))
+
+    def test_due_messages_are_returned_in_insertion_order(self):
+        messages = [self.enqueue(key) for key in ('b', 'a', '', 'c')]
+
+        self.assertEqual(self.due_ids(), sorted(message.id for message in messages))
+
+    def test_later_message_waits_for_pending_or_failed_message_with_same_key(self):
+        first = self.enqueue('order-1')
+        second = self.enqueue('order-1')
+        other = self.enqueue('order-2')
+
+        self.assertEqual(self.due_ids(), [first.id, other.id])
+
+        OutboxMessage.objects.filter(pk=first.pk).update(status=OutboxMessage.FAILED)
+        self.assertEqual(self.due_ids(), [other.id])
+
+        OutboxMessage.objects.filter(pk=first.pk).update(status=OutboxMessage.SENT)
+        self.assertEqual(self.due_ids(), [second.id, other.id])
+
+    def test_blocked_while_earlier_message_is_backing_off(self):
+        first = self.enqueue('order-1', next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.enqueue('order-1')
+
+        self.assertEqual(self.due_ids(), [])
+        self.assertEqual(
+            list(OutboxMessage.due(timezone.now() + timedelta(minutes=10)).values_list('id', flat=True)),
+            [first.id]
+        )
+
+    def test_messages_without_key_are_not_ordered_among_themselves(self):
+        self.enqueue(status=OutboxMessage.FAILED)
+        second = self.enqueue()
+
+        self.assertEqual(self.due_ids(), [second.id])
+
+
+class IdempotencyKeyLockTests(TestCase):
+    def expire_lock(self, record):
+        IdempotencyKey.objects.filter(pk=record.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_key_in_progress_is_not_taken_over_before_the_lock_expires(self):
+        IdempotencyKey.reserve(2, 'key', 'fingerprint')
+
+        record, created = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+
+        self.assertFalse(created)
+        self.assertFalse(record.is_completed)
+
+    def test_abandoned_key_is_taken_over_once_after_the_lock_expires(self):
+        abandoned, _ = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+        self.expire_lock(abandoned)
+
+        record, created = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+        _, created_again = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+
+        self.assertTrue(created)
+        self.assertEqual(record.pk, abandoned.pk)
+        self.assertGreater(record.locked_until, timezone.now())
+        self.assertFalse(created_again)
+
+    def test_abandoned_key_is_not_taken_over_by_a_different_request(self):
+        abandoned, _ = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+        self.expire_lock(abandoned)
+
+        record, created = IdempotencyKey.reserve(2, 'key', 'other')
+
+        self.assertFalse(created)
+        self.assertEqual(record.fingerprint, 'fingerprint')
+
+    def test_previous_owner_cannot_complete_a_key_taken_over(self):
+        abandoned, _ = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+        abandoned.locked_until = timezone.now() - timedelta(seconds=1)
+        IdempotencyKey.objects.filter(pk=abandoned.pk).update(locked_until=abandoned.locked_until)
+        record, _ = IdempotencyKey.reserve(2, 'key', 'fingerprint')
+
+        abandoned.complete(201, {'order': 'old'})
+        abandoned.release()
+        record.complete(201, {'order': 'new'})
+
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.response, {'order': 'new'})
+        self.assertIsNone(record.locked_until)
+
+
+@override_settings(PRODUCTS_SERVICE_URL='http://products', SERVICE_TOKEN='service-token')
+class OrderCreateStockReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        patcher = mock.patch('gestao_pedidos_service.views.order_view.fetch_products', return_value=PRODUCTS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_order(self):
+        return self.client.post(
+            '/api/v1/orders/create/',
+            {'items': [{'product_id': 1, 'quantity': 2}], **SHIPPING},
+            format='json',
+            **CUSTOMER_HEADERS
+        )
+
+    @mock.patch('gestao_pedidos_service.views.order_view.reserve_stock')
+    def test_reserves_stock_with_the_order_id_before_creating_the_order(self, reserve_stock):
+        response = self.create_order()
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        reserve_stock.assert_called_once_with(order.id, {1: 2})
+        self.assertEqual(order.status, PENDING)
+        self.assertEqual(order.total, Decimal('20.00'))
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @mock.patch('gestao_pedidos_service.views.order_view.reserve_stock')
+    def test_refused_reservation_creates_no_order(self, reserve_stock):
+        reserve_stock.side_effect = StockReservationError('Estoque insuficiente para: Produto 1', 400)
+
+        response = self.create_order()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Estoque insuficiente para: Produto 1')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @mock.patch('gestao_pedidos_service.views.order_view.reserve_stock')
+    def test_unanswered_reservation_is_released_through_the_outbox(self, reserve_stock):
+        reserve_stock.side_effect = ProductsServiceError('timeout')
+
+        response = self.create_order()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Order.objects.exists())
+
+        message = OutboxMessage.objects.get()
+        reference = str(reserve_stock.call_args.args[0])
+        self.assertEqual(message.url, 'http://products/api/v1/produtos/release-stock/')
+        self.assertEqual(message.payload, {'items': [{'product_id': 1, 'quantity': 2}], 'reference': reference})
+        self.assertEqual(message.headers, {'X-Service-Token': 'service-token'})
+        self.assertEqual(message.key, reference)
+
+
+@override_settings(SERVICE_TOKEN='service-token')
+class ServiceIdentityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.create_with_items(
+            [{
+                'product_id': 1,
+                'product_name': 'Produto 1',
+                'product_sku': 'S1',
+                'quantity': 1,
+                'unit_price': Decimal('10.00'),
+            }],
+            user_id=2,
+            user_name='Ana',
+            user_email='ana@example.com',
+            **SHIPPING
+        )
+
+    def update_status(self, **headers):
+        return self.client.post(
+            f'/api/v1/orders/{self.order.id}/update-status/',
+            {'status': CONFIRMED},
+            format='json',
+            **headers
+        )
+
+    def test_service_can_update_any_order_status(self):
+        response = self.update_status(HTTP_X_SERVICE_TOKEN='service-token')
+
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, CONFIRMED)
+
+    def test_customer_cannot_update_status(self):
+        self.assertEqual(self.update_status(**CUSTOMER_HEADERS).status_code, 403)
+
+    def test_invalid_service_token_is_rejected(self):
+        self.assertEqual(self.update_status(HTTP_X_SERVICE_TOKEN='wrong').status_code, 401)
+
+
+@override_settings(PRODUCTS_SERVICE_URL='http://products', SERVICE_TOKEN='service-token')
+class DailyOrderStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.create_with_items(
+            [{
+                'product_id': 1,
+                'product_name': 'Produto 1',
+                'product_sku': 'S1',
+                'quantity': 3,
+                'unit_price': Decimal('10.00'),
+            }],
+            user_id=2,
+            user_name='Ana',
+            user_email='ana@example.com',
+            **SHIPPING
+        )
+
+    def stats(self):
+        return {
+            row.status: (row.orders_count, row.revenue, row.items_sold)
+            for row in DailyOrderStats.objects.all()
+            if row.orders_count
+        }
+
+    def rebuilt_stats(self):
+        stats = self.stats()
+        DailyOrderStats.rebuild()
+        return stats, self.stats()
+
+    def update_status(self, new_status):
+        return self.client.post(
+            f'/api/v1/orders/{self.order.id}/update-status/',
+            {'status': new_status},
+            format='json',
+            **ADMIN_HEADERS
+        )
+
+    def cancel(self):
+        return self.client.post(
+            f'/api/v1/orders/{self.order.id}/cancel/',
+            {'reason': 'Desisti'},
+            format='json',
+            **CUSTOMER_HEADERS
+        )
+
+    def test_created_order_is_counted_as_pending(self):
+        total = self.order.total
+
+        self.assertEqual(self.stats(), {PENDING: (1, total, 3)})
+
+    def test_status_changes_move_the_order_between_rows(self):
+        total = self.order.total
+
+        self.update_status(CONFIRMED)
+        self.update_status(SHIPPED)
+
+        self.assertEqual(self.stats(), {SHIPPED: (1, total, 3)})
+        summary = self.client.get('/api/v1/orders/statistics/', **ADMIN_HEADERS).json()
+        self.assertEqual(summary['total_orders'], 1)
+
+    def test_cancellation_matches_a_rebuild(self):
+        self.update_status(CONFIRMED)
+        self.assertEqual(self.cancel().status_code, 200)
+
+        incremental, rebuilt = self.rebuilt_stats()
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(set(incremental), {CANCELLED})
+
+    def test_change_from_a_stale_read_starts_from_the_stored_status(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.update_status(CONFIRMED)
+
+        with mock.patch.object(OrderViewSet, 'get_object', return_value=stale):
+            response = self.cancel()
+
+        self.assertEqual(response.status_code, 200)
+        incremental, rebuilt = self.rebuilt_stats()
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(self.order.status_history.filter(to_status=CANCELLED).get().from_status, CONFIRMED)
+
+    def test_stale_read_cannot_cancel_a_shipped_order(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.update_status(SHIPPED)
+
+        with mock.patch.object(OrderViewSet, 'get_object', return_value=stale):
+            response = self.cancel()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stats(), {SHIPPED: (1, self.order.total, 3)})
+
+
+@override_settings(SERVICE_TOKEN='service-token')
+class AddressCacheInvalidationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def invalidate(self, user_id, **headers):
+        return self.client.post(
+            '/api/v1/orders/address-cache/invalidate/',
+            {'user_id': user_id},
+            format='json',
+            **headers
+        )
+
+    @mock.patch('gestao_pedidos_service.views.order_view.invalidate_addresses')
+    def test_users_service_can_invalidate_any_user(self, invalidate_addresses):
+        response = self.invalidate(7, HTTP_X_SERVICE_TOKEN='service-token')
+
+        self.assertEqual(response.status_code, 204)
+        invalidate_addresses.assert_called_once_with(7)
+
+    @mock.patch('gestao_pedidos_service.views.order_view.invalidate_addresses')
+    def test_customer_can_only_invalidate_itself(self, invalidate_addresses):
+        self.assertEqual(self.invalidate(7, **CUSTOMER_HEADERS).status_code, 403)
+        self.assertEqual(self.invalidate(2, **CUSTOMER_HEADERS).status_code, 204)
+        invalidate_addresses.assert_called_once_with(2)
+
+
+class SerializerEquivalenceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.orders = [
+            Order.create_with_items(
+                [
+                    {
+                        'product_id': product_id,
+                        'product_name': f'Produto {product_id}',
+                        'product_sku': f'S{product_id}',
+                        'quantity': quantity,
+                        'unit_price': Decimal('10.00'),
+                    }
+                    for product_id, quantity in items
+                ],
+                user_id=2,
+                user_name='Ana',
+                user_email='ana@example.com',
+                **SHIPPING
+            )
+            for items in ([(1, 2), (2, 1)], [(3, 4)])
+        ]
+        Order.objects.filter(pk=self.orders[1].pk).update(status=CONFIRMED, discount=Decimal('1.50'))
+
+    def render(self, serializer_class, url, orders, many=True):
+        request = Request(APIRequestFactory().get(url))
+        data = serializer_class(orders, many=many, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def orders_by_id(self, ids):
+        queryset = Order.with_items_count(Order.objects.prefetch_related('items', 'status_history'))
+        orders = {order.id: order for order in queryset.filter(id__in=ids)}
+        return [orders[order_id] for order_id in ids]
+
+    def test_compiled_list_matches_the_serializer(self):
+        queryset = Order.objects.order_by('created_at')
+        serializer = CompiledOrderListSerializer()
+
+        compiled = JSONRenderer().render(serializer.serialize(serializer.values(queryset)))
+
+        expected = self.render(OrderListSerializer, '/', self.orders_by_id([order.id for order in self.orders]))
+        self.assertEqual(compiled, expected)
+
+    def test_list_endpoint_matches_the_serializer(self):
+        response = self.client.get('/api/v1/orders/list/', **CUSTOMER_HEADERS)
+        ids = [uuid.UUID(order['id']) for order in response.json()]
+
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(response.content, self.render(OrderListSerializer, '/', self.orders_by_id(ids)))
+
+    def test_detail_endpoint_matches_the_serializer(self):
+        order = self.orders[0]
+
+        for query in ('', '?fields=status,total', '?fields=status&expand=items', '?expand=status_history'):
+            url = f'/api/v1/orders/{order.id}/{query}'
+            response = self.client.get(url, **CUSTOMER_HEADERS)
+
+            expected = self.render(OrderDetailSerializer, url, self.orders_by_id([order.id])[0], many=False)
+            self.assertEqual(response.content, expected, url)
+
+
+class OrderSparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.create_with_items(
+            [{
+                'product_id': 1,
+                'product_name': 'Produto 1',
+                'product_sku': 'S1',
+                'quantity': 2,
+                'unit_price': Decimal('10.00'),
+            }],
+            user_id=2,
+            user_name='Ana',
+            user_email='ana@example.com',
+            **SHIPPING
+        )
+
+    def retrieve(self, query='', url=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or f'/api/v1/orders/{self.order.id}/{query}', **CUSTOMER_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries]
+
+    def test_only_requested_fields_are_loaded_and_returned(self):
+        data, queries = self.retrieve('?fields=status,total')
+
+        self.assertEqual(data, {'id': str(self.order.id), 'status': PENDING, 'total': str(self.order.total)})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('shipping_street', queries[0])
+
+    def test_nested_relations_are_loaded_only_when_expanded(self):
+        data, queries = self.retrieve('?fields=status&expand=items')
+
+        self.assertEqual(set(data), {'id', 'status', 'items'})
+        self.assertEqual(data['items'][0]['quantity'], 2)
+        self.assertFalse([sql for sql in queries if 'order_status_history' in sql])
+
+    def test_computed_fields_bring_their_sources(self):
+        data, _ = self.retrieve('?fields=items_count,can_be_cancelled')
+
+        self.assertEqual(data, {'id': str(self.order.id), 'items_count': 2, 'can_be_cancelled': True})
+
+    def test_my_orders_accepts_sparse_fieldsets(self):
+        data, _ = self.retrieve(url='/api/v1/orders/my-orders/?fields=status')
+
+        self.assertEqual(data, [{'id': str(self.order.id), 'status': PENDING}])
+
+
+@override_settings(PRODUCTS_SERVICE_URL='http://products')
+class FetchProductsTests(TestCase):
+    def setUp(self):
+        product_cache.clear()
+        self.addCleanup(product_cache.clear)
+
+        patcher = mock.patch.object(product_cache, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bulk_response(self, *product_ids):
+        response = mock.Mock()
+        response.json.return_value = {
+            'products': {str(product_id): {**PRODUCTS[1], 'id': product_id} for product_id in product_ids}
+        }
+        return response
+
+    @mock.patch('gestao_pedidos_service.products.requests.get')
+    def test_products_are_fetched_in_a_single_bulk_request(self, get):
+        get.return_value = self.bulk_response(1, 2)
+
+        products = fetch_products([2, 1, 2, 3])
+
+        self.assertEqual(set(products), {1, 2})
+        get.assert_called_once()
+        self.assertEqual(get.call_args.args[0], 'http://products/api/v1/produtos/bulk/')
+        self.assertEqual(get.call_args.kwargs['params']['ids'], '1,2,3')
+
+    @mock.patch('gestao_pedidos_service.products.requests.get')
+    def test_cached_products_are_not_fetched_again(self, get):
+        get.return_value = self.bulk_response(1, 2)
+        fetch_products([1, 2])
+
+        get.return_value = self.bulk_response(3)
+        products = fetch_products([1, 2, 3])
+
+        self.assertEqual(set(products), {1, 2, 3})
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args.kwargs['params']['ids'], '3')
+
+        fetch_products([3, 1])
+        self.assertEqual(get.call_count, 2)
+
+    @mock.patch('gestao_pedidos_service.products.requests.get')
+    def test_invalidated_products_are_fetched_again(self, get):
+        get.return_value = self.bulk_response(1, 2)
+        fetch_products([1, 2])
+
+        product_cache.invalidate([2])
+        get.return_value = self.bulk_response(2)
+        fetch_products([1, 2])
+
+        self.assertEqual(get.call_args.kwargs['params']['ids'], '2')
+
+    @mock.patch('gestao_pedidos_service.products.requests.get')
+    def test_response_fetched_across_an_invalidation_is_not_cached(self, get):
+        def invalidate_during_request(*args, **kwargs):
+            product_cache.invalidate([1])
+            return self.bulk_response(1)
+
+        get.side_effect = invalidate_during_request
+        fetch_products([1])
+        fetch_products([1])
+
+        self.assertEqual(get.call_count, 2)
+
+    @mock.patch('gestao_pedidos_service.products.requests.get')
+    def test_unavailable_service_raises_products_service_error(self, get):
+        get.side_effect = requests.Timeout('timeout')
+
+        with self.assertRaises(ProductsServiceError):
+            fetch_products([1])
+
+    def test_too_many_products_are_refused(self):
+        with self.assertRaises(ValueError):
+            fetch_products(range(1, 502))
+
+
+class CreateWithItemsTests(TestCase):
+    def create(self, count):
+        return Order.create_with_items(
+            [
+                {
+                    'product_id': product_id,
+                    'product_name': f'Produto {product_id}',
+                    'product_sku': f'S{product_id}',
+                    'quantity': 2,
+                    'unit_price': Decimal('10.00'),
+                }
+                for product_id in range(1, count + 1)
+            ],
+            changed_by=2,
+            user_id=2,
+            user_name='Ana',
+            user_email='ana@example.com',
+            **SHIPPING
+        )
+
+    def test_items_history_and_totals_are_created(self):
+        order = self.create(3)
+
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.subtotal, Decimal('60.00'))
+        self.assertEqual(order.total, Decimal('60.00'))
+        self.assertEqual([item.subtotal for item in order.items.all()], [Decimal('20.00')] * 3)
+
+        history = order.status_history.get()
+        self.assertEqual((history.from_status, history.to_status, history.changed_by), (PENDING, PENDING, 2))
+
+    def test_query_count_does_not_grow_with_the_items(self):
+        # O primeiro pedido do dia cria a linha das estatísticas diárias
+        self.create(1)
+
+        with CaptureQueriesContext(connection) as one_item:
+            self.create(1)
+        with CaptureQueriesContext(connection) as many_items:
+            self.create(25)
+
+        self.assertEqual(len(many_items), len(one_item))
+
+    def test_failure_rolls_back_the_whole_order(self):
+        with mock.patch.object(DailyOrderStats, 'order_created', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create(2)
+
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+
+class OrderListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        self.orders = []
+
+        for index in range(5):
+            order = self.create_order(quantity=index + 1)
+            # Dois pedidos com o mesmo created_at: o desempate é pelo id
+            created_at = now - timedelta(minutes=min(index, 3))
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            self.orders.append(order)
+
+        self.expected = [
+            str(order_id)
+            for order_id in Order.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        ]
+
+    def create_order(self, quantity=1):
+        return Order.create_with_items(
+            [{
+                'product_id': 1,
+                'product_name': 'Produto 1',
+                'product_sku': 'S1',
+                'quantity': quantity,
+                'unit_price': Decimal('10.00'),
+            }],
+            user_id=2,
+            user_name='Ana',
+            user_email='ana@example.com',
+            **SHIPPING
+        )
+
+    def get_page(self, cursor=None, page_size=2):
+        params = {'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get('/api/v1/orders/list/', params, **CUSTOMER_HEADERS)
+
+    def walk(self, page_size=2):
+        ids, cursor = [], None
+        while True:
+            response = self.get_page(cursor, page_size)
+            self.assertEqual(response.status_code, 200)
+            ids += [order['id'] for order in response.json()]
+
+            cursor = response.get('X-Next-Cursor')
+            if cursor is None:
+                return ids
+
+    def test_pages_follow_the_cursor_without_gaps_or_repeats(self):
+        self.assertEqual(self.walk(page_size=2), self.expected)
+        self.assertEqual(self.walk(page_size=5), self.expected)
+
+    def test_orders_created_while_paging_do_not_shift_the_next_page(self):
+        first = self.get_page()
+        self.create_order()
+        second = self.get_page(first['X-Next-Cursor'])
+
+        ids = [order['id'] for order in first.json() + second.json()]
+        self.assertEqual(ids, self.expected[:4])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.get_page('nao-e-um-cursor')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Cursor inválido.'})
+
+    def test_items_count_is_annotated_in_a_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_page(page_size=5)
+
+        counts = {order['id']: order['items_count'] for order in response.json()}
+        self.assertEqual(counts, {str(order.id): index + 1 for index, order in enumerate(self.orders)})
+        self.assertEqual(len(queries), 1)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.orders = [
+            Order.create_with_items(
+                [
+                    {
+                        'product_id': product_id,
+                        'product_name': f'Produto {product_id}',
+                        'product_sku': f'S{product_id}',
+                        'quantity': 1,
+                        'unit_price': Decimal('10.00'),
+                    }
+                    for product_id in product_ids
+                ],
+                user_id=2,
+                user_name='Ana, "a cliente"',
+                user_email='ana@example.com',
+                **SHIPPING
+            )
+            for product_ids in ([1, 2], [3])
+        ]
+        Order.objects.filter(pk=self.orders[1].pk).update(status=CONFIRMED)
+
+    def export(self, query='', headers=ADMIN_HEADERS):
+        return self.client.get(f'/api/v1/orders/export/{query}', **headers)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_item(self):
+        response = self.export()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="pedidos.csv"')
+
+        rows = list(csv.DictReader(io.StringIO(self.content(response))))
+        self.assertEqual(
+            [(row['order_id'], row['item_product_sku']) for row in rows],
+            [(str(self.orders[0].id), 'S1'), (str(self.orders[0].id), 'S2'), (str(self.orders[1].id), 'S3')]
+        )
+        self.assertEqual(rows[0]['order_user_name'], 'Ana, "a cliente"')
+        self.assertEqual(rows[0]['order_total'], '20.00')
+
+    def test_jsonl_has_one_line_per_order_with_its_items(self):
+        response = self.export('?file_format=jsonl')
+
+        lines = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [str(order.id) for order in self.orders])
+        self.assertEqual([item['product_sku'] for item in lines[0]['items']], ['S1', 'S2'])
+        self.assertEqual(lines[1]['status'], CONFIRMED)
+
+    def test_orders_are_filtered_by_status(self):
+        response = self.export('?file_format=jsonl&status=confirmed,shipped')
+
+        lines = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([line['id'] for line in lines], [str(self.orders[1].id)])
+
+    def test_rows_are_read_in_a_single_query(self):
+        response = self.export()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.content(response)
+
+        self.assertEqual(len(queries), 1)
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.export('?file_format=xlsx').status_code, 400)
+        self.assertEqual(self.export('?status=perdido').status_code, 400)
+        self.assertEqual(self.export('?date_from=ontem').status_code, 400)
+
+    def test_only_admins_can_export(self):
+        self.assertEqual(self.export(headers=CUSTOMER_HEADERS).status_code, 403)
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.old = timezone.now() - timedelta(days=400)
+        self.orders = {}
+
+        for order_status in (DELIVERED, CANCELLED, SHIPPED, PENDING):
+            order = Order.create_with_items(
+                [
+                    {
+                        'product_id': product_id,
+                        'product_name': f'Produto {product_id}',
+                        'product_sku': f'S{product_id}',
+                        'quantity': product_id,
+                        'unit_price': Decimal('10.00'),
+                    }
+                    for product_id in (1, 2)
+                ],
+                user_id=2,
+                user_name='Ana',
+                user_email='ana@example.com',
+                **SHIPPING
+            )
+            Order.objects.filter(pk=order.pk).update(status=order_status, updated_at=self.old)
+            self.orders[order_status] = order
+
+
+    def detail(self, order, headers=CUSTOMER_HEADERS, query=''):
+        return self.client.get(f'/api/v1/orders/{order.id}/{query}', **headers)
+
+    def test_only_old_finished_orders_are_archived(self):
+        recent = self.orders[PENDING]
+        Order.objects.filter(pk=recent.pk).update(status=DELIVERED, updated_at=timezone.now())
+
+        archived = archive_orders(timezone.now() - timedelta(days=365))
+
+        self.assertEqual(archived, 2)
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list('id', flat=True)),
+            {self.orders[DELIVERED].id, self.orders[CANCELLED].id}
+        )
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {self.orders[SHIPPED].id, recent.id})
+        self.assertEqual(OrderItem.objects.count(), 4)
+        self.assertEqual(OrderStatusHistory.objects.count(), 2)
+
+    def test_archived_order_is_still_returned_by_the_detail(self):
+        order = self.orders[DELIVERED]
+        before = {query: self.detail(order, query=query).json() for query in ('', '?fields=status,total')}
+
+        archive_orders(timezone.now(), batch_size=1)
+
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        for query, data in before.items():
+            response = self.detail(order, query=query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), data)
+
+        response = self.client.get(f'/api/v1/orders/pedido/{order.id}/', **CUSTOMER_HEADERS)
+        self.assertEqual(response.json(), before[''])
+
+        archived = ArchivedOrder.objects.get(pk=order.pk)
+        self.assertEqual((archived.user_id, archived.status, archived.items_count), (2, DELIVERED, 3))
+
+    def test_archived_order_of_another_user_is_not_found(self):
+        order = self.orders[CANCELLED]
+        archive_orders(timezone.now())
+
+        other_customer = {**CUSTOMER_HEADERS, 'HTTP_X_USER_ID': '3'}
+        self.assertEqual(self.detail(order, headers=other_customer).status_code, 404)
+        self.assertEqual(self.detail(order, headers=ADMIN_HEADERS).status_code, 200)
+
+    def test_stats_rebuild_counts_archived_orders(self):
+        DailyOrderStats.rebuild()
+        expected = sorted(DailyOrderStats.objects.values_list('day', 'status', 'orders_count', 'revenue', 'items_sold'))
+
+        archive_orders(timezone.now())
+        DailyOrderStats.rebuild()
+
+        self.assertEqual(
+            sorted(DailyOrderStats.objects.values_list('day', 'status', 'orders_count', 'revenue', 'items_sold')),
+            expected
+        )
+
+    def test_command_uses_the_configured_age(self):
+        out = io.StringIO()
+
+        call_command('archive_orders', days=500, stdout=out)
+        self.assertIn('0 pedidos arquivados', out.getvalue())
+
+        call_command('archive_orders', days=365, stdout=out)
+        self.assertIn('2 pedidos arquivados', out.getvalue())
@@ -12,6 +12,12 @@ urlpatterns = [
     # Estatísticas (admin)
     path('statistics/', OrderViewSet.as_view({'get': 'statistics'}), name='orders-statistics'),
     
+    # Exportar pedidos e itens em CSV/JSONL (admin)
+    path('export/', OrderViewSet.as_view({'get': 'export'}), name='orders-export'),
+    
+    # Invalidar a cópia dos endereços de um usuário (chamado pelo serviço de usuários)
+    path('address-cache/invalidate/', OrderViewSet.as_view({'post': 'invalidate_address_cache'}), name='orders-address-cache-invalidate'),
+    
     # Criar pedido
     path('create/', OrderViewSet.as_view({'post': 'create'}), name='orders-create'),
     
@@ -1,26 +1,38 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
-from django.db.models import Count, Sum
+from django.utils.dateparse import parse_date
 from decimal import Decimal
-import requests
-import os
+import uuid
 
 from ..models import (
+    ArchivedOrder,
+    DailyOrderStats,
+    GRANULARITIES,
+    ORDER_STATUS_CHOICES,
     Order,
-    OrderItem,
     OrderStatusHistory,
+    OutboxMessage,
     PENDING,
     CONFIRMED,
-    PROCESSING,
     SHIPPED,
     DELIVERED,
     CANCELLED,
 )
+from ..addresses import get_address, invalidate_addresses
+from ..export import FORMATS, export_orders
+from ..idempotency import idempotent
+from ..outbox import service_headers
+from ..pagination import InvalidCursor, KeysetPaginator
+from ..products import ProductsServiceError, StockReservationError, fetch_products, reserve_stock
 from ..serializers import (
     OrderListSerializer,
+    CompiledOrderListSerializer,
     OrderDetailSerializer,
     OrderCreateSerializer,
     OrderUpdateStatusSerializer,
@@ -31,7 +43,7 @@ from ..serializers import (
 
 
 class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.prefetch_related('items', 'status_history')
+    queryset = Order.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     
     def get_serializer_class(self):
@@ -41,13 +53,28 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderCreateSerializer
         return OrderDetailSerializer
     
+    # Ações somente leitura que aceitam ?fields= / ?expand=
+    sparse_actions = ('retrieve', 'get_order_by_id', 'my_orders')
+
     def get_queryset(self):
         user = self.request.user
         queryset = super().get_queryset()
+
+        if self.action != 'list':
+            # A listagem lê só colunas (caminho compilado); as demais ações serializam o pedido completo
+            queryset = Order.with_items_count(queryset).prefetch_related('items', 'status_history')
+
+        if self.action in self.sparse_actions:
+            queryset = OrderDetailSerializer.project_queryset(
+                queryset, self.request, extra_columns=('user_id', 'created_at')
+            )
         
         if hasattr(user, 'is_admin') and (user.is_admin or user.is_admin_master):
             return queryset
 
+        if getattr(user, 'is_service', False) and self.action == 'update_status':
+            return queryset
+
         return queryset.filter(user_id=user.id)
     
 
@@ -77,9 +104,17 @@ class OrderViewSet(viewsets.ModelViewSet):
                 Q(id__icontains=search)
             )
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPaginator(request)
+        serializer = CompiledOrderListSerializer(self.get_serializer_context())
+        
+        try:
+            rows = paginator.paginate(queryset, serializer.values)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return paginator.add_headers(Response(serializer.serialize(rows)))
     
+    @idempotent
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -94,7 +129,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         address_id = serializer.validated_data.get('address_id')
         if address_id:
-            address_data = self._get_address(user.id, address_id, request)
+            address_data = get_address(user, address_id, request)
             if not address_data:
                 return Response(
                     {'error': 'Endereço não encontrado.'},
@@ -112,70 +147,78 @@ class OrderViewSet(viewsets.ModelViewSet):
             }
         
         items_data = serializer.validated_data['items']
+        
+        try:
+            products = fetch_products(item_data['product_id'] for item_data in items_data)
+        except ProductsServiceError:
+            return Response(
+                {'error': 'Serviço de produtos indisponível. Tente novamente.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        quantities = {}
+        for item_data in items_data:
+            product_id = item_data['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + item_data['quantity']
+        
         products_info = []
-        subtotal = Decimal('0.00')
 
         for item_data in items_data:
-            product = self._get_product(item_data['product_id'], request)
-        
-    
+            product = products.get(item_data['product_id'])
+            
             if not product:
                 return Response(
                     {'error': f'Produto {item_data["product_id"]} não encontrado.'},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            if not product.get('is_in_stock') or product.get('stock', 0) < item_data['quantity']:
+            if not product.get('is_in_stock') or product.get('stock', 0) < quantities[product['id']]:
                 return Response(
                     {'error': f'Produto "{product["name"]}" sem estoque suficiente.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            item_subtotal = Decimal(str(product['price'])) * item_data['quantity']
-            subtotal += item_subtotal
-            
             products_info.append({
                 'product_id': product['id'],
                 'product_name': product['name'],
                 'product_sku': product.get('sku', ''),
-                'product_image': product.get('main_image_url', ''),
+                'product_image': product.get('main_image_url') or '',
                 'quantity': item_data['quantity'],
                 'unit_price': Decimal(str(product['price'])),
-                'subtotal': item_subtotal,
             })
         
-        shipping_cost = serializer.validated_data.get('shipping_cost', Decimal('0.00'))
-        discount = serializer.validated_data.get('discount', Decimal('0.00'))
-
-        order = Order.objects.create(
-            **user_data,
-            **address_data,
-            subtotal=subtotal,
-            shipping_cost=shipping_cost,
-            discount=discount,
-            notes=serializer.validated_data.get('notes', ''),
-        )
+        # O estoque é reservado antes de o pedido existir, com o id do pedido
+        # como referência: uma recusa não deixa pedido pendente sem estoque.
+        # Se a reserva ficar sem resposta ou o pedido não for gravado, a
+        # devolução vai para a outbox; ela só devolve o que a referência
+        # efetivamente reservou.
+        order_id = uuid.uuid4()
         
-        for product_info in products_info:
-            OrderItem.objects.create(
-                order=order,
-                **product_info
+        try:
+            reserve_stock(order_id, quantities)
+        except StockReservationError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        except ProductsServiceError:
+            self._enqueue_stock_release(order_id, quantities)
+            return Response(
+                {'error': 'Serviço de produtos indisponível. Tente novamente.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
         
-        for item_data in items_data:
-            self._decrease_product_stock(
-                item_data['product_id'],
-                item_data['quantity'],
-                request
+        try:
+            order = Order.create_with_items(
+                products_info,
+                changed_by=user.id,
+                id=order_id,
+                **user_data,
+                **address_data,
+                shipping_cost=serializer.validated_data.get('shipping_cost', Decimal('0.00')),
+                discount=serializer.validated_data.get('discount', Decimal('0.00')),
+                notes=serializer.validated_data.get('notes', ''),
             )
-        
-        OrderStatusHistory.objects.create(
-            order=order,
-            from_status=PENDING,
-            to_status=PENDING,
-            comment='Pedido criado',
-            changed_by=user.id
-        )
+        except Exception:
+            self._enqueue_stock_release(order_id, quantities)
+            raise
         
         return Response({
             'message': 'Pedido criado com sucesso!',
@@ -183,7 +226,20 @@ class OrderViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_201_CREATED)
     
     def retrieve(self, request, pk=None):
-        order = self.get_object()
+        try:
+            order = self.get_object()
+        except Http404:
+            archived = self._get_archived(pk)
+            if archived is None:
+                raise
+            
+            user = request.user
+            if not (hasattr(user, 'is_admin') and (user.is_admin or user.is_admin_master)):
+                if archived.user_id != getattr(user, 'id', None):
+                    raise
+            
+            return Response(archived.representation(OrderDetailSerializer.get_requested_fields(request)))
+        
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
@@ -191,20 +247,32 @@ class OrderViewSet(viewsets.ModelViewSet):
         try:
             order = self.get_queryset().get(pk=pk)
         except Order.DoesNotExist:
-            return Response({'error': 'Pedido não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            order = self._get_archived(pk)
+            if order is None:
+                return Response({'error': 'Pedido não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
         user = request.user
         if not (hasattr(user, 'is_admin') and (user.is_admin or user.is_admin_master)):
             if order.user_id != getattr(user, 'id', None):
                 return Response({'error': 'Acesso negado.'}, status=status.HTTP_403_FORBIDDEN)
 
+        if isinstance(order, ArchivedOrder):
+            return Response(order.representation(OrderDetailSerializer.get_requested_fields(request)))
+
         serializer = self.get_serializer(order)
         return Response(serializer.data)
     
+    @staticmethod
+    def _get_archived(pk):
+        """Pedido que já saiu das tabelas quentes (leitura transparente do arquivo)."""
+        return ArchivedOrder.objects.filter(pk=pk).first()
+    
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
-        if not (hasattr(request.user, 'is_admin') and 
-                (request.user.is_admin or request.user.is_admin_master)):
+        # Além dos administradores, outros serviços (ex.: pagamento) atualizam o status
+        if not (getattr(request.user, 'is_service', False) or
+                (hasattr(request.user, 'is_admin') and 
+                 (request.user.is_admin or request.user.is_admin_master))):
             return Response(
                 {'error': 'Apenas administradores podem atualizar status.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -218,39 +286,48 @@ class OrderViewSet(viewsets.ModelViewSet):
         comment = serializer.validated_data.get('comment', '')
         tracking_code = serializer.validated_data.get('tracking_code', '')
         
-        if order.status == CANCELLED:
-            return Response(
-                {'error': 'Pedido cancelado não pode ter status alterado.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        if order.status == DELIVERED and new_status != DELIVERED:
-            return Response(
-                {'error': 'Pedido entregue não pode ter status alterado.'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            # Relido com bloqueio: atualizações simultâneas não partem do mesmo status antigo
+            order = Order.lock(order.pk)
+            
+            if order.status == CANCELLED:
+                return Response(
+                    {'error': 'Pedido cancelado não pode ter status alterado.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            if order.status == DELIVERED and new_status != DELIVERED:
+                return Response(
+                    {'error': 'Pedido entregue não pode ter status alterado.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            old_status = order.status
+            order.status = new_status
+            
+            if new_status == CONFIRMED and not order.confirmed_at:
+                order.confirmed_at = timezone.now()
+            elif new_status == SHIPPED and not order.shipped_at:
+                order.shipped_at = timezone.now()
+                if tracking_code:
+                    order.tracking_code = tracking_code
+            elif new_status == DELIVERED and not order.delivered_at:
+                order.delivered_at = timezone.now()
+            elif new_status == CANCELLED and not order.cancelled_at:
+                order.cancelled_at = timezone.now()
+            
+            order.save()
+            
+            OrderStatusHistory.objects.create(
+                order=order,
+                from_status=old_status,
+                to_status=new_status,
+                comment=comment,
+                changed_by=request.user.id
             )
-        
-        old_status = order.status
-        order.status = new_status
-        
-        if new_status == CONFIRMED and not order.confirmed_at:
-            order.confirmed_at = timezone.now()
-        elif new_status == SHIPPED and not order.shipped_at:
-            order.shipped_at = timezone.now()
-            if tracking_code:
-                order.tracking_code = tracking_code
-        elif new_status == DELIVERED and not order.delivered_at:
-            order.delivered_at = timezone.now()
-        
-        order.save()
-        
-        OrderStatusHistory.objects.create(
-            order=order,
-            from_status=old_status,
-            to_status=new_status,
-            comment=comment,
-            changed_by=request.user.id
-        )
+            
+            if new_status == CANCELLED:
+                self._enqueue_stock_release(order.id, self._item_quantities(order))
         
         return Response({
             'message': 'Status atualizado com sucesso!',
@@ -260,35 +337,33 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         order = self.get_object()
-        
-        if not order.can_be_cancelled:
-            return Response(
-                {'error': 'Este pedido não pode ser cancelado.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         serializer = OrderCancelSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        old_status = order.status
-        order.status = CANCELLED
-        order.cancelled_at = timezone.now()
-        order.save()
-        
-        for item in order.items.all():
-            self._increase_product_stock(
-                item.product_id,
-                item.quantity,
-                request
+        with transaction.atomic():
+            # Relido com bloqueio: o pedido pode ter mudado de status desde a leitura acima
+            order = Order.lock(order.pk)
+            
+            if not order.can_be_cancelled:
+                return Response(
+                    {'error': 'Este pedido não pode ser cancelado.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            old_status = order.status
+            order.status = CANCELLED
+            order.cancelled_at = timezone.now()
+            order.save()
+            
+            OrderStatusHistory.objects.create(
+                order=order,
+                from_status=old_status,
+                to_status=CANCELLED,
+                comment=serializer.validated_data['reason'],
+                changed_by=request.user.id
             )
-        
-        OrderStatusHistory.objects.create(
-            order=order,
-            from_status=old_status,
-            to_status=CANCELLED,
-            comment=serializer.validated_data['reason'],
-            changed_by=request.user.id
-        )
+            
+            self._enqueue_stock_release(order.id, self._item_quantities(order))
         
         return Response({
             'message': 'Pedido cancelado com sucesso!',
@@ -298,8 +373,15 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_orders(self, request):
         queryset = self.get_queryset().filter(user_id=request.user.id)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPaginator(request)
+        
+        try:
+            orders = paginator.paginate(queryset)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(orders, many=True)
+        return paginator.add_headers(Response(serializer.data))
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
@@ -310,106 +392,146 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        queryset = Order.objects.all()
+        granularity = request.query_params.get('granularity')
         
-        stats = {
-            'total_orders': queryset.count(),
-            'pending': queryset.filter(status=PENDING).count(),
-            'confirmed': queryset.filter(status=CONFIRMED).count(),
-            'processing': queryset.filter(status=PROCESSING).count(),
-            'shipped': queryset.filter(status=SHIPPED).count(),
-            'delivered': queryset.filter(status=DELIVERED).count(),
-            'cancelled': queryset.filter(status=CANCELLED).count(),
-            'total_revenue': queryset.filter(
-                status__in=[CONFIRMED, PROCESSING, SHIPPED, DELIVERED]
-            ).aggregate(Sum('total'))['total__sum'] or Decimal('0.00'),
-        }
+        try:
+            date_from = self._date_param(request, 'date_from')
+            date_to = self._date_param(request, 'date_to')
+        except ValueError:
+            return Response(
+                {'error': 'Datas devem estar no formato AAAA-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if granularity and granularity not in GRANULARITIES:
+            return Response(
+                {'error': f'Granularidade inválida. Use: {", ".join(GRANULARITIES)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        totals, periods = DailyOrderStats.summarize(date_from, date_to, granularity or None)
+        
+        stats = self._statistics(totals)
+        if periods is not None:
+            stats['periods'] = [
+                {'period': period['period'], **self._statistics(period)}
+                for period in periods
+            ]
         
         return Response(stats)
     
-    def _get_product(self, product_id, request):
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        if not (hasattr(request.user, 'is_admin') and 
+                (request.user.is_admin or request.user.is_admin_master)):
+            return Response(
+                {'error': 'Apenas administradores podem exportar pedidos.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in FORMATS:
+            return Response(
+                {'error': 'Formato inválido. Use csv ou jsonl.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         try:
-            products_url = os.getenv('PRODUCTS_SERVICE_URL', 'http://gestao-produtos-service:8002')
-            token = request.headers.get('Authorization', '').replace('Bearer ', '')
-            
-            response = requests.get(
-                f'{products_url}/api/v1/produtos/produto/{product_id}/',
-                timeout=5
+            date_from = self._date_param(request, 'date_from')
+            date_to = self._date_param(request, 'date_to')
+        except ValueError:
+            return Response(
+                {'error': 'Datas devem estar no formato AAAA-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            if response.status_code == 200:
-                return response.json()
-                
-            return None
-        except Exception as e:
-            return None
+        
+        statuses = [value for value in request.query_params.get('status', '').split(',') if value]
+        valid_statuses = {value for value, _ in ORDER_STATUS_CHOICES}
+        if not valid_statuses.issuperset(statuses):
+            return Response(
+                {'error': f'Status inválido. Use: {", ".join(sorted(valid_statuses))}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = Order.objects.all()
+        if date_from:
+            queryset = queryset.filter(created_at__date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(created_at__date__lte=date_to)
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            export_orders(queryset, file_format),
+            content_type=f'{content_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="pedidos.{file_format}"'
+        return response
     
-    def _get_address(self, user_id, address_id, request):
+    @action(detail=False, methods=['post'])
+    def invalidate_address_cache(self, request):
         try:
-            users_url = os.getenv('USERS_SERVICE_URL', 'http://gestao-usuarios-service:8001')
-            token = request.headers.get('Authorization', '').replace('Bearer ', '')
-            
-            response = requests.get(
-                f'{users_url}/api/v1/users/addresses/{address_id}/',
-                headers={'Authorization': f'Bearer {token}'},
-                timeout=5
+            user_id = int(request.data.get('user_id'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Informe o user_id.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            if response.status_code == 200:
-                addr = response.json()
-                return {
-                    'shipping_street': addr['street'],
-                    'shipping_number': addr['number'],
-                    'shipping_complement': addr.get('complement', ''),
-                    'shipping_neighborhood': addr['neighborhood'],
-                    'shipping_city': addr['city'],
-                    'shipping_state': addr['state'],
-                    'shipping_zip_code': addr['zip_code'],
-                }
-            return None
-        except:
+        
+        # O serviço de usuários avisa das mudanças de endereço de qualquer usuário
+        user = request.user
+        if not (getattr(user, 'is_service', False) or
+                (hasattr(user, 'is_admin') and (user.is_admin or user.is_admin_master))):
+            if user_id != user.id:
+                return Response(
+                    {'error': 'Acesso negado.'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        invalidate_addresses(user_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @staticmethod
+    def _date_param(request, name):
+        value = request.query_params.get(name)
+        if not value:
             return None
+        
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(value)
+        return parsed
     
-    def _decrease_product_stock(self, product_id, quantity, request):
-        try:
-            products_url = os.getenv('PRODUCTS_SERVICE_URL', 'http://gestao-produtos-service:8002')
-            headers = {}
-            for h in [
-                'X-Forwarded-From-Gateway', 'X-User-ID', 'X-User-Email',
-                'X-User-Nome', 'X-User-Is-Admin', 'X-User-Is-Staff',
-                'X-User-CPF', 'X-User-Role', 'Authorization'
-            ]:
-                val = request.headers.get(h)
-                if val:
-                    headers[h] = val
-
-            requests.post(
-                f'{products_url}/api/v1/produtos/{product_id}/update-stock/',
-                headers=headers if headers else None,
-                json={'quantity': quantity, 'operation': 'remove'},
-                timeout=5
-            )
-        except:
-            pass
-
-    def _increase_product_stock(self, product_id, quantity, request):
-        try:
-            products_url = os.getenv('PRODUCTS_SERVICE_URL', 'http://gestao-produtos-service:8002')
-            headers = {}
-            for h in [
-                'X-Forwarded-From-Gateway', 'X-User-ID', 'X-User-Email',
-                'X-User-Nome', 'X-User-Is-Admin', 'X-User-Is-Staff',
-                'X-User-CPF', 'X-User-Role', 'Authorization'
-            ]:
-                val = request.headers.get(h)
-                if val:
-                    headers[h] = val
-
-            requests.post(
-                f'{products_url}/api/v1/produtos/{product_id}/update-stock/',
-                headers=headers if headers else None,
-                json={'quantity': quantity, 'operation': 'add'},
-                timeout=5
-            )
-        except:
-            pass
+    @staticmethod
+    def _statistics(summary):
+        stats = {'total_orders': summary['orders']}
+        for order_status, _ in ORDER_STATUS_CHOICES:
+            stats[order_status] = summary['by_status'].get(order_status, 0)
+        stats['total_revenue'] = summary['revenue']
+        stats['items_sold'] = summary['items_sold']
+        return stats
+    
+    def _item_quantities(self, order):
+        quantities = {}
+        for item in order.items.all():
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        return quantities
+    
+    def _enqueue_stock_release(self, order_id, quantities):
+        # Entregue pelo despachante da outbox com a identidade do serviço; o
+        # id do pedido como referência torna a repetição da chamada inofensiva
+        products_url = getattr(settings, 'PRODUCTS_SERVICE_URL', 'http://gestao-produtos-service:8002')
+        
+        OutboxMessage.enqueue(
+            f'{products_url}/api/v1/produtos/release-stock/',
+            {
+                'items': [
+                    {'product_id': product_id, 'quantity': quantity}
+                    for product_id, quantity in quantities.items()
+                ],
+                'reference': str(order_id),
+            },
+            headers=service_headers(),
+            key=str(order_id)
+        )
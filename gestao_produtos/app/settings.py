@@ -95,6 +95,18 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'gestao-produtos'),
+        'TIMEOUT': 300,
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -154,3 +166,24 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
 }
+
+# Intervalo (segundos) entre gravações em lote das visualizações de produtos
+PRODUCT_VIEWS_FLUSH_INTERVAL = int(os.getenv('PRODUCT_VIEWS_FLUSH_INTERVAL', 5))
+
+# Threads responsáveis por gerar as variantes (thumb/card/zoom) das imagens
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+# Tempo (segundos) em que as listas de destaques e mais vendidos são servidas do cache
+PRODUCT_LISTS_CACHE_TIMEOUT = int(os.getenv('PRODUCT_LISTS_CACHE_TIMEOUT', 60))
+
+# Tempo (segundos) de vida do JSON pré-serializado de cada produto
+PRODUCT_DOCUMENTS_CACHE_TIMEOUT = int(os.getenv('PRODUCT_DOCUMENTS_CACHE_TIMEOUT', 3600))
+
+# Intervalo mínimo (segundos) entre verificações de alterações no snapshot do catálogo
+PRODUCT_SNAPSHOT_REFRESH_INTERVAL = float(os.getenv('PRODUCT_SNAPSHOT_REFRESH_INTERVAL', 2))
+
+# Intervalo (segundos) entre consolidações das movimentações de estoque no estoque dos produtos
+STOCK_COMPACTION_INTERVAL = float(os.getenv('STOCK_COMPACTION_INTERVAL', 5))
+
+# Token compartilhado entre os microsserviços (cabeçalho X-Service-Token); vazio desativa a identidade de serviço
+SERVICE_TOKEN = os.getenv('SERVICE_TOKEN', '')
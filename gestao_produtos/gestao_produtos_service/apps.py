@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GestaoProdutosServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestao_produtos_service'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,332 @@
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Max, Min
+
+from .models import Category, Product, ProductChange
+
+
+PRODUCT_COLUMNS = ('id', 'name', 'slug', 'sku', 'is_active', 'sales_count', 'views_count')
+
+# Uma venda pesa como várias visualizações na ordenação das sugestões
+SALES_WEIGHT = 10
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e com espaços simples."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def name_terms(name):
+    """Termos indexados para um nome: o nome inteiro a partir de cada palavra."""
+    words = normalize(name).split(' ')
+    return {' '.join(words[index:]) for index in range(len(words)) if words[index]}
+
+
+class AutocompleteIndex:
+    """
+    Índice de prefixos em memória para o autocomplete.
+
+    ``product_keys`` e ``category_keys`` são listas ordenadas de (termo, id);
+    a busca por prefixo é uma busca binária pelo intervalo de termos que
+    começam com o texto digitado. Para prefixos curtos, cujo intervalo cobre
+    boa parte do catálogo, os produtos mais relevantes ficam pré-calculados
+    em ``top``.
+    """
+
+    # Tamanho máximo dos prefixos com ranking pré-calculado
+    short_prefix = 3
+    top_size = 20
+    inplace_limit = 256
+    # Buscas recentes guardadas (LRU); o texto vem do cliente, então o cache é limitado
+    results_cache_size = 1024
+
+    def __init__(self, version=0, categories_version=None):
+        self.version = version
+        self.categories_version = categories_version
+        self.product_keys = []
+        self.category_keys = []
+        self.products = {}
+        self.categories = {}
+        self.top = {}
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products)
+
+    def copy(self, version):
+        index = AutocompleteIndex(version, self.categories_version)
+        index.product_keys = list(self.product_keys)
+        index.category_keys = list(self.category_keys)
+        index.products = dict(self.products)
+        index.categories = dict(self.categories)
+        index.top = dict(self.top)
+        return index
+
+    def update_products(self, rows, removed_ids=()):
+        """Troca os termos dos produtos recebidos; inativos e removidos saem do índice."""
+        stale = []
+        added = []
+        previous = {}
+
+        for product_id in removed_ids:
+            previous[product_id] = self.products.pop(product_id, None)
+
+        for row in rows:
+            previous[row['id']] = self.products.pop(row['id'], None)
+
+            if not row['is_active']:
+                continue
+
+            terms = name_terms(row['name'])
+            sku = normalize(row['sku'])
+            if sku:
+                terms.add(sku)
+
+            score = row['sales_count'] * SALES_WEIGHT + row['views_count']
+            self.products[row['id']] = (row['name'], row['slug'], row['sku'], score, terms)
+
+        for product_id, entry in previous.items():
+            if entry is not None:
+                stale.extend((term, product_id) for term in entry[-1])
+            if product_id in self.products:
+                added.extend((term, product_id) for term in self.products[product_id][-1])
+
+        self.product_keys = self._replace(self.product_keys, stale, added)
+
+        if len(previous) > self.inplace_limit:
+            self._rank_all()
+        else:
+            self._rank_changes(previous)
+
+        self._clear_results()
+
+    def set_categories(self, rows, version):
+        self.categories = {}
+        keys = []
+
+        for row in rows:
+            terms = name_terms(row['name'])
+            self.categories[row['id']] = (row['name'], row['slug'], row['products_count_total'], terms)
+            keys.extend((term, row['id']) for term in terms)
+
+        keys.sort()
+        self.category_keys = keys
+        self.categories_version = version
+        self._clear_results()
+
+    def search(self, text, limit=10):
+        prefix = normalize(text)
+        if not prefix:
+            return [], []
+
+        limit = min(limit, self.top_size)
+        cache_key = (prefix, limit)
+
+        with self._results_lock:
+            results = self._results.get(cache_key)
+            if results is not None:
+                self._results.move_to_end(cache_key)
+                return results
+
+        results = self._search(prefix, limit)
+
+        with self._results_lock:
+            self._results[cache_key] = results
+            while len(self._results) > self.results_cache_size:
+                self._results.popitem(last=False)
+
+        return results
+
+    def _clear_results(self):
+        with self._results_lock:
+            self._results.clear()
+
+    def _search(self, prefix, limit):
+        if len(prefix) <= self.short_prefix:
+            products = self.top.get(prefix, [])[:limit]
+        else:
+            products = self._best(self._matches(self.product_keys, prefix), self.products, 3, limit)
+
+        categories = self._best(self._matches(self.category_keys, prefix), self.categories, 2, limit)
+
+        return (
+            [
+                {'id': product_id, 'name': name, 'slug': slug, 'sku': sku}
+                for product_id in products
+                for name, slug, sku, _, _ in [self.products[product_id]]
+            ],
+            [
+                {'id': category_id, 'name': name, 'slug': slug}
+                for category_id in categories
+                for name, slug, _, _ in [self.categories[category_id]]
+            ],
+        )
+
+    def _matches(self, keys, prefix):
+        start = bisect_left(keys, (prefix,))
+        end = bisect_left(keys, (prefix + '\uffff',))
+        return {object_id for _, object_id in keys[start:end]}
+
+    def _best(self, object_ids, entries, score, limit):
+        return heapq.nsmallest(limit, object_ids, key=lambda object_id: (-entries[object_id][score], object_id))
+
+    def _short_prefixes(self, terms):
+        return {term[:length] for term in terms for length in range(1, min(len(term), self.short_prefix) + 1)}
+
+    def _rank_all(self):
+        heaps = {}
+
+        for product_id, (_, _, _, score, terms) in self.products.items():
+            for prefix in self._short_prefixes(terms):
+                heap = heaps.setdefault(prefix, [])
+                item = (score, -product_id)
+                if len(heap) < self.top_size:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        self.top = {
+            prefix: [-product_id for _, product_id in sorted(heap, reverse=True)]
+            for prefix, heap in heaps.items()
+        }
+
+    def _rank_changes(self, previous):
+        """
+        Ajusta os rankings curtos afetados pelos produtos alterados ({id: entrada
+        anterior}). Todos os prefixos são tratados de uma vez a partir dos
+        rankings anteriores ao lote; as listas são trocadas, nunca alteradas.
+        """
+        new_prefixes = {}
+        affected = defaultdict(set)
+
+        for product_id, entry in previous.items():
+            current = self.products.get(product_id)
+            new_prefixes[product_id] = self._short_prefixes(current[-1]) if current else set()
+            old_prefixes = self._short_prefixes(entry[-1]) if entry else set()
+
+            for prefix in old_prefixes | new_prefixes[product_id]:
+                affected[prefix].add(product_id)
+
+        for prefix, product_ids in affected.items():
+            previous_ranking = self.top.get(prefix, [])
+            ranking = [other for other in previous_ranking if other not in product_ids]
+            entering = [product_id for product_id in product_ids if prefix in new_prefixes[product_id]]
+            # Um produto da lista cheia saiu ou perdeu pontos: o próximo colocado só aparece relendo o intervalo
+            dropped = len(previous_ranking) == self.top_size and any(
+                prefix not in new_prefixes[other] or self.products[other][3] < previous[other][3]
+                for other in previous_ranking
+                if other in product_ids
+            )
+
+            if dropped:
+                ranking = self._best(self._matches(self.product_keys, prefix), self.products, 3, self.top_size)
+            else:
+                ranking = sorted(ranking + entering, key=lambda other: (-self.products[other][3], other))[:self.top_size]
+
+            if ranking:
+                self.top[prefix] = ranking
+            else:
+                self.top.pop(prefix, None)
+
+    def _replace(self, keys, stale, added):
+        # Poucas trocas são feitas no lugar; lotes maiores refazem a lista de uma vez
+        if len(stale) + len(added) <= self.inplace_limit:
+            for key in stale:
+                position = bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    del keys[position]
+            for key in added:
+                insort(keys, key)
+            return keys
+
+        stale = set(stale)
+        keys = [key for key in keys if key not in stale]
+        keys.extend(added)
+        keys.sort()
+        return keys
+
+
+class AutocompleteIndexManager:
+    """
+    Mantém o índice do processo. Produtos são atualizados a partir do log de
+    alterações (como o snapshot do catálogo); categorias, que são poucas, são
+    recarregadas quando alguma delas muda. Cada atualização trabalha sobre uma
+    cópia, então buscas em andamento nunca veem o índice pela metade.
+    """
+
+    full_reload_ratio = 0.2
+    overlap = 100
+
+    def __init__(self):
+        self._index = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'PRODUCT_SNAPSHOT_REFRESH_INTERVAL', 2)
+
+    def get(self):
+        if self._index is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+            if self._lock.acquire(blocking=self._index is None):
+                try:
+                    self.refresh()
+                finally:
+                    self._lock.release()
+
+        return self._index
+
+    def refresh(self):
+        index = self._index
+        bounds = ProductChange.objects.aggregate(first=Min('id'), last=Max('id'))
+        last = bounds['last'] or 0
+        categories_version = tuple(Category.objects.aggregate(Max('updated_at'), Count('id')).values())
+        self._checked_at = time.monotonic()
+
+        if index is None or (bounds['first'] or 0) > index.version + 1:
+            index = self._load(last)
+        elif last != index.version:
+            changed = set(
+                ProductChange.objects.filter(
+                    id__gt=index.version - self.overlap,
+                    id__lte=last
+                ).values_list('product_id', flat=True)
+            )
+
+            if len(changed) > max(len(index), 1) * self.full_reload_ratio:
+                index = self._load(last)
+            else:
+                index = index.copy(last)
+                rows = list(Product.objects.filter(id__in=changed).values(*PRODUCT_COLUMNS))
+                index.update_products(rows, changed - {row['id'] for row in rows})
+
+        if index.categories_version != categories_version:
+            if index is self._index:
+                index = index.copy(index.version)
+            index.set_categories(self._category_rows(), categories_version)
+
+        self._index = index
+        return index
+
+    def _load(self, version):
+        index = AutocompleteIndex(version)
+
+        products = Product.objects.filter(is_active=True).values(*PRODUCT_COLUMNS)
+        index.update_products(products.iterator(chunk_size=5000))
+
+        return index
+
+    def _category_rows(self):
+        return Category.objects.filter(is_active=True).values('id', 'name', 'slug', 'products_count_total')
+
+
+autocomplete_index = AutocompleteIndexManager()
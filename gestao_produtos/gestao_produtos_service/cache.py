@@ -0,0 +1,72 @@
+import time
+import uuid
+
+from django.core.cache import cache
+
+
+CATEGORY_TREE_VERSION_KEY = 'categories:tree:version'
+PRODUCT_LISTS_VERSION_KEY = 'products:lists:version'
+
+
+def get_version(key):
+    return cache.get_or_set(key, lambda: uuid.uuid4().hex, None)
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def category_tree_key(scope):
+    return f'categories:tree:{scope}:{get_version(CATEGORY_TREE_VERSION_KEY)}'
+
+
+def invalidate_category_tree():
+    bump_version(CATEGORY_TREE_VERSION_KEY)
+
+
+def product_list_key(name, request):
+    base_url = request.build_absolute_uri('/')
+    return f'products:{name}:{get_version(PRODUCT_LISTS_VERSION_KEY)}:{base_url}'
+
+
+def invalidate_product_lists():
+    bump_version(PRODUCT_LISTS_VERSION_KEY)
+
+
+def get_or_render(key, render, timeout=60, lock_timeout=10, max_wait=2.0):
+    """
+    Devolve o valor em cache ou o gera com `render`, evitando que vários
+    processos regenerem a mesma entrada ao mesmo tempo.
+
+    A entrada guarda o instante em que deixa de ser fresca e continua no
+    cache por mais tempo. Depois desse instante apenas quem obtiver o lock
+    regenera o valor; os demais continuam servindo a versão anterior. Em um
+    cache vazio, quem não obtém o lock aguarda até `max_wait` segundos pelo
+    valor gerado pelo outro processo antes de gerá-lo por conta própria.
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    
+    if entry is not None:
+        fresh_until, value = entry
+        if fresh_until > time.time() or not cache.add(lock_key, 1, lock_timeout):
+            return value
+    else:
+        deadline = time.time() + max_wait
+        
+        while not cache.add(lock_key, 1, lock_timeout):
+            time.sleep(0.05)
+            entry = cache.get(key)
+            
+            if entry is not None:
+                return entry[1]
+            
+            if time.time() > deadline:
+                return render()
+    
+    try:
+        value = render()
+        cache.set(key, (time.time() + timeout, value), timeout * 10)
+        return value
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,301 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+
+from .cache import invalidate_category_tree, invalidate_product_lists
+from .models import Category, Product, ProductChange, StockMovement
+
+
+CATALOG_FIELDS = (
+    'sku',
+    'name',
+    'description',
+    'category',
+    'price',
+    'original_price',
+    'stock',
+    'is_active',
+    'is_featured',
+)
+
+UPDATE_FIELDS = (
+    'name',
+    'description',
+    'category',
+    'price',
+    'original_price',
+    'is_active',
+    'is_featured',
+    'updated_at',
+)
+
+# Colunas exportadas no lugar do campo de mesmo nome
+EXPORT_COLUMNS = {
+    'category': 'category__slug',
+    'stock': 'available_stock',
+}
+
+FORMATS = ('csv', 'jsonl')
+
+MAX_REPORTED_ERRORS = 100
+
+
+class CatalogRowSerializer(serializers.Serializer):
+    """Valida uma linha do catálogo sem consultar o banco."""
+    sku = serializers.CharField(max_length=50)
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField()
+    category = serializers.SlugField(max_length=120)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    original_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    stock = serializers.IntegerField(default=0)
+    is_active = serializers.BooleanField(default=True)
+    is_featured = serializers.BooleanField(default=False)
+    
+    def to_internal_value(self, data):
+        data = {key: value for key, value in data.items() if value not in ('', None)}
+        return super().to_internal_value(data)
+    
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('O preço deve ser maior que zero.')
+        return value
+    
+    def validate_stock(self, value):
+        if value < 0:
+            raise serializers.ValidationError('O estoque não pode ser negativo.')
+        return value
+    
+    def validate(self, attrs):
+        original_price = attrs.get('original_price')
+        
+        if original_price and original_price <= attrs['price']:
+            raise serializers.ValidationError({
+                'original_price': 'O preço original deve ser maior que o preço de venda.'
+            })
+        
+        return attrs
+
+
+def detect_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in FORMATS else default
+
+
+def read_rows(stream, file_format):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    
+    if file_format == 'csv':
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+        return
+    
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+
+def allocate_slugs(names, chunk_size=200):
+    """
+    Gera slugs únicos para vários produtos com uma consulta por bloco de nomes,
+    no lugar da consulta por colisão feita em Product.save.
+    """
+    bases = [slugify(name) or 'produto' for name in names]
+    unique_bases = sorted(set(bases))
+    taken = set()
+    
+    for start in range(0, len(unique_bases), chunk_size):
+        query = Q()
+        for base in unique_bases[start:start + chunk_size]:
+            query |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+        
+        taken.update(Product.objects.filter(query).values_list('slug', flat=True))
+    
+    slugs = []
+    for base in bases:
+        slug = base
+        counter = 1
+        
+        while slug in taken:
+            slug = f'{base}-{counter}'
+            counter += 1
+        
+        taken.add(slug)
+        slugs.append(slug)
+    
+    return slugs
+
+
+def import_products(stream, file_format='csv', batch_size=1000):
+    """
+    Importa produtos de um arquivo CSV ou JSONL lendo-o em fluxo.
+
+    Cada bloco de `batch_size` linhas é validado em memória, os SKUs são
+    resolvidos com uma única consulta e a gravação acontece com bulk_create
+    e bulk_update dentro de uma transação. Produtos com SKU já cadastrado
+    são atualizados.
+    """
+    categories = {
+        category.slug: category
+        for category in Category.objects.only('id', 'slug', 'is_active')
+    }
+    report = {'created': 0, 'updated': 0, 'errors_count': 0, 'errors': []}
+    batch = []
+    
+    for line_number, row in read_rows(stream, file_format):
+        batch.append((line_number, row))
+        
+        if len(batch) >= batch_size:
+            _import_batch(batch, categories, report)
+            batch = []
+    
+    if batch:
+        _import_batch(batch, categories, report)
+    
+    if report['created'] or report['updated']:
+        invalidate_category_tree()
+        invalidate_product_lists()
+    
+    return report
+
+
+def _add_error(report, line_number, errors):
+    report['errors_count'] += 1
+    
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': line_number, 'errors': errors})
+
+
+def _import_batch(batch, categories, report):
+    rows = {}
+    
+    for line_number, row in batch:
+        if not isinstance(row, dict):
+            _add_error(report, line_number, 'Linha inválida.')
+            continue
+        
+        serializer = CatalogRowSerializer(data=row)
+        if not serializer.is_valid():
+            _add_error(report, line_number, serializer.errors)
+            continue
+        
+        data = serializer.validated_data
+        category = categories.get(data['category'])
+        
+        if not category:
+            _add_error(report, line_number, {'category': 'Categoria não encontrada.'})
+            continue
+        
+        if not category.is_active:
+            _add_error(report, line_number, {'category': 'Não é possível associar o produto a uma categoria inativa.'})
+            continue
+        
+        if data['sku'] in rows:
+            _add_error(report, line_number, {'sku': 'SKU repetido no arquivo.'})
+            continue
+        
+        data['category'] = category
+        rows[data['sku']] = data
+    
+    if not rows:
+        return
+    
+    existing = Product.objects.filter(sku__in=rows.keys()).in_bulk(field_name='sku')
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    
+    for sku, data in rows.items():
+        product = existing.get(sku)
+        
+        if product is None:
+            to_create.append(Product(**data))
+            continue
+        
+        for field, value in data.items():
+            setattr(product, field, value)
+        product.updated_at = now
+        to_update.append(product)
+    
+    for product, slug in zip(to_create, allocate_slugs([product.name for product in to_create])):
+        product.slug = slug
+    
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create, batch_size=500)
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=500)
+        ProductChange.record(product.id for product in to_create + to_update)
+        Category.adjust_products_count(_count_deltas(to_create, to_update))
+        StockMovement.record(_stock_adjustments(to_update), StockMovement.ADJUSTMENT, 'Importação do catálogo')
+    
+    report['created'] += len(to_create)
+    report['updated'] += len(to_update)
+
+
+def _stock_adjustments(updated):
+    """O estoque do arquivo é o disponível desejado; a diferença entra no registro de movimentações."""
+    stock = {product.id: product.stock for product in updated}
+    available = Product.with_available_stock().select_for_update().filter(
+        id__in=stock.keys()
+    ).values_list('id', 'available_stock')
+    
+    return {product_id: stock[product_id] - current for product_id, current in available}
+
+
+def _count_deltas(created, updated):
+    """Variação de produtos ativos por categoria causada pelo lote (bulk_* não dispara signals)."""
+    deltas = defaultdict(int)
+    
+    for product in created:
+        if product.is_active:
+            deltas[product.category_id] += 1
+    
+    for product in updated:
+        previous = product._counted_state
+        if previous and previous[1]:
+            deltas[previous[0]] -= 1
+        if product.is_active:
+            deltas[product.category_id] += 1
+    
+    return deltas
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def _export_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_products(queryset, file_format='csv', chunk_size=2000):
+    """Gera o catálogo linha a linha, sem carregar todos os produtos em memória."""
+    columns = [EXPORT_COLUMNS.get(field, field) for field in CATALOG_FIELDS]
+    rows = Product.with_available_stock(queryset).order_by('id').values_list(*columns).iterator(chunk_size=chunk_size)
+    
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(CATALOG_FIELDS)
+        
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    
+    for row in rows:
+        data = dict(zip(CATALOG_FIELDS, map(_export_value, row)))
+        yield json.dumps(data, ensure_ascii=False) + '\n'
@@ -0,0 +1,26 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+def make_etag(request, *parts):
+    """ETag forte a partir das versões dos dados, da URL base e dos parâmetros da consulta."""
+    params = sorted(request.query_params.lists()) if hasattr(request, 'query_params') else []
+    value = '|'.join(str(part) for part in (*parts, request.build_absolute_uri('/'), params))
+    return f'"{hashlib.sha1(value.encode()).hexdigest()}"'
+
+
+def not_modified(request, etag):
+    """
+    Devolve 304 (ou 412) quando as pré-condições da requisição indicam que nada mudou.
+
+    Só o ETag é usado: as respostas dependem de versões (alterações de
+    produtos, documentos, categorias) que não têm uma data correspondente,
+    então não há Last-Modified confiável para ``If-Modified-Since``.
+    """
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    return response
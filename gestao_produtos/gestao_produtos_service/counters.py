@@ -0,0 +1,93 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """
+    Acumula as visualizações de produtos em memória e grava em lote.
+
+    Cada flush agrupa os produtos pelo número de visualizações pendentes e
+    executa um UPDATE ... SET views_count = views_count + n por grupo, de
+    forma que incrementos concorrentes nunca se sobrescrevem. Se a gravação
+    falhar, as contagens voltam para o buffer e entram no próximo flush.
+    """
+
+    chunk_size = 500
+
+    def __init__(self):
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'PRODUCT_VIEWS_FLUSH_INTERVAL', 5)
+
+    def add(self, product_id, count=1):
+        with self._lock:
+            self._pending[product_id] += count
+            
+            if self._thread is None:
+                self._start()
+
+    def flush(self):
+        from .models import Product
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+            
+            if not pending:
+                return 0
+            
+            grouped = defaultdict(list)
+            for product_id, count in pending.items():
+                grouped[count].append(product_id)
+            
+            try:
+                with transaction.atomic():
+                    for count, product_ids in grouped.items():
+                        for start in range(0, len(product_ids), self.chunk_size):
+                            Product.objects.filter(
+                                id__in=product_ids[start:start + self.chunk_size]
+                            ).update(views_count=F('views_count') + count)
+            except Exception:
+                logger.exception('Falha ao gravar visualizações de produtos')
+                
+                with self._lock:
+                    for product_id, count in pending.items():
+                        self._pending[product_id] += count
+                return 0
+            
+            return len(pending)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _start(self):
+        self._thread = threading.Thread(
+            target=self._run,
+            name='product-views-flusher',
+            daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+            connection.close()
+
+
+view_counter = ViewCounterBuffer()
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .cache import bump_version, get_version
+from .models import Product
+from .serializers import CompiledProductListSerializer, ProductDetailSerializer
+
+
+PRODUCT_DOCUMENTS_VERSION_KEY = 'products:documents:version'
+
+
+def render_documents(rows, kind, request):
+    """
+    Devolve o JSON já serializado de cada produto, na ordem das linhas
+    (id, revisão) recebidas.
+
+    Cada documento fica no cache identificado pela revisão do produto: o
+    timestamp de `updated_at` na listagem e ``detail_revision`` no detalhe.
+    Qualquer gravação no produto (ou em suas imagens, via signals) gera um
+    documento novo. Alterações em categorias trocam a versão geral.
+    Apenas os produtos ausentes do cache são carregados e serializados.
+    """
+    if not rows:
+        return []
+    
+    version = documents_version()
+    base_url = request.build_absolute_uri('/')
+    keys = {
+        product_id: f'products:document:{kind}:{product_id}:{revision}:{version}:{base_url}'
+        for product_id, revision in rows
+    }
+    documents = cache.get_many(keys.values())
+    missing = [product_id for product_id, key in keys.items() if key not in documents]
+    
+    if missing:
+        revisions = dict(rows)
+        renderer = JSONRenderer()
+        rendered = {}
+        
+        for product_id, revision, data in serialize_products(missing, kind, request):
+            documents[keys[product_id]] = renderer.render(data)
+            
+            # Produto alterado depois da leitura da revisão: o documento não é guardado sob ela
+            if revision == revisions[product_id]:
+                rendered[keys[product_id]] = documents[keys[product_id]]
+        
+        cache.set_many(rendered, settings.PRODUCT_DOCUMENTS_CACHE_TIMEOUT)
+    
+    return [documents[keys[product_id]] for product_id, _ in rows if keys[product_id] in documents]
+
+
+def serialize_products(product_ids, kind, request):
+    """
+    Gera (id, revisão, dados) dos produtos. A listagem usa o serializer
+    compilado sobre ``.values()``; o detalhe, com imagens aninhadas, usa o
+    ProductDetailSerializer. Nos dois o estoque é o disponível; as reservas
+    mudam o ``updated_at`` quando são consolidadas, e o documento é refeito.
+    """
+    queryset = Product.objects.filter(id__in=product_ids)
+    context = {'request': request}
+    
+    if kind == 'list':
+        serializer = CompiledProductListSerializer(context)
+        rows = serializer.values(queryset)
+        
+        for row, data in zip(rows, serializer.serialize(rows)):
+            yield row['id'], row['updated_at'].timestamp(), data
+        return
+    
+    for product in Product.with_available_stock(queryset).select_related('category').prefetch_related('images'):
+        revision = detail_revision(product.updated_at, product.views_count)
+        yield product.id, revision, ProductDetailSerializer(product, context=context).data
+
+
+def detail_revision(updated_at, views_count):
+    """
+    Revisão do documento de detalhe. Inclui ``views_count``, que o flush do
+    contador de visualizações grava sem mudar o ``updated_at``.
+    """
+    return f'{updated_at.timestamp()}:{views_count}'
+
+
+def documents_version():
+    return get_version(PRODUCT_DOCUMENTS_VERSION_KEY)
+
+
+def join_documents(documents):
+    return b'[' + b','.join(documents) + b']'
+
+
+def invalidate_product_documents():
+    bump_version(PRODUCT_DOCUMENTS_VERSION_KEY)
@@ -0,0 +1,127 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidate_category_tree, invalidate_product_lists
+from .models import Category, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+
+VARIANTS = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'zoom': (1600, 1600),
+}
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                thread_name_prefix='image-variants'
+            )
+        return _executor
+
+
+def needs_variants(instance):
+    return bool(instance.image) and instance.image_variants.get('source') != instance.image.name
+
+
+def schedule_variants(instance):
+    """Agenda a geração das variantes para depois do commit, fora do ciclo da requisição."""
+    label = instance._meta.label
+    pk = instance.pk
+    transaction.on_commit(lambda: get_executor().submit(_process, label, pk))
+
+
+def _process(label, pk):
+    try:
+        process_variants(apps.get_model(label), pk)
+    except Exception:
+        logger.exception('Falha ao gerar variantes de imagem de %s %s', label, pk)
+    finally:
+        connection.close()
+
+
+def process_variants(model, pk):
+    instance = model.objects.filter(pk=pk).first()
+    
+    if instance is None or not needs_variants(instance):
+        return None
+    
+    old_variants = instance.image_variants
+    variants = generate_variants(instance.image)
+    
+    values = {'image_variants': variants}
+    if isinstance(instance, Category):
+        # O update() não passa pelo auto_now: sem isso o ETag da listagem de categorias não muda
+        values['updated_at'] = timezone.now()
+    
+    updated = model.objects.filter(pk=pk, image=instance.image.name).update(**values)
+    
+    if updated:
+        delete_variants(old_variants, instance.image.storage)
+        invalidate_product_lists()
+        
+        if isinstance(instance, ProductImage):
+            Product.touch([instance.product_id])
+        elif isinstance(instance, Category):
+            invalidate_category_tree()
+    else:
+        delete_variants(variants, instance.image.storage)
+    
+    return variants
+
+
+def generate_variants(field_file):
+    """Gera as versões redimensionadas (WebP e JPEG) da imagem original."""
+    storage = field_file.storage
+    base, _ = os.path.splitext(field_file.name)
+    variants = {'source': field_file.name}
+    
+    with storage.open(field_file.name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original = original.convert('RGB')
+    
+    for variant, size in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        variants[variant] = {}
+        
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, **options)
+            name = storage.save(f'{base}__{variant}.{extension}', ContentFile(buffer.getvalue()))
+            variants[variant][extension] = name
+    
+    return variants
+
+
+def delete_variants(variants, storage):
+    for variant in VARIANTS:
+        for name in (variants or {}).get(variant, {}).values():
+            try:
+                storage.delete(name)
+            except Exception:
+                logger.warning('Não foi possível remover a variante %s', name)
@@ -0,0 +1,84 @@
+from decimal import Decimal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from ...models import Category, Product, ProductImage
+from ...serializers import CompiledProductListSerializer, ProductListSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compara o ProductListSerializer com o serializer compilado (dados sintéticos, desfeitos ao final)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        try:
+            with transaction.atomic():
+                category = self._populate(max(sizes))
+                self._run(category, sizes, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _populate(self, total):
+        category = Category.objects.create(name='benchmark-serializers', slug='benchmark-serializers')
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Produto {index}',
+                slug=f'benchmark-serializers-{index}',
+                description='Descrição ' * 20,
+                category=category,
+                price=Decimal('99.90'),
+                original_price=Decimal('129.90') if index % 3 else None,
+                stock=index % 7,
+                sku=f'BENCH-{index}',
+            )
+            for index in range(total)
+        ], batch_size=1000)
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/bench/{product.id}.jpg', is_main=True)
+            for product in products[::2]
+        ], batch_size=1000)
+        return category
+
+    def _run(self, category, sizes, repeat):
+        renderer = JSONRenderer()
+        products = Product.objects.filter(category=category).order_by('id')
+
+        def serializer_path(size):
+            queryset = products.select_related('category').prefetch_related('images')[:size]
+            return renderer.render(ProductListSerializer(queryset, many=True).data)
+
+        def compiled_path(size):
+            serializer = CompiledProductListSerializer()
+            return renderer.render(serializer.serialize(serializer.values(products[:size])))
+
+        self.stdout.write(f'{"linhas":>8} {"serializer":>12} {"compilado":>12} {"ganho":>8}  idêntico')
+        for size in sizes:
+            expected, serializer_time = self._measure(serializer_path, size, repeat)
+            content, compiled_time = self._measure(compiled_path, size, repeat)
+
+            self.stdout.write(
+                f'{size:>8} {serializer_time * 1000:>10.1f}ms {compiled_time * 1000:>10.1f}ms '
+                f'{serializer_time / compiled_time:>7.1f}x  {"sim" if content == expected else "NÃO"}'
+            )
+
+    def _measure(self, function, size, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...stock import stock_compactor
+
+
+class Command(BaseCommand):
+    help = 'Consolida as movimentações de estoque pendentes no estoque dos produtos'
+
+    def handle(self, *args, **options):
+        compacted = stock_compactor.compact()
+        
+        self.stdout.write(self.style.SUCCESS(f'{compacted} movimentações consolidadas.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from ...catalog import FORMATS, detect_format, export_products
+from ...models import Product
+
+
+class Command(BaseCommand):
+    help = 'Exporta o catálogo de produtos para CSV ou JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        
+        with open(options['path'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in export_products(Product.objects.all(), file_format):
+                output.write(chunk)
+        
+        self.stdout.write(self.style.SUCCESS(f"Catálogo exportado para {options['path']}."))
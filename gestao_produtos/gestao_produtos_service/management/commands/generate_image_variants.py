@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from ...images import needs_variants, process_variants
+from ...models import Category, ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes (thumb/card/zoom) das imagens que ainda não as possuem'
+
+    def handle(self, *args, **options):
+        for model in (ProductImage, Category):
+            generated = 0
+            
+            for instance in model.objects.exclude(image='').exclude(image__isnull=True).iterator():
+                if not needs_variants(instance):
+                    continue
+                
+                try:
+                    process_variants(model, instance.pk)
+                    generated += 1
+                except Exception as e:
+                    self.stderr.write(f'{model.__name__} {instance.pk}: {e}')
+            
+            self.stdout.write(self.style.SUCCESS(
+                f'{generated} variantes geradas para {model._meta.verbose_name_plural}.'
+            ))
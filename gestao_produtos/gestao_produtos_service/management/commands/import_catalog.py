@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...catalog import FORMATS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Importa produtos de um arquivo CSV ou JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_products(stream, file_format, options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+        
+        for error in report['errors']:
+            self.stderr.write(f"Linha {error['line']}: {error['errors']}")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} criados, {report['updated']} atualizados, "
+            f"{report['errors_count']} com erro."
+        ))
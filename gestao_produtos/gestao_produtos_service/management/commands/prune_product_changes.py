@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import ProductChange
+
+
+class Command(BaseCommand):
+    help = 'Remove registros antigos do log de alterações de produtos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+
+    def handle(self, *args, **options):
+        limit = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ProductChange.objects.filter(created_at__lt=limit).delete()
+        
+        self.stdout.write(self.style.SUCCESS(f'{deleted} registros removidos.'))
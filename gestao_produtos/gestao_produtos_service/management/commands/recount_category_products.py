@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...cache import invalidate_category_tree
+from ...models import Category
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de produtos ativos das categorias'
+
+    def handle(self, *args, **options):
+        fixed = Category.recount_products()
+        
+        if fixed:
+            invalidate_category_tree()
+        
+        self.stdout.write(self.style.SUCCESS(f'{fixed} categorias corrigidas.'))
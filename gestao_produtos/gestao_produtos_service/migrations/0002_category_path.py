@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:53
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('gestao_produtos_service', 'Category')
+    categories = {category.id: category for category in Category.objects.all()}
+    
+    def build_path(category):
+        if not category.path:
+            parent = categories.get(category.parent_id)
+            parent_path = build_path(parent) if parent else ''
+            category.path = f'{parent_path}{category.id}/'
+            category.depth = category.path.count('/') - 1
+        return category.path
+    
+    for category in categories.values():
+        build_path(category)
+    
+    Category.objects.bulk_update(categories.values(), ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_produtos_service', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nível'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='IDs dos ancestrais e da própria categoria, ex.: 1/4/9/', max_length=255, verbose_name='Caminho'),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_produtos_service', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('product_id', models.BigIntegerField(verbose_name='ID do Produto')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Alteração de Produto',
+                'verbose_name_plural': 'Alterações de Produtos',
+                'db_table': 'product_changes',
+                'ordering': ['id'],
+            },
+        ),
+    ]
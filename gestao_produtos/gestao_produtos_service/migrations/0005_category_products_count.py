@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:18
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model('gestao_produtos_service', 'Category')
+    Product = apps.get_model('gestao_produtos_service', 'Product')
+    
+    direct = dict(
+        Product.objects.filter(is_active=True)
+        .order_by()
+        .values('category_id')
+        .annotate(total=Count('id'))
+        .values_list('category_id', 'total')
+    )
+    categories = list(Category.objects.all())
+    totals = defaultdict(int)
+    
+    for category in categories:
+        for path_id in category.path.split('/'):
+            if path_id:
+                totals[int(path_id)] += direct.get(category.id, 0)
+    
+    for category in categories:
+        category.products_count = direct.get(category.id, 0)
+        category.products_count_total = totals[category.id]
+    
+    Category.objects.bulk_update(categories, ['products_count', 'products_count_total'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_produtos_service', '0004_product_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Produtos Ativos'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='products_count_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Produtos Ativos (com subcategorias)'),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_produtos_service', '0005_category_products_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(help_text='Positiva para entradas, negativa para saídas', verbose_name='Quantidade')),
+                ('kind', models.CharField(choices=[('reserve', 'Reserva'), ('release', 'Devolução'), ('adjustment', 'Ajuste')], max_length=20, verbose_name='Tipo')),
+                ('reference', models.CharField(blank=True, help_text='Pedido ou motivo da movimentação', max_length=100, verbose_name='Referência')),
+                ('compacted', models.BooleanField(default=False, verbose_name='Consolidada')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='gestao_produtos_service.product', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'db_table': 'stock_movements',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['product', 'id'], name='stock_movem_product_78af25_idx'), models.Index(condition=models.Q(('compacted', False)), fields=['product'], name='stock_movements_pending')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao_produtos_service', '0006_stock_movements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['reference', 'kind'], name='stock_movem_referen_47912e_idx'),
+        ),
+    ]
@@ -1,2 +1,4 @@
 from .category import *
 from .product import *
+from .change import *
+from .stock import *
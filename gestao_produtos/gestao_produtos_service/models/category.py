@@ -1,4 +1,7 @@
+from collections import defaultdict
+
 from django.db import models
+from django.db.models import Count, F
 from django.utils.text import slugify
 
 
@@ -11,9 +14,19 @@ class Category(models.Model):
         blank=True, related_name='subcategories', verbose_name='Categoria Pai'
     )
     
+    path = models.CharField(max_length=255, blank=True, editable=False, db_index=True, verbose_name='Caminho',
+        help_text='IDs dos ancestrais e da própria categoria, ex.: 1/4/9/'
+    )
+    depth = models.PositiveIntegerField(default=0, editable=False, verbose_name='Nível')
+
     image = models.ImageField(upload_to='categories/', null=True, blank=True,verbose_name='Imagem')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Variantes da Imagem')
     is_active = models.BooleanField(default=True, verbose_name='Ativo')
     order = models.IntegerField(default=0, verbose_name='Ordem de Exibição')
+    products_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Produtos Ativos')
+    products_count_total = models.PositiveIntegerField(default=0, editable=False,
+        verbose_name='Produtos Ativos (com subcategorias)'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     updated_at = models.DateTimeField(auto_now=True,verbose_name='Atualizado em')
     
@@ -32,20 +45,134 @@ class Category(models.Model):
             return f"{self.parent.name} > {self.name}"
         return self.name
     
+    # Mantidos por adjust_products_count/recount_products, nunca pelo save()
+    counter_fields = ('products_count', 'products_count_total')
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        
         super().save(*args, **kwargs)
+        self._update_path()
+    
+    def _update_path(self):
+        parent_path = self.parent.path if self.parent_id else ''
+        path = f'{parent_path}{self.id}/'
+        
+        if path == self.path:
+            return
+        
+        old_path = self.path
+        self.path = path
+        self.depth = path.count('/') - 1
+        Category.objects.filter(id=self.id).update(path=self.path, depth=self.depth)
+        
+        if old_path:
+            # Os produtos da subárvore passam dos ancestrais antigos para os novos
+            moved = Category.objects.filter(id=self.id).values_list('products_count_total', flat=True).first()
+            Category._add_to_totals(_path_ids(old_path)[:-1], -moved)
+            Category._add_to_totals(_path_ids(path)[:-1], moved)
+            
+            descendants = list(
+                Category.objects.filter(path__startswith=old_path).exclude(id=self.id)
+            )
+            
+            for descendant in descendants:
+                descendant.path = path + descendant.path[len(old_path):]
+                descendant.depth = descendant.path.count('/') - 1
+            
+            Category.objects.bulk_update(descendants, ['path', 'depth'])
+    
+    @property
+    def ancestor_ids(self):
+        return _path_ids(self.path)[:-1]
+    
+    def get_ancestors(self):
+        return Category.objects.filter(id__in=self.ancestor_ids).order_by('depth')
+    
+    def get_descendants(self):
+        return Category.objects.filter(path__startswith=self.path).exclude(id=self.id)
     
     def get_full_path(self):
-        if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
-        return self.name
+        if not self.path:
+            if self.parent:
+                return f"{self.parent.get_full_path()} > {self.name}"
+            return self.name
+        
+        names = [ancestor.name for ancestor in self.get_ancestors().only('id', 'name', 'depth')]
+        return ' > '.join(names + [self.name])
     
     @property
     def is_parent(self):
         return self.subcategories.exists()
     
-    @property
-    def products_count(self):
-        return self.products.filter(is_active=True).count()
+    @classmethod
+    def adjust_products_count(cls, deltas):
+        """
+        Aplica variações de produtos ativos ({id da categoria: delta}) no
+        contador da categoria e no total dela e de todos os ancestrais.
+        """
+        deltas = {category_id: delta for category_id, delta in deltas.items() if category_id and delta}
+        if not deltas:
+            return
+        
+        totals = defaultdict(int)
+        for category_id, path in cls.objects.filter(id__in=deltas).values_list('id', 'path'):
+            for path_id in _path_ids(path):
+                totals[path_id] += deltas[category_id]
+        
+        for delta, category_ids in _group_by_delta(deltas).items():
+            cls.objects.filter(id__in=category_ids).update(products_count=F('products_count') + delta)
+        
+        for delta, category_ids in _group_by_delta(totals).items():
+            cls._add_to_totals(category_ids, delta)
+    
+    @classmethod
+    def _add_to_totals(cls, category_ids, delta):
+        if category_ids and delta:
+            cls.objects.filter(id__in=category_ids).update(products_count_total=F('products_count_total') + delta)
+    
+    @classmethod
+    def recount_products(cls):
+        """Recalcula todos os contadores de uma vez. Devolve quantas categorias estavam erradas."""
+        direct = dict(
+            cls._meta.get_field('products').related_model.objects.filter(is_active=True)
+            .order_by()
+            .values('category_id')
+            .annotate(total=Count('id'))
+            .values_list('category_id', 'total')
+        )
+        categories = list(cls.objects.only('id', 'path', 'products_count', 'products_count_total'))
+        
+        totals = defaultdict(int)
+        for category in categories:
+            for path_id in _path_ids(category.path):
+                totals[path_id] += direct.get(category.id, 0)
+        
+        changed = []
+        for category in categories:
+            counts = (direct.get(category.id, 0), totals[category.id])
+            if (category.products_count, category.products_count_total) != counts:
+                category.products_count, category.products_count_total = counts
+                changed.append(category)
+        
+        cls.objects.bulk_update(changed, ['products_count', 'products_count_total'], batch_size=500)
+        return len(changed)
+
+
+def _path_ids(path):
+    return [int(category_id) for category_id in (path or '').split('/') if category_id]
+
+
+def _group_by_delta(deltas):
+    groups = defaultdict(list)
+    for category_id, delta in deltas.items():
+        if delta:
+            groups[delta].append(category_id)
+    return groups
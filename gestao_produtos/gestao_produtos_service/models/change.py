@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class ProductChange(models.Model):
+    """
+    Registro append-only das alterações de produtos.
+
+    O id crescente funciona como contador de versão do catálogo: quem mantém
+    uma cópia em memória guarda o último id aplicado e busca apenas as
+    alterações posteriores.
+    """
+    id = models.BigAutoField(primary_key=True)
+    product_id = models.BigIntegerField(verbose_name='ID do Produto')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    
+    class Meta:
+        db_table = 'product_changes'
+        verbose_name = 'Alteração de Produto'
+        verbose_name_plural = 'Alterações de Produtos'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"Produto {self.product_id} #{self.id}"
+    
+    @classmethod
+    def record(cls, product_ids):
+        cls.objects.bulk_create([cls(product_id=product_id) for product_id in set(product_ids)])
@@ -1,8 +1,14 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from django.utils.text import slugify
 from decimal import Decimal
 
+from ..counters import view_counter
+from .change import ProductChange
+from .stock import StockMovement
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200, verbose_name='Nome')
@@ -53,7 +59,24 @@ class Product(models.Model):
     def __str__(self):
         return self.name
     
+    # Mantido pelo compactador de estoque; o save() registra a diferença como ajuste
+    ledger_fields = ('stock',)
+    
     def save(self, *args, **kwargs):
+        if not self._state.adding and self._stock_changed():
+            with transaction.atomic():
+                self._record_stock_adjustment()
+                self._save(*args, **kwargs)
+        else:
+            self._save(*args, **kwargs)
+    
+    def _save(self, *args, **kwargs):
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.ledger_fields]
+        
         if not self.slug:
             base_slug = slugify(self.name)
             slug = base_slug
@@ -69,42 +92,194 @@ class Product(models.Model):
     
     @property
     def is_in_stock(self):
-        return self.stock > 0
+        return getattr(self, 'available_stock', self.stock) > 0
     
     @property
     def has_discount(self):
-        return self.original_price and self.original_price > self.price
+        return self.calculate_has_discount(self.price, self.original_price)
     
     @property
     def discount_percentage(self):
-        if not self.has_discount:
+        return self.calculate_discount_percentage(self.price, self.original_price)
+    
+    @staticmethod
+    def calculate_has_discount(price, original_price):
+        return original_price and original_price > price
+    
+    @staticmethod
+    def calculate_discount_percentage(price, original_price):
+        if not Product.calculate_has_discount(price, original_price):
             return 0
         
-        discount = ((self.original_price - self.price) / self.original_price) * 100
+        discount = ((original_price - price) / original_price) * 100
         return round(discount, 2)
     
     @property
     def main_image(self):
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            return next((image for image in self.images.all() if image.is_main), None)
         return self.images.filter(is_main=True).first()
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado de referência para ajustar os contadores das categorias no próximo save()
+        instance._counted_state = instance.counted_state()
+        instance._loaded_stock = None if 'stock' in instance.get_deferred_fields() else instance.stock
+        return instance
+    
+    def counted_state(self):
+        """(categoria, ativo) do produto, ou None se algum dos dois não foi carregado."""
+        if {'category_id', 'is_active'} & self.get_deferred_fields():
+            return None
+        return (self.category_id, self.is_active)
+    
     def increment_views(self):
+        view_counter.add(self.id)
         self.views_count += 1
-        self.save(update_fields=['views_count'])
     
     def increment_sales(self, quantity=1):
         self.sales_count += quantity
-        self.save(update_fields=['sales_count'])
+        self.save(update_fields=['sales_count', 'updated_at'])
     
-    def decrease_stock(self, quantity):
-        if quantity > self.stock:
-            raise ValueError('Quantidade maior que estoque disponível')
+    def decrease_stock(self, quantity, reference=''):
+        product, = self._remove_stock({self.id: quantity}, StockMovement.ADJUSTMENT, reference)
+        self.available_stock = product.available_stock
+    
+    def increase_stock(self, quantity, reference=''):
+        product, = self._add_stock({self.id: quantity}, StockMovement.ADJUSTMENT, reference)
+        self.available_stock = product.available_stock
+    
+    def _stock_changed(self):
+        if 'stock' in self.get_deferred_fields() or not hasattr(self, '_loaded_stock'):
+            return False
+        return self.stock != self._loaded_stock
+    
+    def _record_stock_adjustment(self):
+        """Um novo valor de estoque vira um ajuste: o disponível passa a ser exatamente o informado."""
+        available = Product.with_available_stock().select_for_update().values_list(
+            'available_stock', flat=True
+        ).get(pk=self.pk)
+        StockMovement.record({self.pk: self.stock - available}, StockMovement.ADJUSTMENT, 'Alteração manual')
+        self.available_stock = self.stock
+    
+    @classmethod
+    def touch(cls, product_ids):
+        """Marca produtos como alterados sem passar por save() (imagens, variantes)."""
+        cls.objects.filter(id__in=product_ids).update(updated_at=timezone.now())
+        ProductChange.record(product_ids)
+    
+    @classmethod
+    def with_available_stock(cls, queryset=None):
+        """Anota ``available_stock``: snapshot mais as movimentações ainda não consolidadas."""
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.annotate(available_stock=F('stock') + StockMovement.pending_quantity())
+    
+    @classmethod
+    def reserve_stock(cls, quantities, reference=''):
+        """Reserva o estoque de vários produtos em uma única transação (tudo ou nada)."""
+        return cls._remove_stock(quantities, StockMovement.RESERVE, reference, active_only=True)
+    
+    @classmethod
+    def release_stock(cls, quantities, reference):
+        """
+        Devolve ao estoque as quantidades de uma reserva anterior.
+        
+        Só volta o que a reserva ``reference`` efetivamente tirou e ainda não
+        foi devolvido: quantidades a mais, produtos fora da reserva e
+        repetições da mesma devolução são ignorados.
+        """
+        if not reference:
+            raise ValueError('Informe a referência da reserva a devolver.')
         
-        self.stock -= quantity
-        self.save(update_fields=['stock'])
+        with transaction.atomic():
+            # Bloqueia os produtos para que devoluções simultâneas da mesma reserva não se somem
+            cls._lock_rows(quantities.keys())
+            existing = set(
+                cls.objects.select_for_update().filter(id__in=quantities.keys()).order_by('id').values_list('id', flat=True)
+            )
+            
+            missing = [product_id for product_id in quantities if product_id not in existing]
+            if missing:
+                raise cls.DoesNotExist(f'Produtos não encontrados: {missing}')
+            
+            reserved = StockMovement.reserved_quantities(reference, quantities.keys())
+            StockMovement.record(
+                {
+                    product_id: min(quantity, reserved.get(product_id, 0))
+                    for product_id, quantity in quantities.items()
+                    if reserved.get(product_id, 0) > 0
+                },
+                StockMovement.RELEASE,
+                reference
+            )
+        
+        return list(cls.with_available_stock().filter(id__in=quantities.keys()))
+    
+    @classmethod
+    def _lock_rows(cls, product_ids):
+        """
+        Garante o bloqueio de escrita dos produtos até o fim da transação.
+        
+        Onde ``select_for_update`` funciona ele basta. O SQLite o ignora: lá
+        uma escrita sem efeito toma o bloqueio de escrita do banco antes de
+        qualquer leitura, e as outras transações de estoque esperam por ele.
+        """
+        if not connection.features.has_select_for_update:
+            cls.objects.filter(id__in=product_ids).update(stock=F('stock'))
     
-    def increase_stock(self, quantity):
-        self.stock += quantity
-        self.save(update_fields=['stock'])
+    @classmethod
+    def _remove_stock(cls, quantities, kind, reference='', active_only=False):
+        with transaction.atomic():
+            # Bloqueia os produtos antes de ler o saldo: saídas simultâneas do
+            # mesmo produto esperam umas pelas outras e não vendem além do disponível
+            cls._lock_rows(quantities.keys())
+            queryset = cls.with_available_stock().select_for_update().filter(id__in=quantities.keys())
+            products = {product.id: product for product in queryset.order_by('id')}
+            
+            if StockMovement.already_recorded(kind, reference):
+                # Nova tentativa de uma chamada já aplicada (ex.: outbox do serviço de pedidos)
+                return list(products.values())
+            
+            missing = [
+                product_id for product_id in quantities
+                if product_id not in products or (active_only and not products[product_id].is_active)
+            ]
+            if missing:
+                raise cls.DoesNotExist(f'Produtos não encontrados: {missing}')
+            
+            insufficient = [
+                products[product_id].name
+                for product_id, quantity in quantities.items()
+                if products[product_id].available_stock < quantity
+            ]
+            if insufficient:
+                raise ValueError(f'Estoque insuficiente para: {", ".join(insufficient)}')
+            
+            StockMovement.record(
+                {product_id: -quantity for product_id, quantity in quantities.items()},
+                kind,
+                reference
+            )
+        
+        for product_id, quantity in quantities.items():
+            products[product_id].available_stock -= quantity
+        
+        return list(products.values())
+    
+    @classmethod
+    def _add_stock(cls, quantities, kind, reference=''):
+        # Entradas não dependem do saldo atual e não precisam de bloqueio
+        with transaction.atomic():
+            existing = set(cls.objects.filter(id__in=quantities.keys()).values_list('id', flat=True))
+            
+            missing = [product_id for product_id in quantities if product_id not in existing]
+            if missing:
+                raise cls.DoesNotExist(f'Produtos não encontrados: {missing}')
+            
+            StockMovement.record(quantities, kind, reference)
+        
+        return list(cls.with_available_stock().filter(id__in=quantities.keys()))
 
 
 class ProductImage(models.Model):
@@ -116,6 +291,7 @@ class ProductImage(models.Model):
     )
 
     image = models.ImageField(upload_to='products/%Y/%m/', verbose_name='Imagem')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Variantes da Imagem')
     alt_text = models.CharField(max_length=200, blank=True,verbose_name='Texto Alternativo')
     is_main = models.BooleanField(default=False, verbose_name='Imagem Principal')
     order = models.IntegerField(default=0, verbose_name='Ordem')
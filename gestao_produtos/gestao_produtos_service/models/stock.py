@@ -0,0 +1,87 @@
+from django.db import models
+from django.db.models import OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+class StockMovement(models.Model):
+    """
+    Registro append-only das movimentações de estoque.
+
+    ``Product.stock`` é um snapshot: o estoque disponível é o snapshot mais
+    as movimentações ainda não consolidadas (``compacted=False``). Reservas,
+    devoluções e ajustes apenas inserem linhas aqui; o compactador soma as
+    pendentes no snapshot periodicamente, de forma que a linha do produto
+    não é regravada a cada pedido.
+    """
+    RESERVE = 'reserve'
+    RELEASE = 'release'
+    ADJUSTMENT = 'adjustment'
+
+    KIND_CHOICES = [
+        (RESERVE, 'Reserva'),
+        (RELEASE, 'Devolução'),
+        (ADJUSTMENT, 'Ajuste'),
+    ]
+
+    # Tipos em que a referência identifica a operação: repeti-la não gera nova movimentação.
+    # Devoluções são limitadas pelo saldo da reserva (``reserved_quantities``).
+    IDEMPOTENT_KINDS = (RESERVE,)
+
+    id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='stock_movements', verbose_name='Produto')
+    quantity = models.IntegerField(verbose_name='Quantidade', help_text='Positiva para entradas, negativa para saídas')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Tipo')
+    reference = models.CharField(max_length=100, blank=True, verbose_name='Referência', help_text='Pedido ou motivo da movimentação')
+    compacted = models.BooleanField(default=False, verbose_name='Consolidada')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+
+    class Meta:
+        db_table = 'stock_movements'
+        verbose_name = 'Movimentação de Estoque'
+        verbose_name_plural = 'Movimentações de Estoque'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['product', 'id']),
+            models.Index(fields=['reference', 'kind']),
+            models.Index(fields=['product'], condition=Q(compacted=False), name='stock_movements_pending'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity:+d} ({self.get_kind_display()})"
+
+    @classmethod
+    def record(cls, quantities, kind, reference=''):
+        """Insere uma movimentação por produto ({id: quantidade com sinal})."""
+        from ..stock import stock_compactor
+
+        movements = cls.objects.bulk_create([
+            cls(product_id=product_id, quantity=quantity, kind=kind, reference=reference)
+            for product_id, quantity in quantities.items()
+            if quantity
+        ])
+        stock_compactor.start()
+        return movements
+
+    @classmethod
+    def already_recorded(cls, kind, reference):
+        if not reference or kind not in cls.IDEMPOTENT_KINDS:
+            return False
+        return cls.objects.filter(reference=reference, kind=kind).exists()
+
+    @classmethod
+    def reserved_quantities(cls, reference, product_ids):
+        """Quantidade ainda reservada por produto: o que a reserva ``reference`` tirou menos o já devolvido."""
+        balances = (
+            cls.objects.filter(reference=reference, kind__in=[cls.RESERVE, cls.RELEASE], product_id__in=product_ids)
+            .order_by()
+            .values('product_id')
+            .annotate(total=Sum('quantity'))
+            .values_list('product_id', 'total')
+        )
+        return {product_id: -total for product_id, total in balances if total < 0}
+
+    @classmethod
+    def pending_quantity(cls, product=OuterRef('pk')):
+        """Expressão com a soma das movimentações ainda não consolidadas do produto."""
+        pending = cls.objects.filter(product=product, compacted=False).order_by().values('product')
+        return Coalesce(Subquery(pending.annotate(total=Sum('quantity')).values('total')), Value(0))
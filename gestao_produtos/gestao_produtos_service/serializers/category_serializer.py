@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from ..models import Category
+from .fields import ImageVariantsField
 
 
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
-    products_count = serializers.IntegerField(source='products_count_annotated',read_only=True)
+    products_count = serializers.IntegerField(read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Category
@@ -13,7 +15,8 @@ class CategoryListSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'slug', 'products_count')
 
 class SubcategorySerializer(serializers.ModelSerializer):
-    products_count = serializers.IntegerField(source='products_count_annotated', read_only=True)
+    products_count = serializers.IntegerField(read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Category
@@ -21,11 +24,12 @@ class SubcategorySerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'slug', 'products_count')
 
 class CategoryDetailSerializer(serializers.ModelSerializer):
-    products_count = serializers.IntegerField(source='products_count_annotated', read_only=True)
+    products_count = serializers.IntegerField(read_only=True)
     subcategories = SubcategorySerializer(many=True, read_only=True)
     parent_name = serializers.CharField(source='parent.name', read_only=True)
     full_path = serializers.CharField(source='get_full_path', read_only=True)
     is_parent = serializers.BooleanField(read_only=True)
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = Category
@@ -41,6 +45,40 @@ class CategoryDetailSerializer(serializers.ModelSerializer):
             'updated_at'
         )
 
+class CategoryTreeSerializer(serializers.ModelSerializer):
+    """
+    Nó da árvore de categorias montado a partir de um único carregamento.
+
+    Espera no contexto 'categories' (id -> categoria) e 'children'
+    (id do pai -> subcategorias ativas), evitando consultas por nó.
+    """
+    products_count = serializers.IntegerField(read_only=True)
+    subcategories = serializers.SerializerMethodField()
+    parent_name = serializers.SerializerMethodField()
+    full_path = serializers.SerializerMethodField()
+    is_parent = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
+    
+    class Meta:
+        model = Category
+        fields = '__all__'
+    
+    def get_subcategories(self, obj):
+        children = self.context['children'].get(obj.id, [])
+        return CategoryTreeSerializer(children, many=True, context=self.context).data
+    
+    def get_parent_name(self, obj):
+        parent = self.context['categories'].get(obj.parent_id)
+        return parent.name if parent else None
+    
+    def get_full_path(self, obj):
+        categories = self.context['categories']
+        names = [categories[category_id].name for category_id in obj.ancestor_ids if category_id in categories]
+        return ' > '.join(names + [obj.name])
+    
+    def get_is_parent(self, obj):
+        return obj.id in self.context['parent_ids']
+
 class CategoryCreateUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -52,7 +90,7 @@ class CategoryCreateUpdateSerializer(serializers.ModelSerializer):
             if self.instance and value.id == self.instance.id:
                 raise serializers.ValidationError('Uma categoria não pode ser pai de si mesma.')
             
-            if self.instance and value.parent == self.instance:
+            if self.instance and self.instance.path and value.path.startswith(self.instance.path):
                 raise serializers.ValidationError('Ciclo de categorias detectado.')
         
         return value
@@ -0,0 +1,42 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+def build_variant_urls(variants, request=None):
+    urls = {}
+    
+    for variant, names in (variants or {}).items():
+        if variant == 'source':
+            continue
+        
+        urls[variant] = {}
+        for extension, name in names.items():
+            url = default_storage.url(name)
+            urls[variant][extension] = request.build_absolute_uri(url) if request else url
+    
+    return urls
+
+
+class ImageVariantsField(serializers.Field):
+    """URLs das variantes geradas para a imagem; vazio enquanto o processamento não termina."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return build_variant_urls(value, self.context.get('request'))
+
+
+class AvailableStockField(serializers.IntegerField):
+    """
+    Estoque disponível: ``available_stock`` anotado por
+    ``Product.with_available_stock()`` ou, sem a anotação, o snapshot ``stock``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, 'available_stock', instance.stock)
@@ -1,26 +1,34 @@
 from rest_framework import serializers
-from ..models import Product, ProductImage, Category
+from ..models import Product, ProductImage, Category, StockMovement
 from decimal import Decimal
 
+from .compiled import CompiledSerializer
+from .fields import AvailableStockField, ImageVariantsField, build_variant_urls
+from .sparse import SparseFieldsetMixin
+
 
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = ProductImage
         fields = (
             'id',
             'image',
+            'image_variants',
             'alt_text',
             'is_main',
             'order',
         )
         read_only_fields = ('id',)
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    stock = AvailableStockField()
     main_image_url = serializers.SerializerMethodField()
+    main_image_variants = serializers.SerializerMethodField()
     has_discount = serializers.BooleanField(read_only=True)
     discount_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
     
@@ -28,6 +36,12 @@ class ProductListSerializer(serializers.ModelSerializer):
         model = Product
         fields = '__all__'
         read_only_fields = ('id', 'slug')
+        field_sources = {
+            'main_image_url': ('images',),
+            'main_image_variants': ('images',),
+            'has_discount': ('price', 'original_price'),
+            'discount_percentage': ('price', 'original_price'),
+        }
     
     def get_main_image_url(self, obj):
         main_image = obj.main_image
@@ -37,11 +51,170 @@ class ProductListSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(main_image.image.url)
             return main_image.image.url
         return None
+    
+    def get_main_image_variants(self, obj):
+        main_image = obj.main_image
+        if main_image and main_image.image:
+            return build_variant_urls(main_image.image_variants, self.context.get('request'))
+        return {}
+
+class CompiledProductListSerializer(CompiledSerializer):
+    """
+    ProductListSerializer compilado para linhas de ``.values()``. A imagem
+    principal de cada produto é buscada em uma única consulta e anexada à linha.
+    """
+    
+    def __init__(self, context=None):
+        request = (context or {}).get('request')
+        storage = ProductImage._meta.get_field('image').storage
+        
+        def main_image_url(row):
+            main_image = row['main_image']
+            if main_image and main_image['image']:
+                url = storage.url(main_image['image'])
+                return request.build_absolute_uri(url) if request else url
+            return None
+        
+        def main_image_variants(row):
+            main_image = row['main_image']
+            if main_image and main_image['image']:
+                return build_variant_urls(main_image['image_variants'], request)
+            return {}
+        
+        def stock(row):
+            return row['available_stock']
+        
+        def has_discount(row):
+            return Product.calculate_has_discount(row['price'], row['original_price'])
+        
+        def discount_percentage(row):
+            return Product.calculate_discount_percentage(row['price'], row['original_price'])
+        
+        super().__init__(
+            ProductListSerializer,
+            computed={
+                'main_image_url': ((), main_image_url),
+                'main_image_variants': ((), main_image_variants),
+                'stock': (('available_stock',), stock),
+                'has_discount': (('price', 'original_price'), has_discount),
+                'discount_percentage': (('price', 'original_price'), discount_percentage),
+            },
+            context=context
+        )
+        self.use_columns('id')
+    
+    def values(self, queryset):
+        rows = list(super().values(Product.with_available_stock(queryset)))
+        main_images = {}
+        
+        images = ProductImage.objects.filter(
+            product_id__in=[row['id'] for row in rows],
+            is_main=True
+        ).values('product_id', 'image', 'image_variants')
+        
+        for image in images:
+            main_images.setdefault(image['product_id'], image)
+        
+        for row in rows:
+            row['main_image'] = main_images.get(row['id'])
+        
+        return rows
+
+class ProductBulkSerializer(serializers.ModelSerializer):
+    """
+    Representação compacta usada pela consulta em lote.
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+    Aceita `fields` para devolver apenas parte das colunas; `id` e `sku`
+    estão sempre presentes para que o chamador consiga indexar o resultado.
+    A URL da imagem principal vem de `main_images`, pré-carregado pela view;
+    `stock` e `is_in_stock` vêm do estoque disponível (`available_stock`).
+    """
+    stock = AvailableStockField()
+    is_in_stock = serializers.BooleanField(read_only=True)
+    main_image_url = serializers.SerializerMethodField()
+    
+    always_included = ('id', 'sku')
+    model_fields = {
+        'id': ('id',),
+        'sku': ('sku',),
+        'name': ('name',),
+        'slug': ('slug',),
+        'price': ('price',),
+        'original_price': ('original_price',),
+        'stock': ('stock',),
+        'is_in_stock': ('stock',),
+        'is_active': ('is_active',),
+        'category': ('category',),
+        'main_image_url': (),
+    }
+    
+    class Meta:
+        model = Product
+        fields = (
+            'id',
+            'sku',
+            'name',
+            'slug',
+            'price',
+            'original_price',
+            'stock',
+            'is_in_stock',
+            'is_active',
+            'category',
+            'main_image_url',
+        )
+        read_only_fields = fields
+    
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        if fields:
+            allowed = set(fields) | set(self.always_included)
+            for field_name in list(self.fields):
+                if field_name not in allowed:
+                    self.fields.pop(field_name)
+    
+    @classmethod
+    def parse_fields(cls, value):
+        if not value:
+            return None
+        
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        invalid = [field for field in fields if field not in cls.Meta.fields]
+        
+        if invalid:
+            raise serializers.ValidationError({
+                'fields': f'Campos inválidos: {", ".join(invalid)}'
+            })
+        
+        return fields
+    
+    @classmethod
+    def get_db_fields(cls, fields):
+        fields = fields or cls.Meta.fields
+        db_fields = set()
+        
+        for field in set(fields) | set(cls.always_included):
+            db_fields.update(cls.model_fields[field])
+        
+        return sorted(db_fields)
+    
+    def get_main_image_url(self, obj):
+        main_images = getattr(obj, 'main_images', None)
+        main_image = main_images[0] if main_images else None
+        
+        if main_image and main_image.image:
+            request = self.context.get('request')
+            if request:
+                return request.build_absolute_uri(main_image.image.url)
+            return main_image.image.url
+        return None
+
+class ProductDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_slug = serializers.CharField(source='category.slug', read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
+    stock = AvailableStockField()
     is_in_stock = serializers.BooleanField(read_only=True)
     has_discount = serializers.BooleanField(read_only=True)
     discount_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
@@ -49,6 +222,12 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        expandable_fields = ('images',)
+        field_sources = {
+            'is_in_stock': ('stock',),
+            'has_discount': ('price', 'original_price'),
+            'discount_percentage': ('price', 'original_price'),
+        }
         read_only_fields = (
             'id',
             'slug',
@@ -145,8 +324,71 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
 class ProductStockUpdateSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(required=True)
     operation = serializers.ChoiceField(choices=['add', 'remove'], required=True)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
     
     def validate_quantity(self, value):
         if value <= 0:
             raise serializers.ValidationError('A quantidade deve ser maior que zero.')
         return value
+
+class ProductStockSerializer(serializers.ModelSerializer):
+    stock = serializers.IntegerField(source='available_stock', read_only=True)
+    is_in_stock = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = Product
+        fields = (
+            'id',
+            'name',
+            'sku',
+            'price',
+            'stock',
+            'is_in_stock',
+        )
+        read_only_fields = fields
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    
+    class Meta:
+        model = StockMovement
+        fields = (
+            'id',
+            'quantity',
+            'kind',
+            'kind_display',
+            'reference',
+            'compacted',
+            'created_at',
+        )
+        read_only_fields = fields
+
+class StockReservationItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(required=True)
+    quantity = serializers.IntegerField(required=True, min_value=1)
+
+class ProductStockReservationSerializer(serializers.Serializer):
+    items = StockReservationItemSerializer(many=True, required=True)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError('Informe pelo menos um item.')
+        
+        if len(value) > 200:
+            raise serializers.ValidationError('Máximo de 200 itens por reserva.')
+        
+        return value
+    
+    def get_quantities(self):
+        quantities = {}
+        
+        for item in self.validated_data['items']:
+            product_id = item['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + item['quantity']
+        
+        return quantities
+
+class CatalogImportSerializer(serializers.Serializer):
+    file = serializers.FileField(required=True)
+    file_format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
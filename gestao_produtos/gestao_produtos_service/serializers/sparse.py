@@ -0,0 +1,146 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+
+import re
+
+
+
+
+DISPLAY_SOURCE = re.compile(r'^get_(?P<field>\w+)_display$')
+
+
+def _split_param(value):
+    if not value:
+        return []
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Permite ao cliente escolher a representação com ``?fields=`` e ``?expand=``.
+
+    Sem parâmetros a representação completa é mantida. Com ``?fields=a,b``
+    apenas esses campos (mais ``id``) são serializados e as relações aninhadas
+    listadas em ``Meta.expandable_fields`` só entram se pedidas em ``fields``
+    ou em ``?expand=``. ``project_queryset`` leva a mesma escolha para a
+    consulta, carregando só as colunas e relações necessárias.
+
+    ``Meta.field_sources`` indica as colunas/relações de que dependem campos
+    calculados (propriedades do modelo) que não podem ser deduzidas do ``source``.
+    """
+
+    always_included = ('id',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        requested = self.get_requested_fields(self.context.get('request'))
+        if requested is None:
+            return
+
+        for name in list(self.fields):
+            if name not in requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        """Conjunto de campos pedidos, ou None para a representação completa."""
+        if request is None:
+            return None
+
+        params = getattr(request, 'query_params', request.GET)
+        fields = _split_param(params.get('fields'))
+        expand = _split_param(params.get('expand'))
+
+        if not fields:
+            return None
+
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        requested = set(fields) | set(cls.always_included)
+        requested |= expandable.intersection(expand)
+        return requested
+
+    @classmethod
+    def get_projection(cls, requested):
+        """
+        Traduz os campos pedidos em (colunas, select_related, prefetch).
+        Devolve None quando algum campo não pode ser resolvido e a consulta
+        deve carregar o modelo inteiro.
+        """
+        model = cls.Meta.model
+        field_sources = getattr(cls.Meta, 'field_sources', {})
+        serializer_fields = cls().fields
+
+        columns = {model._meta.pk.name}
+        related = set()
+        prefetch = set()
+
+        pending = []
+        for name in requested:
+            if name in field_sources:
+                pending.extend(field_sources[name])
+                continue
+
+            field = serializer_fields.get(name)
+            if field is None:
+                continue
+
+            source = field.source or name
+            match = DISPLAY_SOURCE.match(source)
+            if match:
+                source = match.group('field')
+            pending.append(source)
+
+        for source in pending:
+            if source == '*':
+                return None
+
+            parts = source.split('.')
+            try:
+                model_field = model._meta.get_field(parts[0])
+            except FieldDoesNotExist:
+                return None
+
+            if model_field.one_to_many or model_field.many_to_many:
+                prefetch.add(parts[0])
+            elif len(parts) > 1 and model_field.is_relation:
+                related.add(parts[0])
+                columns.add('__'.join(parts))
+            else:
+                columns.add(parts[0])
+
+        return columns, related, prefetch
+
+    @classmethod
+    def project_queryset(cls, queryset, request, extra_columns=()):
+        """
+        Restringe o queryset às colunas e relações usadas pela representação
+        pedida. ``extra_columns`` são colunas que a view ainda consulta
+        (ex.: ``user_id`` para checar permissões).
+        """
+        requested = cls.get_requested_fields(request)
+        if requested is None:
+            return queryset
+
+        projection = cls.get_projection(requested)
+        if projection is None:
+            return queryset
+
+        columns, related, prefetch = projection
+
+        lookups = []
+        covered = set()
+        for lookup in queryset._prefetch_related_lookups:
+            path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            if path.split('__')[0] in prefetch:
+                lookups.append(lookup)
+                covered.add(path.split('__')[0])
+        lookups.extend(sorted(prefetch - covered))
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+
+        return queryset.only(*columns, *extra_columns)
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_category_tree, invalidate_product_lists
+from .documents import invalidate_product_documents
+from .images import delete_variants, needs_variants, schedule_variants
+from .models import Category, Product, ProductChange, ProductImage
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def category_tree_changed(sender, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def product_lists_changed(sender, **kwargs):
+    invalidate_product_lists()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=ProductImage)
+def image_saved(sender, instance, **kwargs):
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=ProductImage)
+def image_deleted(sender, instance, **kwargs):
+    if instance.image_variants:
+        delete_variants(instance.image_variants, instance.image.storage)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance, **kwargs):
+    Product.touch([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    ProductChange.record([instance.id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def product_documents_changed(sender, **kwargs):
+    invalidate_product_documents()
+
+
+COUNTED_FIELDS = {'category', 'category_id', 'is_active'}
+
+
+def _affects_counters(update_fields):
+    return update_fields is None or bool(COUNTED_FIELDS & set(update_fields))
+
+
+def _load_counted_state(instance):
+    if instance.pk is None or getattr(instance, '_counted_state', None) is not None:
+        return
+    
+    instance._counted_state = Product.objects.filter(pk=instance.pk).values_list('category_id', 'is_active').first()
+
+
+@receiver(pre_save, sender=Product)
+def product_counted_state(sender, instance, update_fields=None, **kwargs):
+    if _affects_counters(update_fields):
+        _load_counted_state(instance)
+
+
+@receiver(pre_delete, sender=Product)
+def product_counted_state_before_delete(sender, instance, **kwargs):
+    _load_counted_state(instance)
+
+
+@receiver(post_save, sender=Product)
+def product_counters_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _affects_counters(update_fields):
+        return
+    
+    previous = None if created else getattr(instance, '_counted_state', None)
+    current = instance.counted_state()
+    deltas = defaultdict(int)
+    
+    if previous and previous[1]:
+        deltas[previous[0]] -= 1
+    if current and current[1]:
+        deltas[current[0]] += 1
+    
+    Category.adjust_products_count(deltas)
+    instance._counted_state = current
+
+
+@receiver(post_delete, sender=Product)
+def product_counters_deleted(sender, instance, **kwargs):
+    state = getattr(instance, '_counted_state', None)
+    
+    if state and state[1]:
+        Category.adjust_products_count({state[0]: -1})
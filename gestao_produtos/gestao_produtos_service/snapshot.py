@@ -0,0 +1,226 @@
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db.models import Max, Min
+
+from .models import Product, ProductChange
+
+
+COLUMNS = (
+    'id',
+    'category_id',
+    'price',
+    'available_stock',
+    'is_active',
+    'is_featured',
+    'sales_count',
+    'created_at',
+    'updated_at',
+)
+
+SORT_COLUMNS = {
+    'price': 'prices',
+    'created_at': 'created_at',
+    'sales_count': 'sales',
+}
+
+
+class CatalogSnapshot:
+    """
+    Cópia colunar e imutável dos campos usados para filtrar e ordenar a listagem.
+
+    Cada coluna é um `array` contíguo; preços ficam em centavos, datas em
+    timestamp e o estoque é o disponível (snapshot mais movimentações
+    pendentes). `version` é o último ProductChange aplicado. Uma atualização
+    gera um novo snapshot (copiando as colunas) e os leitores continuam
+    usando o anterior até a troca da referência.
+    """
+
+    def __init__(self, version=0):
+        self.version = version
+        self.ids = array('q')
+        self.category_ids = array('q')
+        self.prices = array('q')
+        self.stocks = array('q')
+        self.active = array('b')
+        self.featured = array('b')
+        self.sales = array('q')
+        self.created_at = array('d')
+        self.updated_at = array('d')
+        self.positions = {}
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def copy(self, version):
+        snapshot = CatalogSnapshot(version)
+        
+        for name in ('ids', 'category_ids', 'prices', 'stocks', 'active', 'featured', 'sales', 'created_at', 'updated_at'):
+            setattr(snapshot, name, array(getattr(self, name).typecode, getattr(self, name)))
+        
+        snapshot.positions = dict(self.positions)
+        return snapshot
+
+    def apply(self, row):
+        values = (
+            row['id'],
+            row['category_id'],
+            int(row['price'] * 100),
+            row['available_stock'],
+            int(row['is_active']),
+            int(row['is_featured']),
+            row['sales_count'],
+            row['created_at'].timestamp(),
+            row['updated_at'].timestamp(),
+        )
+        columns = (
+            self.ids, self.category_ids, self.prices, self.stocks, self.active,
+            self.featured, self.sales, self.created_at, self.updated_at,
+        )
+        position = self.positions.get(row['id'])
+        
+        if position is None:
+            self.positions[row['id']] = len(self.ids)
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            for column, value in zip(columns, values):
+                column[position] = value
+
+    def remove(self, product_id):
+        position = self.positions.pop(product_id, None)
+        
+        if position is not None:
+            self.active[position] = -1
+
+    def select(self, category_id=None, min_price=None, max_price=None, in_stock=False,
+               is_featured=False, include_inactive=False, order_by='-created_at'):
+        """Devolve as posições que atendem aos filtros, já ordenadas."""
+        active = self.active
+        positions = self._ordered_positions(order_by)
+        
+        if include_inactive:
+            positions = [i for i in positions if active[i] >= 0]
+        else:
+            positions = [i for i in positions if active[i] == 1]
+        
+        if category_id is not None:
+            category_ids = self.category_ids
+            positions = [i for i in positions if category_ids[i] == category_id]
+        
+        if min_price is not None:
+            prices = self.prices
+            positions = [i for i in positions if prices[i] >= min_price]
+        
+        if max_price is not None:
+            prices = self.prices
+            positions = [i for i in positions if prices[i] <= max_price]
+        
+        if in_stock:
+            stocks = self.stocks
+            positions = [i for i in positions if stocks[i] > 0]
+        
+        if is_featured:
+            featured = self.featured
+            positions = [i for i in positions if featured[i]]
+        
+        return positions
+
+    def rows(self, positions):
+        ids = self.ids
+        updated_at = self.updated_at
+        return [(ids[i], updated_at[i]) for i in positions]
+
+
+    def _ordered_positions(self, order_by):
+        # A ordenação de cada coluna é calculada uma única vez por snapshot
+        order = self._orders.get(order_by)
+        
+        if order is None:
+            column = getattr(self, SORT_COLUMNS[order_by.lstrip('-')])
+            order = array('q', sorted(
+                range(len(self.ids)),
+                key=column.__getitem__,
+                reverse=order_by.startswith('-')
+            ))
+            self._orders[order_by] = order
+        
+        return order
+
+
+class CatalogSnapshotManager:
+    """Mantém o snapshot do processo e o atualiza a partir do log de alterações."""
+
+    full_reload_ratio = 0.2
+    # Relê as últimas alterações a cada atualização: em bancos com escrita
+    # concorrente um id menor pode ser confirmado depois de um id maior.
+    overlap = 100
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'PRODUCT_SNAPSHOT_REFRESH_INTERVAL', 2)
+
+    def get(self):
+        if self._snapshot is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+            if self._lock.acquire(blocking=self._snapshot is None):
+                try:
+                    self.refresh()
+                finally:
+                    self._lock.release()
+        
+        return self._snapshot
+
+    def refresh(self):
+        snapshot = self._snapshot
+        bounds = ProductChange.objects.aggregate(first=Min('id'), last=Max('id'))
+        last = bounds['last'] or 0
+        self._checked_at = time.monotonic()
+        
+        if snapshot is not None and last == snapshot.version:
+            return snapshot
+        
+        if snapshot is None or (bounds['first'] or 0) > snapshot.version + 1:
+            self._snapshot = self._load(last)
+            return self._snapshot
+        
+        changed = set(
+            ProductChange.objects.filter(
+                id__gt=snapshot.version - self.overlap,
+                id__lte=last
+            ).values_list('product_id', flat=True)
+        )
+        
+        if len(changed) > max(len(snapshot), 1) * self.full_reload_ratio:
+            self._snapshot = self._load(last)
+            return self._snapshot
+        
+        updated = snapshot.copy(last)
+        rows = {row['id']: row for row in Product.with_available_stock().filter(id__in=changed).values(*COLUMNS)}
+        
+        for product_id in changed:
+            if product_id in rows:
+                updated.apply(rows[product_id])
+            else:
+                updated.remove(product_id)
+        
+        self._snapshot = updated
+        return updated
+
+    def _load(self, version):
+        snapshot = CatalogSnapshot(version)
+        
+        for row in Product.with_available_stock().order_by('id').values(*COLUMNS).iterator(chunk_size=5000):
+            snapshot.apply(row)
+        
+        return snapshot
+
+
+catalog_snapshot = CatalogSnapshotManager()
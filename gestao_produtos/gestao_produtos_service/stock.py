@@ -0,0 +1,118 @@
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class StockCompactor:
+    """
+    Consolida periodicamente as movimentações de estoque no snapshot dos produtos.
+
+    Cada rodada trava as movimentações pendentes que vai somar (as que estão
+    sendo consolidadas por outro processo são puladas), executa um
+    UPDATE ... SET stock = stock + n por grupo de produtos com o mesmo saldo e
+    marca as movimentações como consolidadas na mesma transação. Quem calcula
+    o disponível vê o snapshot antigo com as pendentes ou o novo sem elas,
+    nunca as duas coisas.
+    """
+
+    batch_size = 5000
+    chunk_size = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'STOCK_COMPACTION_INTERVAL', 5)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='stock-compactor',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def compact(self):
+        """Consolida todas as movimentações pendentes; devolve quantas foram somadas."""
+        from .cache import invalidate_product_lists
+        from .models import Product, ProductChange, StockMovement
+
+        compacted = 0
+        changed = set()
+
+        with self._compact_lock:
+            while True:
+                with transaction.atomic():
+                    movements = list(
+                        StockMovement.objects.select_for_update(skip_locked=True)
+                        .filter(compacted=False)
+                        .order_by('id')
+                        .values_list('id', 'product_id', 'quantity')[:self.batch_size]
+                    )
+
+                    if not movements:
+                        break
+
+                    balances = defaultdict(int)
+                    for _, product_id, quantity in movements:
+                        balances[product_id] += quantity
+
+                    grouped = defaultdict(list)
+                    for product_id, balance in balances.items():
+                        if balance:
+                            grouped[balance].append(product_id)
+
+                    now = timezone.now()
+                    for balance, product_ids in grouped.items():
+                        for start in range(0, len(product_ids), self.chunk_size):
+                            Product.objects.filter(
+                                id__in=product_ids[start:start + self.chunk_size]
+                            ).update(stock=F('stock') + balance, updated_at=now)
+
+                    movement_ids = [movement_id for movement_id, _, _ in movements]
+                    for start in range(0, len(movement_ids), self.chunk_size):
+                        StockMovement.objects.filter(
+                            id__in=movement_ids[start:start + self.chunk_size]
+                        ).update(compacted=True)
+
+                    product_ids = [product_id for product_ids in grouped.values() for product_id in product_ids]
+                    ProductChange.record(product_ids)
+
+                compacted += len(movements)
+                changed.update(product_ids)
+
+                if len(movements) < self.batch_size:
+                    break
+
+        if changed:
+            invalidate_product_lists()
+
+        return compacted
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception('Falha ao consolidar movimentações de estoque')
+            finally:
+                connection.close()
+
+
+stock_compactor = StockCompactor()
@@ -1,3 +1,1126 @@
-from django.test import TestCase
+import io
+import json
+import random
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .autocomplete import AutocompleteIndex, autocomplete_index, name_terms, normalize
+from .counters import ViewCounterBuffer, view_counter
+from .documents import serialize_products
+from .images import process_variants
+from .models import Category, Product, ProductChange, ProductImage, StockMovement
+from .serializers import CompiledProductListSerializer, ProductDetailSerializer, ProductListSerializer
+from .snapshot import catalog_snapshot
+from .stock import StockCompactor, stock_compactor
+
+
+ADMIN_HEADERS = {
+    'HTTP_X_FORWARDED_FROM_GATEWAY': '1',
+    'HTTP_X_USER_ID': '1',
+    'HTTP_X_USER_ROLE': 'admin',
+}
+
+CUSTOMER_HEADERS = {
+    'HTTP_X_FORWARDED_FROM_GATEWAY': '1',
+    'HTTP_X_USER_ID': '2',
+    'HTTP_X_USER_ROLE': 'customer',
+}
+
+SERVICE_HEADERS = {'HTTP_X_SERVICE_TOKEN': 'service-token'}
+
+
+class StockTestCase(TestCase):
+    def setUp(self):
+        # As movimentações são consolidadas pelos testes, não pela thread do compactador
+        patcher = mock.patch.object(stock_compactor, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        cache.clear()
+        catalog_snapshot._snapshot = None
+
+        self.category = Category.objects.create(name='Eletrônicos')
+        self.phone = self.create_product('Celular', 'CEL-1', stock=10)
+        self.case = self.create_product('Capinha', 'CAP-1', stock=3)
+
+    def create_product(self, name, sku, stock):
+        return Product.objects.create(
+            name=name,
+            description=name,
+            category=self.category,
+            price=Decimal('10.00'),
+            stock=stock,
+            sku=sku,
+        )
+
+    def available(self, product):
+        return Product.with_available_stock().values_list('available_stock', flat=True).get(pk=product.pk)
+
+
+class StockReservationTests(StockTestCase):
+    def test_reserve_removes_available_stock_of_all_products(self):
+        Product.reserve_stock({self.phone.id: 4, self.case.id: 3}, 'order-1')
+
+        self.assertEqual(self.available(self.phone), 6)
+        self.assertEqual(self.available(self.case), 0)
+
+    def test_reserve_is_all_or_nothing(self):
+        with self.assertRaises(ValueError):
+            Product.reserve_stock({self.phone.id: 4, self.case.id: 4}, 'order-1')
+
+        self.assertEqual(self.available(self.phone), 10)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_repeated_reserve_with_same_reference_is_applied_once(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+
+        self.assertEqual(self.available(self.phone), 6)
+
+    def test_release_returns_only_what_the_reference_reserved(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+
+        Product.release_stock({self.phone.id: 50, self.case.id: 5}, 'order-1')
+
+        self.assertEqual(self.available(self.phone), 10)
+        self.assertEqual(self.available(self.case), 3)
+
+    def test_repeated_release_is_applied_once(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+
+        Product.release_stock({self.phone.id: 4}, 'order-1')
+        Product.release_stock({self.phone.id: 4}, 'order-1')
+
+        self.assertEqual(self.available(self.phone), 10)
+
+    def test_partial_releases_add_up_to_the_reservation(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+
+        Product.release_stock({self.phone.id: 1}, 'order-1')
+        self.assertEqual(self.available(self.phone), 7)
+
+        Product.release_stock({self.phone.id: 5}, 'order-1')
+        self.assertEqual(self.available(self.phone), 10)
+
+    def test_release_of_unknown_reference_changes_nothing(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+
+        Product.release_stock({self.phone.id: 4}, 'order-2')
+
+        self.assertEqual(self.available(self.phone), 6)
+
+    def test_release_requires_a_reference(self):
+        with self.assertRaises(ValueError):
+            Product.release_stock({self.phone.id: 1}, '')
+
+    def test_reservation_takes_the_write_lock_before_reading_the_stock(self):
+        with CaptureQueriesContext(connection) as queries:
+            Product.reserve_stock({self.phone.id: 1}, 'order-1')
+
+        statements = [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertTrue(statements[0].startswith('UPDATE'), statements[0])
+
+    def test_adjustments_are_not_deduplicated_by_reference(self):
+        self.phone.increase_stock(2, 'Recebimento')
+        self.phone.increase_stock(2, 'Recebimento')
+
+        self.assertEqual(self.available(self.phone), 14)
+
+
+class StockCompactionTests(StockTestCase):
+    def test_compaction_folds_movements_into_the_product_stock(self):
+        Product.reserve_stock({self.phone.id: 4, self.case.id: 1}, 'order-1')
+        Product.release_stock({self.phone.id: 4}, 'order-1')
+        self.case.decrease_stock(1)
+
+        compacted = StockCompactor().compact()
+
+        self.assertEqual(compacted, 4)
+        self.assertFalse(StockMovement.objects.filter(compacted=False).exists())
+        self.assertEqual(Product.objects.get(pk=self.phone.pk).stock, 10)
+        self.assertEqual(Product.objects.get(pk=self.case.pk).stock, 1)
+        self.assertEqual(self.available(self.case), 1)
+
+    def test_compaction_records_changed_products_only(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+        Product.release_stock({self.phone.id: 4}, 'order-1')
+        Product.reserve_stock({self.case.id: 1}, 'order-2')
+        ProductChange.objects.all().delete()
+
+        StockCompactor().compact()
+
+        self.assertEqual(list(ProductChange.objects.values_list('product_id', flat=True)), [self.case.id])
+
+    def test_reservation_after_compaction_is_still_released(self):
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+        StockCompactor().compact()
+
+        Product.release_stock({self.phone.id: 4}, 'order-1')
+
+        self.assertEqual(self.available(self.phone), 10)
+
+
+@override_settings(SERVICE_TOKEN='service-token')
+class StockApiTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def reserve(self, quantity=4, reference='order-1', **headers):
+        return self.client.post(
+            '/api/v1/produtos/reserve-stock/',
+            {'items': [{'product_id': self.phone.id, 'quantity': quantity}], 'reference': reference},
+            format='json',
+            **headers
+        )
+
+    def test_reservations_require_admin_or_service(self):
+        self.assertEqual(self.reserve(**CUSTOMER_HEADERS).status_code, 403)
+        self.assertEqual(self.reserve(HTTP_X_SERVICE_TOKEN='wrong').status_code, 401)
+        self.assertEqual(self.reserve(**SERVICE_HEADERS).status_code, 200)
+        self.assertEqual(self.reserve(reference='order-2', **ADMIN_HEADERS).status_code, 200)
+
+        release = self.client.post(
+            '/api/v1/produtos/release-stock/',
+            {'items': [{'product_id': self.phone.id, 'quantity': 4}], 'reference': 'order-1'},
+            format='json',
+            **CUSTOMER_HEADERS
+        )
+        self.assertEqual(release.status_code, 403)
+
+    def test_release_without_reference_is_rejected(self):
+        response = self.client.post(
+            '/api/v1/produtos/release-stock/',
+            {'items': [{'product_id': self.phone.id, 'quantity': 4}]},
+            format='json',
+            **SERVICE_HEADERS
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_reports_available_stock(self):
+        self.reserve(quantity=10, **SERVICE_HEADERS)
+
+        response = self.client.get(f'/api/v1/produtos/bulk/?ids={self.phone.id},{self.case.id}')
+        products = response.json()['products']
+
+        self.assertEqual(products[str(self.phone.id)]['stock'], 0)
+        self.assertFalse(products[str(self.phone.id)]['is_in_stock'])
+        self.assertEqual(products[str(self.case.id)]['stock'], 3)
+
+        response = self.client.get(f'/api/v1/produtos/bulk/?ids={self.phone.id}&fields=is_in_stock')
+        self.assertFalse(response.json()['products'][str(self.phone.id)]['is_in_stock'])
+
+    @mock.patch.object(view_counter, 'add')
+    def test_detail_reports_available_stock(self, add_view):
+        self.reserve(**SERVICE_HEADERS)
+
+        detail = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail').json()
+        sparse = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail?fields=stock,is_in_stock').json()
+
+        self.assertEqual(detail['stock'], 6)
+        self.assertTrue(detail['is_in_stock'])
+        self.assertEqual(sparse['stock'], 6)
+
+    def test_list_reports_and_filters_by_available_stock(self):
+        self.client.post(
+            '/api/v1/produtos/reserve-stock/',
+            {'items': [{'product_id': self.case.id, 'quantity': 3}], 'reference': 'order-1'},
+            format='json',
+            **SERVICE_HEADERS
+        )
+
+        products = self.client.get('/api/v1/produtos/list/').json()
+        in_stock = self.client.get('/api/v1/produtos/list/?in_stock=true').json()
+        searched = self.client.get('/api/v1/produtos/list/?in_stock=true&search=Ca').json()
+
+        self.assertEqual({product['sku']: product['stock'] for product in products}, {'CEL-1': 10, 'CAP-1': 0})
+        self.assertEqual([product['sku'] for product in in_stock], ['CEL-1'])
+        self.assertEqual(searched, [])
+
+    def test_featured_and_best_sellers_report_available_stock(self):
+        Product.objects.filter(pk=self.phone.pk).update(is_featured=True, sales_count=5)
+        self.reserve(**SERVICE_HEADERS)
+
+        featured = self.client.get('/api/v1/produtos/featured/').json()
+        best_sellers = self.client.get('/api/v1/produtos/best-sellers/').json()
+
+        self.assertEqual([product['stock'] for product in featured], [6])
+        self.assertEqual([product['stock'] for product in best_sellers], [6])
+
+
+class CategoryImageVariantsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        cache.clear()
+        self.client = APIClient()
+
+        image = io.BytesIO()
+        Image.new('RGB', (32, 32), 'red').save(image, 'PNG')
+        self.category = Category.objects.create(
+            name='Roupas',
+            image=SimpleUploadedFile('roupas.png', image.getvalue(), content_type='image/png')
+        )
+
+    def test_generated_variants_reach_tree_and_list(self):
+        tree = self.client.get('/api/v1/produtos/categories/tree/')
+        listing = self.client.get('/api/v1/produtos/categories/')
+        self.assertEqual(tree.json()[0]['image_variants'], {})
+
+        process_variants(Category, self.category.pk)
+
+        tree = self.client.get('/api/v1/produtos/categories/tree/', HTTP_IF_NONE_MATCH=tree['ETag'])
+        listing = self.client.get('/api/v1/produtos/categories/', HTTP_IF_NONE_MATCH=listing['ETag'])
+
+        self.assertEqual(tree.status_code, 200)
+        self.assertEqual(set(tree.json()[0]['image_variants']), {'thumb', 'card', 'zoom'})
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual(set(listing.json()[0]['image_variants']), {'thumb', 'card', 'zoom'})
+
+
+@mock.patch.object(view_counter, 'add')
+class ProductImageVariantsTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.image = ProductImage.objects.create(product=self.phone, image=self.upload('celular.png'), is_main=True)
+
+    def upload(self, name, size=(800, 600)):
+        image = io.BytesIO()
+        Image.new('RGB', size, 'blue').save(image, 'PNG')
+        return SimpleUploadedFile(name, image.getvalue(), content_type='image/png')
+
+    def test_variants_are_resized_in_every_format(self, add_view):
+        variants = process_variants(ProductImage, self.image.pk)
+
+        storage = self.image.image.storage
+        self.assertEqual(variants['source'], self.image.image.name)
+        for variant, size in (('thumb', (160, 120)), ('card', (480, 360)), ('zoom', (800, 600))):
+            self.assertEqual(set(variants[variant]), {'webp', 'jpeg'})
+            for name in variants[variant].values():
+                with storage.open(name) as variant_file:
+                    self.assertEqual(Image.open(variant_file).size, size, name)
+
+    def test_processed_image_is_not_processed_again(self, add_view):
+        process_variants(ProductImage, self.image.pk)
+
+        self.assertIsNone(process_variants(ProductImage, self.image.pk))
+
+    def test_replaced_image_drops_the_old_variants(self, add_view):
+        old_variants = process_variants(ProductImage, self.image.pk)
+        self.image.refresh_from_db()
+        self.image.image = self.upload('celular-novo.png')
+        self.image.save()
+
+        new_variants = process_variants(ProductImage, self.image.pk)
+
+        storage = self.image.image.storage
+        self.assertFalse(storage.exists(old_variants['thumb']['webp']))
+        self.assertTrue(storage.exists(new_variants['thumb']['webp']))
+
+    def test_product_documents_show_the_variants(self, add_view):
+        detail = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail')
+        listing = self.client.get('/api/v1/produtos/list/')
+        self.assertEqual(detail.json()['images'][0]['image_variants'], {})
+
+        process_variants(ProductImage, self.image.pk)
+
+        detail = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(set(detail.json()['images'][0]['image_variants']), {'thumb', 'card', 'zoom'})
+        with override_settings(PRODUCT_SNAPSHOT_REFRESH_INTERVAL=0):
+            listing = self.client.get('/api/v1/produtos/list/', HTTP_IF_NONE_MATCH=listing['ETag'])
+        phone = next(product for product in listing.json() if product['sku'] == 'CEL-1')
+        self.assertEqual(set(phone['main_image_variants']), {'thumb', 'card', 'zoom'})
+
+
+@mock.patch.object(view_counter, 'add')
+class ConditionalGetTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_resources_answer_304_without_body(self, add_view):
+        for url in (
+            '/api/v1/produtos/list/',
+            '/api/v1/produtos/list/?search=Cel',
+            f'/api/v1/produtos/{self.phone.slug}/detail',
+            '/api/v1/produtos/categories/',
+            '/api/v1/produtos/categories/tree/',
+        ):
+            response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'', url)
+
+    @override_settings(PRODUCT_SNAPSHOT_REFRESH_INTERVAL=0)
+    def test_product_change_invalidates_list_and_detail(self, add_view):
+        listing = self.client.get('/api/v1/produtos/list/')
+        detail = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail')
+
+        self.phone.price = Decimal('12.00')
+        self.phone.save()
+
+        listing = self.client.get('/api/v1/produtos/list/', HTTP_IF_NONE_MATCH=listing['ETag'])
+        detail = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail', HTTP_IF_NONE_MATCH=detail['ETag'])
+
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual({product['sku']: product['price'] for product in listing.json()}['CEL-1'], '12.00')
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()['price'], '12.00')
+
+    def test_category_change_invalidates_tree(self, add_view):
+        tree = self.client.get('/api/v1/produtos/categories/tree/')
+
+        Category.objects.create(name='Acessórios', parent=self.category)
+
+        tree = self.client.get('/api/v1/produtos/categories/tree/', HTTP_IF_NONE_MATCH=tree['ETag'])
+        self.assertEqual(tree.status_code, 200)
+        self.assertEqual([child['name'] for child in tree.json()[0]['subcategories']], ['Acessórios'])
+
+    def test_etag_depends_on_query_parameters(self, add_view):
+        listing = self.client.get('/api/v1/produtos/list/')
+
+        response = self.client.get('/api/v1/produtos/list/?in_stock=true', HTTP_IF_NONE_MATCH=listing['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductChangesFeedTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def changes(self, since):
+        return self.client.get(f'/api/v1/produtos/changes/?since={since}').json()
+
+    def test_without_since_the_copy_is_reset(self):
+        changes = self.client.get('/api/v1/produtos/changes/').json()
+
+        self.assertTrue(changes['reset'])
+        self.assertEqual(changes['version'], ProductChange.objects.latest('id').id)
+
+    def test_change_committed_after_a_later_id_is_still_delivered(self):
+        ProductChange.record([self.phone.id])
+        ProductChange.record([self.case.id])
+        late_id, latest_id = ProductChange.objects.order_by('-id').values_list('id', flat=True)[:2][::-1]
+        ProductChange.objects.filter(id=late_id).delete()
+
+        version = self.changes(since=late_id - 1)['version']
+        self.assertEqual(version, latest_id)
+
+        # A transação que recebeu o id menor confirma só agora
+        ProductChange.objects.create(id=late_id, product_id=self.phone.id)
+        changes = self.changes(since=version)
+
+        self.assertFalse(changes['reset'])
+        self.assertIn(self.phone.id, changes['product_ids'])
+
+
+class ViewCounterTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        # O flush é chamado pelos testes, não pela thread do contador
+        patcher = mock.patch.object(view_counter, '_start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(view_counter._pending.clear)
+        view_counter._pending.clear()
+        self.client = APIClient()
+
+    def views(self, product):
+        return Product.objects.values_list('views_count', flat=True).get(pk=product.pk)
+
+    def test_flush_adds_pending_views_to_the_stored_count(self):
+        Product.objects.filter(pk=self.phone.pk).update(views_count=5)
+        for _ in range(3):
+            view_counter.add(self.phone.id)
+        view_counter.add(self.case.id)
+
+        self.assertEqual(view_counter.flush(), 2)
+        self.assertEqual(self.views(self.phone), 8)
+        self.assertEqual(self.views(self.case), 1)
+        self.assertEqual(view_counter.flush(), 0)
+
+    def test_flushes_from_several_processes_add_up(self):
+        other_process = ViewCounterBuffer()
+        other_process._start = mock.Mock()
+
+        view_counter.add(self.phone.id, 2)
+        other_process.add(self.phone.id, 3)
+        view_counter.flush()
+        other_process.flush()
+
+        self.assertEqual(self.views(self.phone), 5)
+
+    def test_failed_flush_keeps_the_views_for_the_next_one(self):
+        view_counter.add(self.phone.id, 2)
+
+        with mock.patch.object(Product.objects, 'filter', side_effect=DatabaseError):
+            with self.assertLogs('gestao_produtos_service.counters', 'ERROR'):
+                self.assertEqual(view_counter.flush(), 0)
+        view_counter.add(self.phone.id)
+        view_counter.flush()
+
+        self.assertEqual(self.views(self.phone), 3)
+
+    def test_detail_shows_views_flushed_after_it_was_cached(self):
+        url = f'/api/v1/produtos/{self.phone.slug}/detail'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['views_count'], 0)
+
+        view_counter.flush()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['views_count'], 1)
+
+
+@mock.patch.object(view_counter, 'add')
+class SerializerEquivalenceTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.phone.original_price = Decimal('12.50')
+        self.phone.save()
+        ProductImage.objects.create(
+            product=self.phone,
+            image='products/celular.jpg',
+            is_main=True,
+            image_variants={'source': 'products/celular.jpg', 'thumb': {'webp': 'products/celular_thumb.webp'}}
+        )
+        Product.reserve_stock({self.phone.id: 2}, 'order-1')
+
+    def render(self, serializer_class, url, products, many=True):
+        request = Request(APIRequestFactory().get(url))
+        data = serializer_class(products, many=many, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def products(self, ids):
+        queryset = Product.with_available_stock().select_related('category').prefetch_related('images')
+        products = {product.id: product for product in queryset.filter(id__in=ids)}
+        return [products[product_id] for product_id in ids]
+
+    def test_compiled_list_matches_the_serializer(self, add_view):
+        queryset = Product.objects.order_by('id')
+        serializer = CompiledProductListSerializer({'request': Request(APIRequestFactory().get('/'))})
+
+        compiled = JSONRenderer().render(serializer.serialize(serializer.values(queryset)))
+
+        expected = self.render(ProductListSerializer, '/', self.products([self.phone.id, self.case.id]))
+        self.assertEqual(compiled, expected)
+
+    def test_list_endpoint_matches_the_serializer(self, add_view):
+        for url in (
+            '/api/v1/produtos/list/',
+            '/api/v1/produtos/list/?fields=name,price,stock,main_image_url',
+            '/api/v1/produtos/list/?fields=name&expand=main_image_variants',
+        ):
+            response = self.client.get(url)
+            ids = [product['id'] for product in response.json()]
+
+            self.assertEqual(response.content, self.render(ProductListSerializer, url, self.products(ids)), url)
+
+    def test_detail_endpoint_matches_the_serializer(self, add_view):
+        for query in ('', '?fields=name,stock', '?fields=name&expand=images', '?expand=images'):
+            url = f'/api/v1/produtos/{self.phone.slug}/detail{query}'
+
+            # A segunda leitura vem do cache de documentos
+            for _ in range(2):
+                response = self.client.get(url)
+                expected = self.render(ProductDetailSerializer, url, self.products([self.phone.id])[0], many=False)
+                self.assertEqual(response.content, expected, url)
+
+
+@mock.patch.object(view_counter, 'add')
+class ProductDocumentsTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        patcher = mock.patch('gestao_produtos_service.documents.serialize_products', wraps=serialize_products)
+        self.serialize_products = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serialized_ids(self):
+        ids = [sorted(call.args[0]) for call in self.serialize_products.call_args_list]
+        self.serialize_products.reset_mock()
+        return ids
+
+    @override_settings(PRODUCT_SNAPSHOT_REFRESH_INTERVAL=0)
+    def test_only_missing_documents_are_serialized(self, add_view):
+        self.client.get('/api/v1/produtos/list/')
+        self.assertEqual(self.serialized_ids(), [sorted([self.phone.id, self.case.id])])
+
+        self.client.get('/api/v1/produtos/list/?order_by=price')
+        self.assertEqual(self.serialized_ids(), [])
+
+        self.phone.price = Decimal('11.00')
+        self.phone.save()
+        listing = self.client.get('/api/v1/produtos/list/').json()
+
+        self.assertEqual(self.serialized_ids(), [[self.phone.id]])
+        self.assertEqual({product['sku']: product['price'] for product in listing}['CEL-1'], '11.00')
+
+    def test_category_changes_refresh_every_document(self, add_view):
+        self.client.get('/api/v1/produtos/list/')
+        self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail')
+        self.serialized_ids()
+
+        self.category.name = 'Telefonia'
+        self.category.save()
+        listing = self.client.get('/api/v1/produtos/list/').json()
+        detail = self.client.get(f'/api/v1/produtos/{self.phone.slug}/detail').json()
+
+        self.assertEqual(self.serialized_ids(), [sorted([self.phone.id, self.case.id]), [self.phone.id]])
+        self.assertEqual({product['category_name'] for product in listing}, {'Telefonia'})
+        self.assertEqual(detail['category_name'], 'Telefonia')
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.root = Category.objects.create(name='Eletrônicos')
+        self.child = Category.objects.create(name='Celulares', parent=self.root)
+        self.grandchild = Category.objects.create(name='Acessórios', parent=self.child)
+
+    def tree(self):
+        return self.client.get('/api/v1/produtos/categories/tree/').json()
+
+    def test_paths_follow_the_parents(self):
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{self.root.id}/{self.child.id}/{self.grandchild.id}/')
+        self.assertEqual(self.grandchild.depth, 2)
+
+        other_root = Category.objects.create(name='Casa')
+        self.child.parent = other_root
+        self.child.save()
+
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{other_root.id}/{self.child.id}/{self.grandchild.id}/')
+        self.assertEqual(self.grandchild.get_full_path(), 'Casa > Celulares > Acessórios')
+
+    def test_tree_is_built_with_a_fixed_number_of_queries(self):
+        with CaptureQueriesContext(connection) as shallow:
+            self.tree()
+
+        parent = self.grandchild
+        for level in range(5):
+            parent = Category.objects.create(name=f'Nível {level}', parent=parent)
+
+        with CaptureQueriesContext(connection) as deep:
+            tree = self.tree()
+
+        self.assertEqual(len(deep), len(shallow))
+        node = tree[0]
+        for _ in range(7):
+            node = node['subcategories'][0]
+        self.assertEqual(node['name'], 'Nível 4')
+
+    def test_cached_tree_needs_no_queries(self):
+        self.tree()
+
+        with self.assertNumQueries(0):
+            self.tree()
+
+    def test_category_changes_invalidate_the_cached_tree(self):
+        self.tree()
+
+        self.grandchild.name = 'Capinhas'
+        self.grandchild.save()
+        self.assertEqual(self.tree()[0]['subcategories'][0]['subcategories'][0]['name'], 'Capinhas')
+
+        self.grandchild.delete()
+        self.assertEqual(self.tree()[0]['subcategories'][0]['subcategories'], [])
+
+        self.child.is_active = False
+        self.child.save()
+        self.assertEqual(self.tree()[0]['subcategories'], [])
+
+
+class BulkLookupTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.inactive = self.create_product('Fone', 'FON-1', stock=1)
+        Product.objects.filter(pk=self.inactive.pk).update(is_active=False)
+
+    def bulk(self, query, **headers):
+        return self.client.get(f'/api/v1/produtos/bulk/?{query}', **headers)
+
+    def test_products_are_found_by_ids_and_skus(self):
+        response = self.bulk(f'ids={self.phone.id},999999&skus=CAP-1,NOPE')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body['products']), {str(self.phone.id), str(self.case.id)})
+        self.assertEqual(body['products'][str(self.case.id)]['sku'], 'CAP-1')
+        self.assertEqual(body['not_found'], {'ids': [999999], 'skus': ['NOPE']})
+
+    def test_lookup_uses_a_fixed_number_of_queries(self):
+        with CaptureQueriesContext(connection) as few:
+            self.bulk(f'ids={self.phone.id}')
+
+        with CaptureQueriesContext(connection) as many:
+            self.bulk(f'ids={self.phone.id},{self.case.id}&skus=CEL-1')
+
+        self.assertEqual(len(many), len(few))
+
+    def test_fields_limit_the_representation(self):
+        body = self.bulk(f'ids={self.phone.id}&fields=price').json()
+
+        self.assertEqual(body['products'][str(self.phone.id)], {'id': self.phone.id, 'sku': 'CEL-1', 'price': '10.00'})
+
+    def test_inactive_products_are_only_visible_to_admins(self):
+        query = f'ids={self.inactive.id}'
+
+        self.assertEqual(self.bulk(query).json()['not_found']['ids'], [self.inactive.id])
+        self.assertIn(str(self.inactive.id), self.bulk(query, **ADMIN_HEADERS).json()['products'])
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.bulk('').status_code, 400)
+        self.assertEqual(self.bulk('ids=1,abc').status_code, 400)
+
+        with mock.patch('gestao_produtos_service.views.product_viewset.ProductViewSet.bulk_max_items', 2):
+            self.assertEqual(self.bulk('ids=1,2,3').status_code, 400)
+
+
+class CatalogImportExportTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.phone.original_price = Decimal('15.00')
+        self.phone.save()
+        Product.reserve_stock({self.phone.id: 4}, 'order-1')
+
+    def export(self, file_format):
+        response = self.client.get(f'/api/v1/produtos/export/?file_format={file_format}', **ADMIN_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def import_file(self, content, filename):
+        return self.client.post(
+            '/api/v1/produtos/import/',
+            {'file': SimpleUploadedFile(filename, content)},
+            format='multipart',
+            **ADMIN_HEADERS
+        ).json()
+
+    def test_exported_catalog_imports_back_unchanged(self):
+        for file_format in ('csv', 'jsonl'):
+            exported = self.export(file_format)
+
+            report = self.import_file(exported, f'produtos.{file_format}')
+
+            self.assertEqual((report['created'], report['updated'], report['errors_count']), (0, 2, 0), file_format)
+            self.assertEqual(self.export(file_format), exported, file_format)
+            self.assertEqual(self.available(self.phone), 6)
+
+    def test_edited_export_creates_and_updates_products(self):
+        exported = self.export('jsonl').decode()
+        lines = [json.loads(line) for line in exported.splitlines()]
+        lines[0].update(price='9.90', stock=20)
+        lines.append({**lines[1], 'sku': 'CAP-2', 'name': 'Capinha azul'})
+
+        report = self.import_file('\n'.join(json.dumps(line) for line in lines).encode(), 'produtos.jsonl')
+
+        self.assertEqual((report['created'], report['updated']), (1, 2))
+        self.assertEqual(Product.objects.get(sku='CEL-1').price, Decimal('9.90'))
+        self.assertEqual(self.available(self.phone), 20)
+        new = Product.objects.get(sku='CAP-2')
+        self.assertEqual((new.slug, new.stock, new.category), ('capinha-azul', 3, self.category))
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.products_count, 3)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        content = (
+            'sku,name,description,category,price,original_price,stock,is_active,is_featured\n'
+            'NEW-1,Novo,Novo,eletronicos,5.00,,1,True,False\n'
+            'NEW-2,Sem preço,x,eletronicos,0,,1,True,False\n'
+            'NEW-3,Sem categoria,x,nada,5.00,,1,True,False\n'
+        ).encode()
+
+        report = self.import_file(content, 'produtos.csv')
+
+        self.assertEqual((report['created'], report['errors_count']), (1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+        self.assertFalse(Product.objects.filter(sku__in=['NEW-2', 'NEW-3']).exists())
+
+
+class CachedProductListsTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        Product.objects.filter(pk=self.phone.pk).update(is_featured=True, sales_count=3)
+        Product.objects.filter(pk=self.case.pk).update(sales_count=7)
+
+    def skus(self, url, **headers):
+        return [product['sku'] for product in self.client.get(url, **headers).json()]
+
+    def test_cached_lists_need_no_queries(self):
+        self.skus('/api/v1/produtos/featured/')
+        self.skus('/api/v1/produtos/best-sellers/')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.skus('/api/v1/produtos/featured/'), ['CEL-1'])
+            self.assertEqual(self.skus('/api/v1/produtos/best-sellers/'), ['CAP-1', 'CEL-1'])
+
+    def test_product_changes_invalidate_the_lists(self):
+        self.skus('/api/v1/produtos/featured/')
+
+        self.client.post(f'/api/v1/produtos/{self.case.slug}/toggle-featured/', **ADMIN_HEADERS)
+
+        self.assertEqual(sorted(self.skus('/api/v1/produtos/featured/')), ['CAP-1', 'CEL-1'])
+
+    def test_category_changes_invalidate_the_lists(self):
+        featured = self.client.get('/api/v1/produtos/featured/').json()
+        self.assertEqual(featured[0]['category_name'], 'Eletrônicos')
+
+        self.category.name = 'Eletrônicos e Celulares'
+        self.category.save()
+
+        featured = self.client.get('/api/v1/produtos/featured/').json()
+        self.assertEqual(featured[0]['category_name'], 'Eletrônicos e Celulares')
+
+    def test_sparse_fieldsets_are_not_served_from_the_cache(self):
+        self.skus('/api/v1/produtos/featured/')
+
+        response = self.client.get('/api/v1/produtos/featured/?fields=name')
+
+        self.assertEqual(response.json(), [{'id': self.phone.id, 'name': 'Celular'}])
+
+
+@override_settings(PRODUCT_SNAPSHOT_REFRESH_INTERVAL=0)
+class SnapshotListingTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.accessories = Category.objects.create(name='Acessórios')
+        for index, (price, stock, featured, active) in enumerate([
+            ('5.00', 0, False, True),
+            ('7.50', 2, True, True),
+            ('25.00', 9, False, False),
+            ('12.99', 4, True, True),
+        ]):
+            Product.objects.create(
+                name=f'Acessório {index}',
+                description='Acessório',
+                category=self.accessories,
+                price=Decimal(price),
+                stock=stock,
+                sku=f'ACE-{index}',
+                is_featured=featured,
+                is_active=active,
+                sales_count=index * 3,
+            )
+        Product.reserve_stock({self.case.id: 3}, 'order-1')
+
+    def listing(self, query='', **headers):
+        response = self.client.get(f'/api/v1/produtos/list/?{query}', **headers)
+        return [product['sku'] for product in response.json()], int(response['X-Total-Count'])
+
+    def expected(self, order_by='-created_at', include_inactive=False, **filters):
+        queryset = Product.with_available_stock().filter(**filters)
+        if not include_inactive:
+            queryset = queryset.filter(is_active=True)
+        return list(queryset.order_by(order_by).values_list('sku', flat=True))
+
+    def test_filters_and_ordering_match_the_database(self):
+        cases = {
+            '': self.expected(),
+            'category=acessorios': self.expected(category=self.accessories),
+            'min_price=7.5&max_price=12.99': self.expected(price__gte=Decimal('7.5'), price__lte=Decimal('12.99')),
+            'min_price=7.501': self.expected(price__gt=Decimal('7.50')),
+            'in_stock=true': self.expected(available_stock__gt=0),
+            'is_featured=true&order_by=price': self.expected('price', is_featured=True),
+            'order_by=-sales_count': self.expected('-sales_count'),
+            'order_by=created_at&category=inexistente': [],
+        }
+
+        for query, expected in cases.items():
+            skus, total = self.listing(query)
+            self.assertEqual(skus, expected, query)
+            self.assertEqual(total, len(expected), query)
+
+    def test_admins_also_see_inactive_products(self):
+        skus, _ = self.listing('order_by=price', **ADMIN_HEADERS)
+
+        self.assertEqual(skus, self.expected('price', include_inactive=True))
+
+    def test_pages_share_the_total_count(self):
+        expected = self.expected('price')
+
+        first, total = self.listing('order_by=price&page_size=2&page=1')
+        second, _ = self.listing('order_by=price&page_size=2&page=2')
+
+        self.assertEqual(first + second, expected[:4])
+        self.assertEqual(total, len(expected))
+
+    def test_changes_reach_the_snapshot(self):
+        self.listing()
+        phone = Product.objects.get(pk=self.phone.pk)
+        phone.price = Decimal('1.00')
+        phone.save()
+        Product.objects.get(sku='ACE-0').delete()
+
+        skus, _ = self.listing('order_by=price')
+
+        self.assertEqual(skus, self.expected('price'))
+        self.assertEqual(skus[0], 'CEL-1')
+        self.assertNotIn('ACE-0', skus)
+
+
+@mock.patch.object(view_counter, 'add')
+class SparseFieldsetTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        ProductImage.objects.create(product=self.phone, image='products/celular.jpg', is_main=True)
+        Product.objects.filter(pk=self.case.pk).update(price=Decimal('4.90'))
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries]
+
+    def test_detail_loads_only_the_requested_columns(self, add_view):
+        data, queries = self.get(f'/api/v1/produtos/{self.phone.slug}/detail?fields=name,stock')
+
+        self.assertEqual(data, {'id': self.phone.id, 'name': 'Celular', 'stock': 10})
+        self.assertFalse([sql for sql in queries if '"description"' in sql])
+        self.assertFalse([sql for sql in queries if 'product_images' in sql])
+
+    def test_nested_images_are_loaded_only_when_expanded(self, add_view):
+        data, queries = self.get(f'/api/v1/produtos/{self.phone.slug}/detail?fields=name&expand=images')
+
+        self.assertEqual(set(data), {'id', 'name', 'images'})
+        self.assertEqual(len(data['images']), 1)
+
+        data, _ = self.get(f'/api/v1/produtos/{self.phone.slug}/detail?expand=images')
+        self.assertIn('description', data)
+
+    def test_list_returns_only_the_requested_fields(self, add_view):
+        data, queries = self.get('/api/v1/produtos/list/?fields=name,price&order_by=price')
+
+        self.assertEqual(data, [
+            {'id': self.case.id, 'name': 'Capinha', 'price': '4.90'},
+            {'id': self.phone.id, 'name': 'Celular', 'price': '10.00'},
+        ])
+        self.assertFalse([sql for sql in queries if '"description"' in sql])
+
+    def test_unknown_fields_are_ignored(self, add_view):
+        data, _ = self.get(f'/api/v1/produtos/{self.phone.slug}/detail?fields=name,nope')
+
+        self.assertEqual(data, {'id': self.phone.id, 'name': 'Celular'})
+
+
+class AutocompleteIndexTests(TestCase):
+    words = ('capa', 'cabo', 'carregador', 'celular', 'caneca', 'camiseta', 'azul', 'preto', 'usb', 'cafe')
+
+    def setUp(self):
+        self.random = random.Random(7)
+        self.rows = {product_id: self.random_row(product_id) for product_id in range(1, 301)}
+        self.index = AutocompleteIndex()
+        self.index.update_products(self.rows.values())
+
+    def random_row(self, product_id):
+        return {
+            'id': product_id,
+            'name': ' '.join(self.random.sample(self.words, 2)),
+            'slug': f'produto-{product_id}',
+            'sku': f'SKU-{product_id}',
+            'is_active': self.random.random() > 0.1,
+            'sales_count': self.random.randint(0, 5),
+            'views_count': self.random.randint(0, 50),
+        }
+
+    def brute_force(self, text, limit):
+        prefix = normalize(text)
+        matches = []
+        for row in self.rows.values():
+            terms = name_terms(row['name']) | {normalize(row['sku'])}
+            if row['is_active'] and any(term.startswith(prefix) for term in terms):
+                matches.append((-(row['sales_count'] * 10 + row['views_count']), row['id']))
+        return [product_id for _, product_id in sorted(matches)[:limit]]
+
+    def assert_matches_brute_force(self):
+        for text in ('c', 'ca', 'cab', 'capa', 'car', 'azul c', 'sku-1', 'Célular', 'x'):
+            products, _ = self.index.search(text, 20)
+            self.assertEqual([product['id'] for product in products], self.brute_force(text, 20), text)
+
+    def test_search_matches_brute_force(self):
+        self.assert_matches_brute_force()
+
+    def test_incremental_updates_keep_the_rankings(self):
+        for _ in range(5):
+            changed = self.random.sample(sorted(self.rows), 20)
+            for product_id in changed:
+                row = self.random_row(product_id)
+                row['sales_count'] += self.random.choice((0, 10))
+                self.rows[product_id] = row
+
+            removed = set(self.random.sample(sorted(set(self.rows) - set(changed)), 3))
+            for product_id in removed:
+                del self.rows[product_id]
+
+            self.index = self.index.copy(self.index.version + 1)
+            self.index.update_products([self.rows[product_id] for product_id in changed], removed)
+            self.assert_matches_brute_force()
+
+    def test_results_cache_is_bounded(self):
+        self.index.results_cache_size = 5
+
+        for number in range(20):
+            self.index.search(f'sku-{number}', 5)
+
+        self.assertEqual(len(self.index._results), 5)
+
+
+@override_settings(PRODUCT_SNAPSHOT_REFRESH_INTERVAL=0)
+class AutocompleteApiTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        autocomplete_index._index = None
+
+    def search(self, text):
+        body = self.client.get('/api/v1/produtos/autocomplete/', {'q': text}).json()
+        return [product['sku'] for product in body['products']], [category['slug'] for category in body['categories']]
+
+    def test_products_and_categories_are_suggested_without_accents(self):
+        self.assertEqual(self.search('eletro'), ([], ['eletronicos']))
+        self.assertEqual(self.search('CEL'), (['CEL-1'], []))
+
+    def test_changes_reach_the_index(self):
+        self.search('cel')
+
+        self.phone.name = 'Smartphone'
+        self.phone.save()
+        self.case.is_active = False
+        self.case.save()
+        Category.objects.create(name='Celulares')
+
+        self.assertEqual(self.search('cel'), (['CEL-1'], ['celulares']))
+        self.assertEqual(self.search('smart'), (['CEL-1'], []))
+        self.assertEqual(self.search('capinha'), ([], []))
+
+
+class CategoryCountersTests(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name='Eletrônicos')
+        self.phones = Category.objects.create(name='Celulares', parent=self.root)
+        self.cases = Category.objects.create(name='Capinhas', parent=self.phones)
+        self.home = Category.objects.create(name='Casa')
+        self.products = [
+            Product.objects.create(
+                name=f'Produto {index}',
+                description='Produto',
+                category=category,
+                price=Decimal('10.00'),
+                stock=1,
+                sku=f'P-{index}',
+            )
+            for index, category in enumerate([self.phones, self.cases, self.cases])
+        ]
+
+    def counts(self):
+        return {
+            category.name: (category.products_count, category.products_count_total)
+            for category in Category.objects.all()
+        }
+
+    def assert_counts(self, expected):
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(Category.recount_products(), 0)
+
+    def test_created_products_count_in_every_ancestor(self):
+        self.assert_counts({
+            'Eletrônicos': (0, 3),
+            'Celulares': (1, 3),
+            'Capinhas': (2, 2),
+            'Casa': (0, 0),
+        })
+
+    def test_deactivated_and_deleted_products_stop_counting(self):
+        self.products[1].is_active = False
+        self.products[1].save()
+        self.products[0].delete()
+
+        self.assert_counts({
+            'Eletrônicos': (0, 1),
+            'Celulares': (0, 1),
+            'Capinhas': (1, 1),
+            'Casa': (0, 0),
+        })
+
+        self.products[1].is_active = True
+        self.products[1].save(update_fields=['is_active'])
+        self.assertEqual(self.counts()['Eletrônicos'], (0, 2))
+
+    def test_product_moved_to_another_category(self):
+        product = Product.objects.only('id', 'category').get(pk=self.products[1].pk)
+        product.category = self.home
+        product.save()
+
+        self.assert_counts({
+            'Eletrônicos': (0, 2),
+            'Celulares': (1, 2),
+            'Capinhas': (1, 1),
+            'Casa': (1, 1),
+        })
+
+    def test_moved_subtree_takes_its_totals_along(self):
+        self.cases.parent = self.home
+        self.cases.save()
+
+        self.assert_counts({
+            'Eletrônicos': (0, 1),
+            'Celulares': (1, 1),
+            'Capinhas': (2, 2),
+            'Casa': (0, 2),
+        })
+
+    def test_saving_a_category_keeps_its_counters(self):
+        stale = Category.objects.get(pk=self.cases.pk)
+        Product.objects.create(
+            name='Produto novo', description='Produto', category=self.cases,
+            price=Decimal('10.00'), stock=1, sku='P-NEW',
+        )
+
+        stale.description = 'Capinhas e películas'
+        stale.save()
+
+        self.assertEqual(self.counts()['Capinhas'], (3, 3))
+
+    def test_recount_fixes_drifted_counters(self):
+        Category.objects.filter(pk=self.phones.pk).update(products_count=7, products_count_total=0)
+
+        self.assertEqual(Category.recount_products(), 1)
+        self.assertEqual(self.counts()['Celulares'], (1, 3))
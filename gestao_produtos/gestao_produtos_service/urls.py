@@ -35,6 +35,21 @@ urlpatterns = [
     # Mais vendidos
     path('best-sellers/', ProductViewSet.as_view({'get': 'best_sellers'}), name='products-best-sellers'),
     
+    # Sugestões para a busca (autocomplete)
+    path('autocomplete/', ProductViewSet.as_view({'get': 'autocomplete'}), name='products-autocomplete'),
+    
+    # Reservar estoque de vários produtos (tudo ou nada)
+    path('reserve-stock/', ProductViewSet.as_view({'post': 'reserve_stock'}), name='products-reserve-stock'),
+    
+    # Devolver estoque reservado
+    path('release-stock/', ProductViewSet.as_view({'post': 'release_stock'}), name='products-release-stock'),
+    
+    # Importar catálogo (CSV/JSONL)
+    path('import/', ProductViewSet.as_view({'post': 'import_catalog'}), name='products-import'),
+    
+    # Exportar catálogo (CSV/JSONL)
+    path('export/', ProductViewSet.as_view({'get': 'export_catalog'}), name='products-export'),
+    
     # Criar produto
     path('create/', ProductViewSet.as_view({'post': 'create'}), name='products-create'),
     
@@ -56,12 +71,21 @@ urlpatterns = [
     # Atualizar estoque
     path('<slug:slug>/update-stock/', ProductViewSet.as_view({'post': 'update_stock'}), name='products-update-stock'),
     
+    # Movimentações de estoque do produto
+    path('<slug:slug>/stock-movements/', ProductViewSet.as_view({'get': 'stock_movements'}), name='products-stock-movements'),
+    
     # Adicionar imagem
     path('<slug:slug>/add-image/', ProductViewSet.as_view({'post': 'add_image'}), name='products-add-image'),
     
     # Remover imagem
     path('<slug:slug>/remove-image/<int:image_id>/', ProductViewSet.as_view({'delete': 'remove_image'}), name='products-remove-image'),
 
+    # Consulta em lote por IDs e/ou SKUs
+    path('bulk/', ProductViewSet.as_view({'get': 'bulk'}), name='products-bulk'),
+
+    # Feed de alterações (ids de produtos alterados desde uma versão)
+    path('changes/', ProductViewSet.as_view({'get': 'changes'}), name='products-changes'),
+
     #Get produto por id
     path('produto/<int:pk>/', ProductViewSet.as_view({'get': 'get_product_by_id'}), name='product_by_id'),
     path('imagem/produto/<int:pk>/', ProductViewSet.as_view({'get': 'get_product_image'}), name='get_product_image')
@@ -1,13 +1,16 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from django.db.models import Count, Max
 
-from ..models import Category
+from ..cache import CATEGORY_TREE_VERSION_KEY, category_tree_key, get_or_render, get_version
+from ..conditional import make_etag, not_modified, set_validators
+from ..models import Category, ProductChange
 from ..serializers import (
     CategoryListSerializer,
     CategoryDetailSerializer,
     CategoryCreateUpdateSerializer,
+    CategoryTreeSerializer,
 )
 
 
@@ -26,9 +29,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         )
 
 class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.annotate(
-        products_count_annotated=Count('products', filter=Q(products__is_active=True))
-    )
+    queryset = Category.objects.all()
     permission_classes = [IsAdminOrReadOnly]
     lookup_field = 'slug'
     
@@ -63,8 +64,16 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if search:
             queryset = queryset.filter(name__icontains=search)
         
+        validators = queryset.aggregate(last_modified=Max('updated_at'), count=Count('id', distinct=True))
+        catalog_version = ProductChange.objects.aggregate(version=Max('id'))['version']
+        etag = make_etag(request, 'categories-list', validators['count'], validators['last_modified'], catalog_version)
+        
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag)
     
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -130,19 +139,46 @@ class CategoryViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def tree(self, request):
-        parents = self.get_queryset().filter(parent__isnull=True)
+        is_admin = (
+            request.user.is_authenticated and
+            hasattr(request.user, 'is_admin') and
+            (request.user.is_admin or request.user.is_admin_master)
+        )
+        scope = 'admin' if is_admin else 'public'
+        etag = make_etag(request, 'categories-tree', scope, get_version(CATEGORY_TREE_VERSION_KEY))
         
-        def build_tree(category):
-            data = CategoryDetailSerializer(category).data
-            subcategories = category.subcategories.filter(is_active=True)
-            
-            if subcategories.exists():
-                data['subcategories'] = [
-                    build_tree(sub) for sub in subcategories
-                ]
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        tree_data = get_or_render(
+            category_tree_key(scope),
+            lambda: self._build_tree(include_inactive_roots=is_admin),
+            timeout=3600
+        )
+        
+        return set_validators(Response(tree_data), etag)
+    
+    def _build_tree(self, include_inactive_roots):
+        categories = {category.id: category for category in self.queryset.all()}
+        parent_ids = set()
+        children = {}
+        roots = []
+        
+        for category in categories.values():
+            if category.parent_id is None:
+                if category.is_active or include_inactive_roots:
+                    roots.append(category)
+                continue
             
-            return data
+            parent_ids.add(category.parent_id)
+            if category.is_active:
+                children.setdefault(category.parent_id, []).append(category)
         
-        tree_data = [build_tree(cat) for cat in parents]
+        context = {
+            'categories': categories,
+            'children': children,
+            'parent_ids': parent_ids,
+        }
         
-        return Response(tree_data)
+        return CategoryTreeSerializer(roots, many=True, context=context).data
@@ -1,16 +1,32 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db.models import Max, Min, Prefetch, Q
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
 from decimal import Decimal
+import math
 
-from ..models import Product, ProductImage
+from ..autocomplete import autocomplete_index
+from ..cache import get_or_render, product_list_key
+from ..counters import view_counter
+from ..conditional import make_etag, not_modified, set_validators
+from ..documents import detail_revision, documents_version, join_documents, render_documents
+from ..catalog import detect_format, export_products, import_products
+from ..models import Category, Product, ProductChange, ProductImage
+from ..snapshot import catalog_snapshot
 from ..serializers import (
     ProductListSerializer,
     ProductDetailSerializer,
+    ProductBulkSerializer,
     ProductCreateUpdateSerializer,
     ProductStockUpdateSerializer,
+    ProductStockReservationSerializer,
+    ProductStockSerializer,
+    StockMovementSerializer,
     ProductImageSerializer,
+    CatalogImportSerializer,
 )
 
 
@@ -28,10 +44,28 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             (request.user.is_admin or request.user.is_admin_master)
         )
 
+class IsAdminOrService(permissions.BasePermission):
+    """Administradores ou outro microsserviço autenticado pelo ``X-Service-Token``."""
+    
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user and
+            user.is_authenticated and
+            (getattr(user, 'is_service', False) or
+             getattr(user, 'is_admin', False) or
+             getattr(user, 'is_admin_master', False))
+        )
+
 class ProductViewSet(viewsets.ModelViewSet):    
     queryset = Product.objects.select_related('category').prefetch_related('images')
     permission_classes = [IsAdminOrReadOnly]
     lookup_field = 'slug'
+    bulk_max_items = 500
+    changes_max_items = 5000
+    # Alterações relidas antes de ``since``: com escrita concorrente um id
+    # menor pode ser confirmado depois de um id maior (como no snapshot)
+    changes_overlap = 100
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -40,6 +74,11 @@ class ProductViewSet(viewsets.ModelViewSet):
             return ProductCreateUpdateSerializer
         return ProductDetailSerializer
     
+    def get_permissions(self):
+        if self.action in ['reserve_stock', 'release_stock']:
+            return [IsAdminOrService()]
+        return super().get_permissions()
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -54,19 +93,172 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['GET'] ) 
     def get_product_by_id(self, request, pk=None):
         try:
-            product = Product.objects.get(id=pk)
+            product = Product.with_available_stock(
+                ProductDetailSerializer.project_queryset(self.queryset, request)
+            ).get(id=pk)
             serializer = ProductDetailSerializer(product, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
-        except:
+        except Product.DoesNotExist:
             return Response(
                 {"error": "Produto nao encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
+    
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        ids = request.query_params.get('ids', '')
+        skus = request.query_params.get('skus', '')
+        fields = ProductBulkSerializer.parse_fields(request.query_params.get('fields'))
+        
+        try:
+            ids = {int(product_id) for product_id in ids.split(',') if product_id.strip()}
+        except ValueError:
+            return Response({
+                'error': 'O parâmetro ids deve conter apenas números separados por vírgula.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        skus = {sku.strip() for sku in skus.split(',') if sku.strip()}
+        
+        if not ids and not skus:
+            return Response({
+                'error': 'Informe ids ou skus.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(ids) + len(skus) > self.bulk_max_items:
+            return Response({
+                'error': f'Máximo de {self.bulk_max_items} produtos por consulta.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.get_queryset().filter(
+            Q(id__in=ids) | Q(sku__in=skus)
+        ).select_related(None).prefetch_related(None).only(
+            *ProductBulkSerializer.get_db_fields(fields)
+        ).order_by()
+        
+        if not fields or {'stock', 'is_in_stock'} & set(fields):
+            queryset = Product.with_available_stock(queryset)
+        
+        if not fields or 'main_image_url' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'images',
+                queryset=ProductImage.objects.filter(is_main=True).only('id', 'product_id', 'image'),
+                to_attr='main_images'
+            ))
+        
+        products = ProductBulkSerializer(
+            queryset,
+            many=True,
+            fields=fields,
+            context={'request': request}
+        ).data
+        
+        found_ids = {product['id'] for product in products}
+        found_skus = {product['sku'] for product in products}
+        
+        return Response({
+            'products': {str(product['id']): product for product in products},
+            'not_found': {
+                'ids': sorted(ids - found_ids),
+                'skus': sorted(skus - found_skus),
+            }
+        })
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Feed de alterações para cópias locais de produtos em outros serviços.
+        
+        Devolve os ids alterados depois da versão ``since`` e a versão atual.
+        As últimas ``changes_overlap`` alterações antes de ``since`` voltam
+        na resposta, então um produto pode aparecer de novo; descartá-lo
+        outra vez é inofensivo. ``reset`` indica que o cliente deve descartar a cópia inteira: sem
+        ``since``, com registros já removidos do log ou alterações demais.
+        """
+        since = request.query_params.get('since')
+        
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return Response({
+                'error': 'O parâmetro since deve ser um número.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        bounds = ProductChange.objects.aggregate(first=Min('id'), last=Max('id'))
+        version = bounds['last'] or 0
+        
+        if since is None or version < since or (bounds['first'] or 0) > since + 1:
+            return Response({'version': version, 'reset': True, 'product_ids': []})
+        
+        product_ids = list(
+            ProductChange.objects.filter(id__gt=since - self.changes_overlap, id__lte=version)
+            .order_by()
+            .values_list('product_id', flat=True)
+            .distinct()[:self.changes_max_items + 1]
+        )
+        
+        if len(product_ids) > self.changes_max_items:
+            return Response({'version': version, 'reset': True, 'product_ids': []})
+        
+        return Response({'version': version, 'reset': False, 'product_ids': sorted(product_ids)})
 
 
 
 
     def list(self, request):
+        order_by = request.query_params.get('order_by', '-created_at')
+        
+        valid_orders = [
+            'price', '-price',
+            'name', '-name',
+            'created_at', '-created_at',
+            'sales_count', '-sales_count'
+        ]
+        
+        if order_by not in valid_orders:
+            order_by = '-created_at'
+        
+        page_size = request.query_params.get('page_size', 20)
+        try:
+            page_size = int(page_size)
+            if page_size > 100:
+                page_size = 100
+        except:
+            page_size = 20
+        
+        scope = 'admin' if self._is_admin(request) else 'public'
+        use_database = request.query_params.get('search') or order_by.lstrip('-') == 'name'
+        
+        if use_database:
+            catalog_version = ProductChange.objects.aggregate(version=Max('id'))['version']
+        else:
+            snapshot = catalog_snapshot.get()
+            catalog_version = snapshot.version
+        
+        etag = make_etag(request, 'products-list', scope, catalog_version, documents_version())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        if use_database:
+            rows = self._list_rows_from_db(request, order_by)
+            total = len(rows)
+            rows = self._paginate(request, rows, page_size)
+        else:
+            positions = self._select_from_snapshot(snapshot, request, order_by)
+            total = len(positions)
+            rows = snapshot.rows(self._paginate(request, positions, page_size))
+        
+        if ProductListSerializer.get_requested_fields(request) is not None:
+            data = self._sparse_data(ProductListSerializer, [product_id for product_id, _ in rows], request)
+            content = JSONRenderer().render(data)
+        else:
+            content = join_documents(render_documents(rows, 'list', request))
+        
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Total-Count'] = total
+        return set_validators(response, etag)
+    
+    def _list_rows_from_db(self, request, order_by):
         queryset = self.get_queryset()
         category_slug = request.query_params.get('category')
         search = request.query_params.get('search')
@@ -74,7 +266,6 @@ class ProductViewSet(viewsets.ModelViewSet):
         max_price = request.query_params.get('max_price')
         in_stock = request.query_params.get('in_stock')
         is_featured = request.query_params.get('is_featured')
-        order_by = request.query_params.get('order_by', '-created_at')
         
         if category_slug:
             queryset = queryset.filter(category__slug=category_slug)
@@ -99,37 +290,78 @@ class ProductViewSet(viewsets.ModelViewSet):
                 pass
         
         if in_stock == 'true':
-            queryset = queryset.filter(stock__gt=0)
+            queryset = Product.with_available_stock(queryset).filter(available_stock__gt=0)
         
         if is_featured == 'true':
             queryset = queryset.filter(is_featured=True)
         
-        valid_orders = [
-            'price', '-price',
-            'name', '-name',
-            'created_at', '-created_at',
-            'sales_count', '-sales_count'
+        return [
+            (product_id, updated_at.timestamp())
+            for product_id, updated_at in queryset.order_by(order_by).values_list('id', 'updated_at')
         ]
+    
+    def _sparse_data(self, serializer_class, product_ids, request):
+        """
+        Serializa apenas os campos pedidos em ?fields=, carregando só as
+        colunas necessárias. Não passa pelo cache de documentos, que guarda
+        sempre a representação completa.
+        """
+        queryset = serializer_class.project_queryset(self.queryset.filter(id__in=product_ids), request)
+        products = {product.id: product for product in Product.with_available_stock(queryset)}
         
-        if order_by in valid_orders:
-            queryset = queryset.order_by(order_by)
+        return serializer_class(
+            [products[product_id] for product_id in product_ids if product_id in products],
+            many=True,
+            context={'request': request}
+        ).data
+    
+    def _is_admin(self, request):
+        return (
+            request.user.is_authenticated and
+            hasattr(request.user, 'is_admin') and
+            (request.user.is_admin or request.user.is_admin_master)
+        )
+    
+    def _paginate(self, request, items, page_size):
+        page = request.query_params.get('page')
+        
+        if not page:
+            return items
         
-        page_size = request.query_params.get('page_size', 20)
         try:
-            page_size = int(page_size)
-            if page_size > 100:
-                page_size = 100
-        except:
-            page_size = 20
+            page = max(int(page), 1)
+        except ValueError:
+            page = 1
         
-        # Implementar paginação aqui se necessário
+        return items[(page - 1) * page_size:page * page_size]
+    
+    def _select_from_snapshot(self, snapshot, request, order_by):
+        category_slug = request.query_params.get('category')
+        category_id = None
         
-        serializer = self.get_serializer(
-            queryset,
-            many=True,
-            context={'request': request}
+        if category_slug:
+            category_id = Category.objects.filter(slug=category_slug).values_list('id', flat=True).first()
+            if category_id is None:
+                return []
+        
+        return snapshot.select(
+            category_id=category_id,
+            min_price=self._parse_cents(request.query_params.get('min_price'), math.ceil),
+            max_price=self._parse_cents(request.query_params.get('max_price'), math.floor),
+            in_stock=request.query_params.get('in_stock') == 'true',
+            is_featured=request.query_params.get('is_featured') == 'true',
+            include_inactive=self._is_admin(request),
+            order_by=order_by,
         )
-        return Response(serializer.data)
+    
+    def _parse_cents(self, value, rounding):
+        if not value:
+            return None
+        
+        try:
+            return rounding(Decimal(value) * 100)
+        except (ArithmeticError, ValueError):
+            return None
     
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -145,14 +377,33 @@ class ProductViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_201_CREATED)
     
     def retrieve(self, request, slug=None):
-        product = self.get_object()
-        product.increment_views()
+        row = self.get_queryset().filter(slug=slug).values_list('id', 'updated_at', 'views_count').first()
         
-        serializer = self.get_serializer(
-            product,
-            context={'request': request}
-        )
-        return Response(serializer.data)
+        if row is None:
+            raise Http404
+        
+        product_id, updated_at, views_count = row
+        view_counter.add(product_id)
+        revision = detail_revision(updated_at, views_count)
+        
+        etag = make_etag(request, 'products-detail', product_id, revision, documents_version())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        if ProductDetailSerializer.get_requested_fields(request) is not None:
+            documents = [
+                JSONRenderer().render(data)
+                for data in self._sparse_data(ProductDetailSerializer, [product_id], request)
+            ]
+        else:
+            documents = render_documents([(product_id, revision)], 'detail', request)
+        
+        if not documents:
+            raise Http404
+        
+        response = HttpResponse(documents[0], content_type='application/json')
+        return set_validators(response, etag)
     
     def partial_update(self, request, slug=None):
         product = self.get_object()
@@ -215,51 +466,187 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         quantity = serializer.validated_data['quantity']
         operation = serializer.validated_data['operation']
+        reference = serializer.validated_data['reference']
         
         try:
             if operation == 'add':
-                product.increase_stock(quantity)
+                product.increase_stock(quantity, reference)
                 message = f'{quantity} unidades adicionadas ao estoque.'
             else:
-                product.decrease_stock(quantity)
+                product.decrease_stock(quantity, reference)
                 message = f'{quantity} unidades removidas do estoque.'
             
             return Response({
                 'message': message,
-                'current_stock': product.stock
+                'current_stock': product.available_stock
             })
         except ValueError as e:
             return Response({
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def reserve_stock(self, request):
+        serializer = ProductStockReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            products = Product.reserve_stock(serializer.get_quantities(), serializer.validated_data['reference'])
+        except Product.DoesNotExist as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Estoque reservado com sucesso!',
+            'products': ProductStockSerializer(products, many=True).data
+        })
+    
+    @action(detail=False, methods=['post'])
+    def release_stock(self, request):
+        serializer = ProductStockReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            products = Product.release_stock(serializer.get_quantities(), serializer.validated_data['reference'])
+        except Product.DoesNotExist as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Estoque devolvido com sucesso!',
+            'products': ProductStockSerializer(products, many=True).data
+        })
+    
+    @action(detail=True, methods=['get'])
+    def stock_movements(self, request, slug=None):
+        if not self._is_admin(request):
+            return Response(
+                {'error': 'Apenas administradores podem consultar as movimentações de estoque.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        product = self.get_object()
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 500)
+        except ValueError:
+            limit = 100
+        
+        movements = product.stock_movements.order_by('-id')[:limit]
+        available = Product.with_available_stock().values_list('available_stock', flat=True).get(pk=product.pk)
+        
+        return Response({
+            'stock': product.stock,
+            'available_stock': available,
+            'movements': StockMovementSerializer(movements, many=True).data
+        })
+    
+    @action(detail=False, methods=['post'])
+    def import_catalog(self, request):
+        serializer = CatalogImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        upload = serializer.validated_data['file']
+        file_format = serializer.validated_data.get('file_format') or detect_format(upload.name)
+        
+        report = import_products(upload.file, file_format)
+        
+        return Response({
+            'message': 'Importação concluída.',
+            **report
+        }, status=status.HTTP_200_OK)
+    
     @action(detail=False, methods=['get'])
-    def featured(self, request):
-        queryset = self.get_queryset().filter(
-            is_featured=True,
-            is_active=True
-        )
+    def export_catalog(self, request):
+        if not (request.user.is_authenticated and
+                hasattr(request.user, 'is_admin') and
+                (request.user.is_admin or request.user.is_admin_master)):
+            return Response(
+                {'error': 'Apenas administradores podem exportar o catálogo.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        serializer = self.get_serializer(
-            queryset,
-            many=True,
-            context={'request': request}
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ['csv', 'jsonl']:
+            return Response(
+                {'error': 'Formato inválido. Use csv ou jsonl.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            export_products(Product.objects.all(), file_format),
+            content_type=f'{content_type}; charset=utf-8'
         )
-        return Response(serializer.data)
+        response['Content-Disposition'] = f'attachment; filename="produtos.{file_format}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            limit = 8
+        
+        products, categories = autocomplete_index.get().search(request.query_params.get('q', ''), limit)
+        
+        return Response({
+            'products': products,
+            'categories': categories,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def featured(self, request):
+        def render():
+            queryset = self.get_queryset().filter(
+                is_featured=True,
+                is_active=True
+            )
+            return self._render_list(queryset, request)
+        
+        return self._cached_list_response('featured', render, request)
     
     @action(detail=False, methods=['get'])
     def best_sellers(self, request):
-        queryset = self.get_queryset().filter(
-            is_active=True,
-            sales_count__gt=0
-        ).order_by('-sales_count')[:10]
+        def render():
+            queryset = self.get_queryset().filter(
+                is_active=True,
+                sales_count__gt=0
+            ).order_by('-sales_count')[:10]
+            return self._render_list(queryset, request)
         
-        serializer = self.get_serializer(
-            queryset,
+        return self._cached_list_response('best_sellers', render, request)
+    
+    def _render_list(self, queryset, request):
+        serializer_class = self.get_serializer_class()
+        serializer = serializer_class(
+            serializer_class.project_queryset(Product.with_available_stock(queryset), request),
             many=True,
             context={'request': request}
         )
-        return Response(serializer.data)
+        return JSONRenderer().render(serializer.data)
+    
+    def _cached_list_response(self, name, render, request):
+        # O cache guarda apenas a representação completa
+        if self.get_serializer_class().get_requested_fields(request) is not None:
+            return HttpResponse(render(), content_type='application/json')
+        
+        content = get_or_render(
+            product_list_key(name, request),
+            render,
+            timeout=settings.PRODUCT_LISTS_CACHE_TIMEOUT
+        )
+        return HttpResponse(content, content_type='application/json')
     
     @action(detail=True, methods=['post'])
     def add_image(self, request, slug=None):
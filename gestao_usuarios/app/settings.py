@@ -155,3 +155,9 @@ SIMPLE_JWT = {
 }
 
 AUTH_USER_MODEL = 'gestao_usuarios_service.User'
+
+# Serviço de pedidos, avisado quando os endereços de um usuário mudam
+ORDERS_SERVICE_URL = os.getenv('ORDERS_SERVICE_URL', 'http://gestao-pedidos-service:8003')
+
+# Token compartilhado entre os microsserviços (cabeçalho X-Service-Token) usado nas chamadas ao serviço de pedidos
+SERVICE_TOKEN = os.getenv('SERVICE_TOKEN', '')
@@ -0,0 +1,35 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def _post_invalidation(user_id):
+    orders_url = getattr(settings, 'ORDERS_SERVICE_URL', 'http://gestao-pedidos-service:8003')
+
+    try:
+        requests.post(
+            f'{orders_url}/api/v1/orders/address-cache/invalidate/',
+            json={'user_id': user_id},
+            # Chamada em nome do próprio serviço, não do usuário
+            headers={'X-Service-Token': getattr(settings, 'SERVICE_TOKEN', '')},
+            timeout=2
+        )
+    except requests.RequestException:
+        logger.warning('Falha ao invalidar o cache de endereços do usuário %s no serviço de pedidos', user_id)
+
+
+def invalidate_order_addresses(user_id):
+    """
+    Avisa o serviço de pedidos que os endereços do usuário mudaram, depois do
+    commit e fora da requisição. É só uma otimização: se o aviso se perder,
+    a cópia do serviço de pedidos expira pelo TTL.
+    """
+    transaction.on_commit(
+        lambda: threading.Thread(target=_post_invalidation, args=(user_id,), daemon=True).start()
+    )
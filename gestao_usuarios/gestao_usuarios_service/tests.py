@@ -1,3 +1,19 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from .orders import _post_invalidation
+
+
+@override_settings(ORDERS_SERVICE_URL='http://orders', SERVICE_TOKEN='service-token')
+class OrderAddressInvalidationTests(TestCase):
+    @mock.patch('gestao_usuarios_service.orders.requests.post')
+    def test_invalidation_is_sent_with_the_service_identity(self, post):
+        _post_invalidation(7)
+
+        post.assert_called_once_with(
+            'http://orders/api/v1/orders/address-cache/invalidate/',
+            json={'user_id': 7},
+            headers={'X-Service-Token': 'service-token'},
+            timeout=2
+        )
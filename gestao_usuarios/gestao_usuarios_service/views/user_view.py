@@ -9,6 +9,7 @@ from datetime import timedelta
 from django.db import models
 
 from ..models import Address
+from ..orders import invalidate_order_addresses
 from ..serializers import (
     UserListSerializer,
     UserDetailSerializer,
@@ -210,6 +211,7 @@ class AddressViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(user=request.user)
+        invalidate_order_addresses(request.user.id)
 
         return Response({
             'message': 'Endereço criado com sucesso!',
@@ -232,8 +234,13 @@ class AddressViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        invalidate_order_addresses(address.user_id)
 
         return Response({
             'message': 'Endereço atualizado com sucesso!',
             'address': serializer.data
         })
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_order_addresses(instance.user_id)
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+import time
+
+from ...models import Notification, STATUS_CHOICES
+from ...serializers import CompiledNotificationListSerializer, NotificationListSerializer
+
+
+BENCHMARK_USER_ID = -1
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compara o NotificationListSerializer com o serializer compilado (dados sintéticos, desfeitos ao final)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+
+        try:
+            with transaction.atomic():
+                self._populate(max(sizes))
+                self._run(sizes, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _populate(self, total):
+        statuses = [value for value, _ in STATUS_CHOICES]
+        now = timezone.now()
+
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=BENCHMARK_USER_ID,
+                user_email='cliente@example.com',
+                notification_type='in_app',
+                category='order',
+                title=f'Pedido {index} atualizado',
+                message='Seu pedido mudou de status. ' * 5,
+                status=statuses[index % len(statuses)],
+                read_at=now if index % 2 else None,
+            )
+            for index in range(total)
+        ], batch_size=1000)
+
+    def _run(self, sizes, repeat):
+        renderer = JSONRenderer()
+        notifications = Notification.objects.filter(user_id=BENCHMARK_USER_ID).order_by('-created_at', 'id')
+
+        def serializer_path(size):
+            queryset = notifications[:size]
+            return renderer.render(NotificationListSerializer(queryset, many=True).data)
+
+        def compiled_path(size):
+            serializer = CompiledNotificationListSerializer()
+            return renderer.render(serializer.serialize(serializer.values(notifications[:size])))
+
+        self.stdout.write(f'{"linhas":>8} {"serializer":>12} {"compilado":>12} {"ganho":>8}  idêntico')
+        for size in sizes:
+            expected, serializer_time = self._measure(serializer_path, size, repeat)
+            content, compiled_time = self._measure(compiled_path, size, repeat)
+
+            self.stdout.write(
+                f'{size:>8} {serializer_time * 1000:>10.1f}ms {compiled_time * 1000:>10.1f}ms '
+                f'{serializer_time / compiled_time:>7.1f}x  {"sim" if content == expected else "NÃO"}'
+            )
+
+    def _measure(self, function, size, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
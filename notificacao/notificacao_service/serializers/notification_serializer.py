@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from ..models import Notification, NotificationTemplate, NotificationPreference
+from ..models import Notification, NotificationTemplate, NotificationPreference, READ
+from .compiled import CompiledSerializer
 
 
 
@@ -37,6 +38,18 @@ class NotificationListSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('id', 'created_at', 'read_at')
 
+class CompiledNotificationListSerializer(CompiledSerializer):
+    """NotificationListSerializer compilado para linhas de ``.values()``."""
+    
+    def __init__(self, context=None):
+        super().__init__(
+            NotificationListSerializer,
+            computed={
+                'is_read': (('status',), lambda row: row['status'] == READ),
+            },
+            context=context
+        )
+
 class NotificationDetailSerializer(serializers.ModelSerializer):
     notification_type_display = serializers.CharField(
         source='get_notification_type_display',
@@ -18,6 +18,7 @@ from ..models import (
 )
 from ..serializers import (
     NotificationListSerializer,
+    CompiledNotificationListSerializer,
     NotificationDetailSerializer,
     NotificationCreateSerializer,
     NotificationSendFromTemplateSerializer,
@@ -78,8 +79,8 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if unread_only == 'true':
             queryset = queryset.exclude(status=READ)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        serializer = CompiledNotificationListSerializer(self.get_serializer_context())
+        return Response(serializer.serialize(serializer.values(queryset)))
     
     def create(self, request):
         if not (hasattr(request.user, 'is_admin') and 
@@ -156,3 +156,11 @@ SIMPLE_JWT = {
 }
 
 #CORS_ALLOW_ALL_ORIGINS = True
+
+# Outbox: intervalo (segundos) entre rodadas do despachante, tentativas por mensagem e prazo de cada chamada
+OUTBOX_DISPATCH_INTERVAL = float(os.getenv('OUTBOX_DISPATCH_INTERVAL', 1))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 10))
+OUTBOX_REQUEST_TIMEOUT = float(os.getenv('OUTBOX_REQUEST_TIMEOUT', 5))
+
+# Token compartilhado entre os microsserviços (cabeçalho X-Service-Token); vazio desativa a identidade de serviço
+SERVICE_TOKEN = os.getenv('SERVICE_TOKEN', '')
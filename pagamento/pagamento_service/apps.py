@@ -1,6 +1,28 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def _serving_requests():
+    """
+    Se o processo atende requisições. Comandos de gerenciamento (migrate,
+    test, dispatch_outbox...) não iniciam threads; no runserver com
+    autoreload, só o processo filho (RUN_MAIN) as inicia.
+    """
+    if os.path.basename(sys.argv[0]) != 'manage.py' or len(sys.argv) < 2:
+        return True
+    if sys.argv[1] != 'runserver':
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
 class PagamentoServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pagamento_service'
+
+    def ready(self):
+        if _serving_requests():
+            # Entrega também as mensagens que ficaram pendentes de antes do reinício
+            from .outbox import outbox_dispatcher
+            outbox_dispatcher.start()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import OutboxMessage
+from ...outbox import outbox_dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Envia as mensagens pendentes da outbox (chamadas a outros serviços)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Devolve à fila as mensagens que falharam definitivamente'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = OutboxMessage.objects.filter(status=OutboxMessage.FAILED).update(
+                status=OutboxMessage.PENDING,
+                attempts=0,
+                next_attempt_at=timezone.now()
+            )
+            self.stdout.write(f'{requeued} mensagens devolvidas à fila.')
+        
+        sent = outbox_dispatcher.dispatch()
+        
+        self.stdout.write(self.style.SUCCESS(f'{sent} mensagens enviadas.'))
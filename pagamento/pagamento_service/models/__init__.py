@@ -1 +1,2 @@
 from .payment import *
+from .outbox import *
@@ -0,0 +1,166 @@
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+# Respostas 4xx que ainda valem uma nova tentativa
+RETRYABLE_STATUS = (408, 409, 425, 429)
+
+
+def service_headers():
+    """
+    Cabeçalhos das chamadas da outbox. Elas são feitas em nome do próprio
+    serviço (``SERVICE_TOKEN``), não do usuário da requisição de origem: o
+    usuário pode não ter permissão no destino, e uma nova tentativa pode
+    acontecer muito depois da requisição.
+    """
+    return {'X-Service-Token': getattr(settings, 'SERVICE_TOKEN', '')}
+
+
+class OutboxDispatcher:
+    """
+    Entrega as mensagens da outbox fora do caminho da requisição.
+
+    Cada rodada reserva um lote de mensagens vencidas (SKIP LOCKED, para que
+    vários processos não peguem as mesmas, e ``next_attempt_at`` empurrado
+    para o fim de um prazo de reserva), faz as chamadas fora da transação
+    reaproveitando a conexão HTTP e grava o resultado. Falhas voltam para a
+    fila com backoff exponencial; respostas 4xx definitivas e mensagens que
+    esgotaram as tentativas ficam como ``failed`` para inspeção. Se o processo
+    morrer no meio, a reserva expira e a mensagem é reenviada: a entrega é
+    pelo menos uma vez, então os destinos devem ser idempotentes. A thread
+    é iniciada com a aplicação (``AppConfig.ready``) e acordada a cada
+    mensagem nova; ``dispatch_outbox`` faz uma rodada avulsa.
+    """
+
+    batch_size = 100
+    lease = timedelta(seconds=60)
+    backoff_base = 2
+    backoff_max = 600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'OUTBOX_DISPATCH_INTERVAL', 1)
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'OUTBOX_REQUEST_TIMEOUT', 5)
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='outbox-dispatcher',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def dispatch(self):
+        """Envia as mensagens vencidas; devolve quantas foram entregues."""
+        sent = 0
+
+        while True:
+            messages = self._claim()
+            if not messages:
+                break
+
+            with requests.Session() as session:
+                for message in messages:
+                    sent += self._send(session, message)
+
+            if len(messages) < self.batch_size:
+                break
+
+        return sent
+
+    def _claim(self):
+        from .models import OutboxMessage
+
+        now = timezone.now()
+        with transaction.atomic():
+            messages = list(OutboxMessage.due(now).select_for_update(skip_locked=True)[:self.batch_size])
+            OutboxMessage.objects.filter(
+                id__in=[message.id for message in messages]
+            ).update(next_attempt_at=now + self.lease)
+
+        return messages
+
+    def _send(self, session, message):
+        try:
+            response = session.post(
+                message.url,
+                json=message.payload,
+                headers=message.headers,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            self._failed(message, str(e), retry=True)
+            return False
+
+        if response.status_code >= 400:
+            retry = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS
+            self._failed(message, f'HTTP {response.status_code}: {response.text[:500]}', retry)
+            return False
+
+        message.status = message.SENT
+        message.attempts += 1
+        message.sent_at = timezone.now()
+        message.last_error = ''
+        message.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+        return True
+
+    def _failed(self, message, error, retry):
+        message.attempts += 1
+        message.last_error = error
+
+        if retry and message.attempts < self.max_attempts:
+            delay = min(self.backoff_base ** message.attempts, self.backoff_max)
+            message.next_attempt_at = timezone.now() + timedelta(seconds=delay * random.uniform(0.5, 1))
+        else:
+            message.status = message.FAILED
+            logger.error('Mensagem %s da outbox falhou: %s', message.id, error)
+
+        message.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+            try:
+                self.dispatch()
+            except Exception:
+                logger.exception('Falha ao despachar mensagens da outbox')
+            finally:
+                connection.close()
+
+
+outbox_dispatcher = OutboxDispatcher()
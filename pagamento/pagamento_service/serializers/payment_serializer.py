@@ -3,6 +3,7 @@ from decimal import Decimal
 from datetime import datetime, timedelta
 
 from ..models import Payment, PaymentStatusHistory, Refund
+from .sparse import SparseFieldsetMixin
 
 
 
@@ -63,7 +64,7 @@ class PaymentListSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('id', 'payment_number', 'created_at')
 
-class PaymentDetailSerializer(serializers.ModelSerializer):
+class PaymentDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     payment_method_display = serializers.CharField(source='get_payment_method_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     payment_number = serializers.CharField(read_only=True)
@@ -77,6 +78,14 @@ class PaymentDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+        expandable_fields = ('status_history', 'refunds')
+        field_sources = {
+            'payment_number': ('id',),
+            'is_approved': ('status',),
+            'is_pending': ('status',),
+            'can_be_refunded': ('status',),
+            'is_card_payment': ('payment_method',),
+        }
         read_only_fields = (
             'id',
             'payment_number',
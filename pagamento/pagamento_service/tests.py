@@ -1,3 +1,59 @@
+import uuid
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Payment, PaymentStatusHistory, APPROVED, PENDING, PIX
+
+
+CUSTOMER_HEADERS = {
+    'HTTP_X_FORWARDED_FROM_GATEWAY': '1',
+    'HTTP_X_USER_ID': '2',
+    'HTTP_X_USER_ROLE': 'customer',
+}
+
+
+class PaymentSparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.payment = Payment.objects.create(
+            order_id=uuid.uuid4(),
+            user_id=2,
+            user_name='Ana',
+            user_email='ana@example.com',
+            payment_method=PIX,
+            status=APPROVED,
+            amount=Decimal('20.00'),
+            pix_qr_code='qr' * 100,
+        )
+        PaymentStatusHistory.objects.create(payment=self.payment, from_status=PENDING, to_status=APPROVED)
+
+    def retrieve(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/payments/{self.payment.id}/{query}', **CUSTOMER_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries]
+
+    def test_without_parameters_the_full_representation_is_kept(self):
+        data, _ = self.retrieve()
+
+        self.assertEqual(data['pix_qr_code'], self.payment.pix_qr_code)
+        self.assertEqual(len(data['status_history']), 1)
+        self.assertEqual(data['refunds'], [])
+
+    def test_only_requested_fields_are_loaded_and_returned(self):
+        data, queries = self.retrieve('?fields=status,is_approved')
+
+        self.assertEqual(data, {'id': str(self.payment.id), 'status': APPROVED, 'is_approved': True})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('pix_qr_code', queries[0])
+
+    def test_nested_relations_are_loaded_only_when_expanded(self):
+        data, queries = self.retrieve('?fields=status&expand=status_history')
 
-# Create your tests here.
+        self.assertEqual(set(data), {'id', 'status', 'status_history'})
+        self.assertEqual(data['status_history'][0]['to_status'], APPROVED)
+        self.assertEqual(len(queries), 2)
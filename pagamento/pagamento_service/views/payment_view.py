@@ -14,6 +14,7 @@ from datetime import timedelta
 logger = logging.getLogger(__name__)
 
 from ..models import (
+    OutboxMessage,
     Payment,
     PaymentStatusHistory,
     Refund,
@@ -28,6 +29,7 @@ from ..models import (
     PIX,
     BOLETO,
 )
+from ..outbox import service_headers
 from ..serializers import (
     PaymentListSerializer,
     PaymentDetailSerializer,
@@ -61,8 +63,17 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return PaymentCreateSerializer
         return PaymentDetailSerializer
     
+    # Ações somente leitura que aceitam ?fields= / ?expand=
+    sparse_actions = ('retrieve',)
+
     def get_queryset(self):
         queryset = super().get_queryset()
+
+        if self.action in self.sparse_actions:
+            queryset = PaymentDetailSerializer.project_queryset(
+                queryset, self.request, extra_columns=('user_id',)
+            )
+
         user = self.request.user
         
         if hasattr(user, 'is_admin') and (user.is_admin or user.is_admin_master):
@@ -159,6 +170,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def update_status(self, request, pk=None):
         if not (hasattr(request.user, 'is_admin') and 
                 (request.user.is_admin or request.user.is_admin_master)):
@@ -201,6 +213,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def request_refund(self, request, pk=None):
         payment = self.get_object()
         serializer = RefundRequestSerializer(data=request.data)
@@ -359,27 +372,15 @@ class PaymentViewSet(viewsets.ModelViewSet):
         refund.save()
     
     def _update_order_status(self, order_id, new_status):
+        # Gravada na transação do pagamento e entregue pelo despachante da outbox
         orders_url = os.getenv('ORDERS_SERVICE_URL', 'http://gestao-pedidos-service:8003')
-        auth_header = None
-        try:
-            # Try to get the original Authorization header from the current request
-            auth_header = getattr(self, 'request', None) and self.request.headers.get('Authorization')
-        except Exception:
-            auth_header = None
-
-        headers = {'Content-Type': 'application/json'}
-        if auth_header:
-            headers['Authorization'] = auth_header
-
-        try:
-            requests.post(
-                f'{orders_url}/api/v1/orders/{order_id}/update-status/',
-                json={'status': new_status},
-                timeout=5,
-                headers=headers
-            )
-        except requests.RequestException:
-            logger.exception('Falha ao atualizar status do pedido')
+        
+        OutboxMessage.enqueue(
+            f'{orders_url}/api/v1/orders/{order_id}/update-status/',
+            {'status': new_status},
+            headers=service_headers(),
+            key=str(order_id)
+        )
     
     def _get_card_brand(self, card_number):
         first_digit = card_number[0]